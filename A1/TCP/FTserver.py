@@ -1,77 +1,211 @@
 #!/usr/bin/python
 
 import socket
+import selectors
+import struct
+import os
+import time
 import sys
 
+# receive buffer of each connection; the files are written in chunks of up to this size
+BUF_SIZE = 256 * 1024
+# default no. of connections served at the same time
+MAX_CONNS = 16
+
+# every file is sent as: header (name length, file size), name, contents;
+# a header with name length 0 ends the connection, and the server replies
+# with one status (files stored, files failed)
+HEADER = struct.Struct('!HQ')
+STATUS = struct.Struct('!II')
+
+def safe_path(file_name):
+	# the file's path below the server directory, or None if it points elsewhere
+	try:
+		path = os.path.normpath(file_name.decode('utf-8'))
+	except UnicodeDecodeError:
+		return None
+	if os.path.isabs(path) or path == '.' or path.split(os.sep)[0] == '..':
+		return None
+	return path
+
+class Upload:
+	# state of one connection: a stream of header, name and contents frames
+	def __init__(self, conn, who):
+		self.conn = conn
+		self.who = who
+		self.state = "header"
+		self.name_len = 0
+		self.f = None
+		self.remaining = 0
+		self.stored = 0
+		self.failed = 0
+		self.received = 0
+		self.buf = bytearray(BUF_SIZE)
+		self.view = memoryview(self.buf)
+		self.pos = 0		# first byte not yet consumed
+		self.filled = 0		# end of the received bytes
+		self.start = time.monotonic()
+
+	def fileno(self):
+		return self.conn.fileno()
+
+	def open_file(self, file_name):
+		# create the file; its contents are discarded if that fails
+		path = safe_path(file_name)
+		if path == None:
+			print(self.who, "Rejected file name: ", file_name)
+			return None
+		try:
+			if os.path.dirname(path):
+				os.makedirs(os.path.dirname(path), exist_ok=True)
+			return open(path, "wb")
+		except OSError as err:
+			print(self.who, "File open error: ", err)
+			return None
+
+	def end_file(self):
+		if self.f != None:
+			self.f.close()
+			self.f = None
+			self.stored += 1
+		else:
+			self.failed += 1
+		self.state = "header"
+
+	def consume(self):
+		# parse the frames in the buffer; returns False after the last one
+		while True:
+			avail = self.filled - self.pos
+			if self.state == "header":
+				if avail < HEADER.size:
+					return True
+				self.name_len, self.remaining = HEADER.unpack_from(self.buf, self.pos)
+				self.pos += HEADER.size
+				if self.name_len == 0:
+					return False
+				self.state = "name"
+			elif self.state == "name":
+				if avail < self.name_len:
+					return True
+				self.f = self.open_file(bytes(self.view[self.pos:self.pos + self.name_len]))
+				self.pos += self.name_len
+				self.state = "data"
+				if self.remaining == 0:
+					self.end_file()
+			else:
+				take = min(avail, self.remaining)
+				# wait for a full buffer unless the file ends here
+				if take < self.remaining and self.filled < BUF_SIZE:
+					return True
+				if take == 0:
+					return True
+				if self.f != None:
+					self.f.write(self.view[self.pos:self.pos + take])
+				self.pos += take
+				self.remaining -= take
+				if self.remaining == 0:
+					self.end_file()
+
+	def on_readable(self):
+		try:
+			length_m = self.conn.recv_into(self.view[self.filled:])
+			if length_m == 0:
+				print(self.who, "Connection is broken")
+				return False
+			self.filled += length_m
+			self.received += length_m
+			more = self.consume()
+			# move the unconsumed bytes to the front of the buffer
+			if self.pos == self.filled:
+				self.pos = self.filled = 0
+			elif self.pos > 0:
+				self.buf[:self.filled - self.pos] = self.view[self.pos:self.filled]
+				self.filled -= self.pos
+				self.pos = 0
+			if more:
+				return True
+			self.conn.sendall(STATUS.pack(self.stored, self.failed))
+		except (socket.error, OSError) as err:
+			print(self.who, "Connection error: ", err)
+			return False
+		elapsed = time.monotonic() - self.start
+		print(self.who, "[Completed] %d files stored, %d failed: %d bytes in %.3f s, %.2f KB/s, %.1f files/s" % (
+			self.stored, self.failed, self.received, elapsed, self.received / max(elapsed, 1e-9) / 1000.0,
+			(self.stored + self.failed) / max(elapsed, 1e-9)))
+		return False
+
+	def close(self):
+		if self.f != None:
+			self.f.close()
+		self.conn.close()
+
+
 def main(argv):
 	# set port number
 	# default is 32341 if no input argument
 	port_number = 32341
-	if len(sys.argv) == 2:
-		port_number = int(sys.argv[1])
+	if len(argv) >= 2:
+		port_number = int(argv[1])
+	max_conns = MAX_CONNS
+	if len(argv) == 3:
+		max_conns = int(argv[2])
 
 	# create socket and bind
 	sockfd = socket.socket()
+	sockfd.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 	try:
 		sockfd.bind(("", port_number))
 	except socket.error as err:
 		print("Socket bind error: ", err)
 		sys.exit(1)
 
+	# listen; the pending connections wait in the backlog while the limit is reached
+	sockfd.listen(max_conns)
+	sockfd.setblocking(False)
+	sel = selectors.DefaultSelector()
+	sel.register(sockfd, selectors.EVENT_READ)
+	uploads = {}
+	print("Serving on port", port_number, "with at most", max_conns, "connections")
 
-	# listen and accept new connection
-	sockfd.listen(5)
 	try:
-		new, who = sockfd.accept() # Return the TCP connection
-	except socket.error as err:
-		print("Socket accept error: ", err)
-		sys.exit(1)
-	
-	# print out peer socket address information
-	print("Peer socket address information : ", who)
-
-	# receive file name, file size; and create the file
-	try:
-		data = new.recv(100)
-	except socket.error as err:
-		print("Recv error: ", err)
-		sys.exit(1)
-	if data == b'':
-		print("Connection is broken")
-		sys.exit(1)
-
-	file_name, file_size = data.split(b':')
-	
-	try:
-		f = open(file_name, "wb")
-	except OSError as err:
-		print("File open error: ", err)
-		sys.exit(1)
-	temp_filesize = int(file_size)
-
-	# send acknowledge - e.g., "OK"
-	new.send(b"OK")
-
-	# receive the file contents
-	print("Start receiving . . .")
-	while (temp_filesize > 0):
-		message = new.recv(1000)
-		length_m = len(message)
-		if message == b"":
-			print("Connection is broken")
-			sys.exit(1)
-		f.write(message)
-		temp_filesize = temp_filesize - length_m 
-
-	# close connection
-	print("[Completed]")
-	sockfd.close()
-	new.close()
-	f.close()
+		while True:
+			for key, _ in sel.select():
+				if key.fileobj is sockfd:
+					try:
+						new, who = sockfd.accept() # Return the TCP connection
+					except BlockingIOError:
+						continue
+					except socket.error as err:
+						print("Socket accept error: ", err)
+						continue
+					# print out peer socket address information
+					print("Peer socket address information : ", who)
+					upload = Upload(new, who)
+					uploads[upload.fileno()] = upload
+					sel.register(upload, selectors.EVENT_READ)
+					if len(uploads) == max_conns:
+						sel.unregister(sockfd)
+					continue
+				upload = key.fileobj
+				if upload.on_readable():
+					continue
+				# close connection
+				sel.unregister(upload)
+				del uploads[upload.fileno()]
+				upload.close()
+				if len(uploads) == max_conns - 1:
+					sel.register(sockfd, selectors.EVENT_READ)
+	except KeyboardInterrupt:
+		print("Server stopped")
+	finally:
+		for upload in uploads.values():
+			upload.close()
+		sel.close()
+		sockfd.close()
 
 
 if __name__ == '__main__':
-	if len(sys.argv) > 2:
-		print("Usage: FTserver [<Server_port>]")
+	if len(sys.argv) > 3:
+		print("Usage: FTserver [<Server_port> [<Max_connections>]]")
 		sys.exit(1)
 	main(sys.argv)
\ No newline at end of file
@@ -1,20 +1,78 @@
 #!/usr/bin/python
 
 import socket
-import os.path
+import struct
+import os
+import time
 import sys
 
+# files up to this size are packed together into one send
+BUF_SIZE = 256 * 1024
+
+# every file is sent as: header (name length, file size), name, contents;
+# a header with name length 0 ends the connection, and the server replies
+# with one status (files stored, files failed)
+HEADER = struct.Struct('!HQ')
+STATUS = struct.Struct('!II')
+
+def list_files(paths):
+	# (path to read, name to send) of the files; directories are sent with their contents
+	files = []
+	for path in paths:
+		if not os.path.isdir(path):
+			files.append((path, os.path.basename(path)))
+			continue
+		top = os.path.dirname(os.path.normpath(path))
+		for dir_path, dir_names, file_names in os.walk(path):
+			dir_names.sort()
+			for file_name in sorted(file_names):
+				full = os.path.join(dir_path, file_name)
+				files.append((full, os.path.relpath(full, top)))
+	return files
+
+def send_files(sockfd, files):
+	# send all the files back to back and wait for the status reply;
+	# returns (files stored, files failed)
+	out = bytearray()
+	for path, name in files:
+		name = name.encode('utf-8')
+		with open(path, "rb") as target_file:
+			file_size = os.fstat(target_file.fileno()).st_size
+			out += HEADER.pack(len(name), file_size) + name
+			if file_size <= BUF_SIZE:
+				data = target_file.read(file_size)
+				if len(data) != file_size:
+					raise OSError("%s changed while sending" % path)
+				out += data
+				if len(out) >= BUF_SIZE:
+					sockfd.sendall(out)
+					out.clear()
+				continue
+			sockfd.sendall(out)
+			out.clear()
+			if sockfd.sendfile(target_file, 0, file_size) != file_size:
+				raise OSError("%s changed while sending" % path)
+	out += HEADER.pack(0, 0)
+	sockfd.sendall(out)
+
+	# receive the status
+	status = b''
+	while len(status) < STATUS.size:
+		r_msg = sockfd.recv(STATUS.size - len(status))
+		if r_msg == b'':
+			raise OSError("Connection is broken")
+		status += r_msg
+	return STATUS.unpack(status)
+
 def main(argv):
 
-	# open the target file; get file size
+	# list the target files
 	try:
-		file_size = os.path.getsize(argv[3])
+		files = list_files(argv[3:])
 	except os.error as err:
 		print("File error: ", err)
 		sys.exit(1)
 
-	target_file = open(argv[3], "rb")
-
 	# create socket and connect to server
 	try:
 		sockfd = socket.socket()
@@ -23,45 +81,30 @@ def main(argv):
 		print("Socket error: ", err)
 		sys.exit(1)
 
-	# once the connection is set up; print out 
+	# once the connection is set up; print out
 	# the socket address of your local socket
 	print("The socket address is: " , sockfd.getsockname())
 
-	# send file name and file size as one string separate by ':'
-	# e.g., socketprogramming.pdf:435678
-	message = argv[3]+ ":" + str(file_size)
-	sockfd.send(message.encode('ascii'))
-
-	# receive acknowledge - e.g., "OK"
-	r_msg = sockfd.recv(50)
-
-	if r_msg != b"OK":
-		print("Negative acknowledgment received")
+	# send the files
+	print("Start sending %d files ..." % len(files))
+	start = time.monotonic()
+	try:
+		stored, failed = send_files(sockfd, files)
+	except (socket.error, OSError) as err:
+		print("Send error: ", err)
 		sys.exit(1)
-
-	# send the file contents
-	print("Start sending ...")
-	temp_filesize = file_size
-	block_size = 1000
-	while (temp_filesize > 0) :
-		data = target_file.read(block_size)
-		length_data = len(data)
-		if length_data == 0:
-			sys.exit(1)
-		try:
-			sockfd.sendall(data)
-		except socket.error as err:
-			print("Sendall error: ", err)
-			sys.exit(1)
-		temp_filesize = temp_filesize - length_data
+	elapsed = time.monotonic() - start
 
 	# close connection
-	print("[Completed]")
+	print("[Completed] %d files stored, %d failed in %.3f s, %.1f files/s" % (stored, failed, elapsed,
+		len(files) / max(elapsed, 1e-9)))
 	sockfd.close()
+	if failed:
+		sys.exit(1)
 
 
 if __name__ == '__main__':
-	if len(sys.argv) != 4:
-		print("Usage: FTclient.py <Server_addr> <Server_port> <filename>")
+	if len(sys.argv) < 4:
+		print("Usage: FTclient.py <Server_addr> <Server_port> <filename or directory> ...")
 		sys.exit(1)
 	main(sys.argv)
\ No newline at end of file
@@ -0,0 +1,69 @@
+#!/usr/bin/python
+"""Benchmark: files per second for small-file uploads to FTserver.py,
+all files pipelined over one connection against one connection per file
+
+Usage:  bench-files.py  [<no. of files> [<file sizes (bytes)> ...]]
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "Folder"))
+import FTclient
+
+PORT = 32399
+
+def upload(files, pipelined):
+	# wall time to upload the files
+	start = time.monotonic()
+	batches = [files] if pipelined else [[f] for f in files]
+	for batch in batches:
+		sockfd = socket.create_connection(("localhost", PORT))
+		stored, failed = FTclient.send_files(sockfd, batch)
+		sockfd.close()
+		if failed or stored != len(batch):
+			raise OSError("%d files failed" % (len(batch) - stored))
+	return time.monotonic() - start
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+	sizes = [int(x) for x in sys.argv[2:]] or [100, 1000, 10000]
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		store = os.path.join(workdir, "store")
+		os.mkdir(store)
+		server = subprocess.Popen([sys.executable, os.path.join(HERE, "FTserver.py"), str(PORT)], cwd=store,
+			stdout=subprocess.DEVNULL)
+		time.sleep(0.5)
+		try:
+			for size in sizes:
+				src = os.path.join(workdir, "files-%d" % size)
+				os.mkdir(src)
+				for i in range(count):
+					with open(os.path.join(src, "f%05d" % i), "wb") as f:
+						f.write(os.urandom(size))
+				files = FTclient.list_files([src])
+				for pipelined in (False, True):
+					elapsed = upload(files, pipelined)
+					rows.append((size, "one connection" if pipelined else "per file", "%.3f" % elapsed,
+						"%.1f" % (count / elapsed), "%.2f" % (count * size / elapsed / 1000.0)))
+					print("%d B files, %s: %.1f files/s" % (size, rows[-1][1], count / elapsed))
+		finally:
+			server.terminate()
+			server.wait()
+
+	print()
+	header = ("file size", "connections", "time (s)", "files/s", "KB/s")
+	widths = [max(len(str(r[i])) for r in rows + [header]) for i in range(len(header))]
+	for r in [header] + rows:
+		print("  ".join(str(v).rjust(w) for v, w in zip(r, widths)))
+
+
+if __name__ == '__main__':
+	main()
\ No newline at end of file
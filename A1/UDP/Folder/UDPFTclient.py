@@ -1,10 +1,99 @@
 #!/usr/bin/python
 
 import socket
+import struct
 import os.path
+import time
 import sys
 
-def main(argv):
+# bulk mode: file contents per datagram
+BULK_BLOCK = 1400
+# bulk mode: wait this long for a reply before asking again (s), and no. of tries
+REPLY_TIMEOUT = 0.5
+REPLY_TRIES = 20
+# bulk mode: the parts of one NACK reply come back to back; wait this long for the next (s)
+PART_TIMEOUT = 0.05
+
+# bulk mode datagrams start with a NUL byte (see UDPFTserver.py)
+BULK = b'\0'
+START = struct.Struct('!QH')
+SEQ = struct.Struct('!I')
+NACK = struct.Struct('!IHHH')
+RANGE = struct.Struct('!II')
+
+def ask(sockfd, server, message, answer):
+	# send a control message until a reply of the given types arrives
+	for i in range(REPLY_TRIES):
+		sockfd.sendto(message, server)
+		deadline = time.monotonic() + REPLY_TIMEOUT
+		while True:
+			sockfd.settimeout(max(deadline - time.monotonic(), 0.001))
+			try:
+				reply, who = sockfd.recvfrom(65536)
+			except socket.timeout:
+				break
+			if reply[:1] == BULK and answer(reply):
+				return reply
+	return None
+
+def nack_ranges(reply):
+	# (part, parts, ranges) of a NACK reply
+	pass_no, part, parts, count = NACK.unpack_from(reply, 2)
+	return part, parts, [RANGE.unpack_from(reply, 2 + NACK.size + i * RANGE.size) for i in range(count)]
+
+def send_bulk(sockfd, server, name, fd, file_size, rate):
+	# blast sequence-numbered blocks at the given rate (bytes/s, 0 = no limit),
+	# then repair the blocks the server reports missing, pass after pass;
+	# returns (no. of passes, blocks resent) or None if the server stopped answering
+	reply = ask(sockfd, server, BULK + b'S' + START.pack(file_size, BULK_BLOCK) + name,
+		lambda r: r[1:2] in (b'A', b'R'))
+	if reply == None or reply[1:2] == b'R':
+		print("Server rejected the file" if reply else "No reply from the server")
+		return None
+
+	blocks = (file_size + BULK_BLOCK - 1) // BULK_BLOCK
+	todo = [(0, blocks - 1)] if blocks else []
+	pass_no = 0
+	resent = 0
+	sent_bytes = 0
+	start = time.monotonic()
+	while True:
+		pass_no += 1
+		for first, last in todo:
+			for seq in range(first, last + 1):
+				data = os.pread(fd, BULK_BLOCK, seq * BULK_BLOCK)
+				sockfd.sendto(BULK + b'D' + SEQ.pack(seq) + data, server)
+				sent_bytes += len(data)
+				if pass_no > 1:
+					resent += 1
+				# keep to the rate
+				if rate:
+					ahead = start + sent_bytes / rate - time.monotonic()
+					if ahead > 0.001:
+						time.sleep(ahead)
+		reply = ask(sockfd, server, BULK + b'E' + SEQ.pack(pass_no),
+			lambda r: r[1:2] == b'N' and len(r) >= 2 + NACK.size and NACK.unpack_from(r, 2)[0] == pass_no)
+		if reply == None:
+			print("No reply from the server")
+			return None
+		# collect the other parts of the reply; a lost part is left to the next pass
+		part, parts, ranges = nack_ranges(reply)
+		got = {part: ranges}
+		while len(got) < parts:
+			sockfd.settimeout(PART_TIMEOUT)
+			try:
+				reply, who = sockfd.recvfrom(65536)
+			except socket.timeout:
+				break
+			if reply[:2] == BULK + b'N' and len(reply) >= 2 + NACK.size and NACK.unpack_from(reply, 2)[0] == pass_no:
+				part, parts, ranges = nack_ranges(reply)
+				got[part] = ranges
+		todo = [r for part in sorted(got) for r in got[part]]
+		if not todo:
+			return pass_no, resent
+		print("Pass %d: %d blocks missing" % (pass_no, sum(last - first + 1 for first, last in todo)))
+
+def main(argv, bulk):
 
 	# open the target file; get file size
 	try:
@@ -22,6 +111,22 @@ def main(argv):
 		print("Socket error: ", err)
 		sys.exit(1)
 
+	if bulk != None:
+		print("Start sending in bulk mode ...")
+		start = time.monotonic()
+		try:
+			result = send_bulk(sockfd, (argv[1], int(argv[2])), argv[3].encode('ascii'), target_file.fileno(),
+				file_size, bulk * 1000)
+		except socket.error as err:
+			print("Sendto error: ", err)
+			sys.exit(1)
+		if result == None:
+			sys.exit(1)
+		elapsed = time.monotonic() - start
+		print("[Completed] %d bytes in %.3f s, %.2f KB/s, %d passes, %d blocks resent" % (file_size, elapsed,
+			file_size / max(elapsed, 1e-9) / 1000.0, result[0], result[1]))
+		sockfd.close()
+		return
 
 	# send file name and file size as one string separate by ':'
 	# e.g., socketprogramming.pdf:435678
@@ -56,7 +161,14 @@ def main(argv):
 
 
 if __name__ == '__main__':
-	if len(sys.argv) != 4:
-		print("Usage: FTclient.py <Server_addr> <Server_port> <filename>")
+	# --bulk[=<rate in KB/s>]: sequence-numbered blocks with NACK repair
+	bulk = None
+	if len(sys.argv) == 5 and sys.argv[4].split('=')[0] == "--bulk":
+		try:
+			bulk = float(sys.argv[4].split('=')[1]) if '=' in sys.argv[4] else 0
+		except ValueError:
+			bulk = -1
+	if not (len(sys.argv) == 4 or (bulk != None and bulk >= 0)):
+		print("Usage: FTclient.py <Server_addr> <Server_port> <filename> [--bulk[=<rate (KB/s)>]]")
 		sys.exit(1)
-	main(sys.argv)
\ No newline at end of file
+	main(sys.argv, bulk)
\ No newline at end of file
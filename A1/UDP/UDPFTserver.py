@@ -1,8 +1,117 @@
 #!/usr/bin/python
 
 import socket
+import struct
+import collections
+import os
+import time
 import sys
 
+# a session silent for this long is given up (s)
+IDLE = 30.0
+# no. of NACK ranges that fit in one datagram, and most datagrams of one reply
+MAX_RANGES = 160
+MAX_PARTS = 64
+
+# bulk mode datagrams start with a NUL byte, which no "name:size" header does:
+#   b'\0S' + (file size, block size) + file name   start  (client -> server)
+#   b'\0A' / b'\0R'                                accept / reject the start
+#   b'\0D' + (sequence no.) + contents             one block of the file
+#   b'\0E' + (pass no.)                            end of a sending pass
+#   b'\0N' + (pass no., part, parts, count) + count x (first, last)
+#                                                  blocks still missing, in parts
+BULK = b'\0'
+START = struct.Struct('!QH')
+SEQ = struct.Struct('!I')
+NACK = struct.Struct('!IHHH')
+RANGE = struct.Struct('!II')
+
+class PlainUpload:
+	# the original protocol: "name:size", then the contents in datagrams
+	def __init__(self, f, file_size):
+		self.f = f
+		self.remaining = file_size
+		self.last = time.monotonic()
+
+	def on_datagram(self, sockfd, data, who):
+		self.f.write(data)
+		self.remaining = self.remaining - len(data)
+		if self.remaining > 0:
+			return True
+		print(who, "[Completed]")
+		return False
+
+	def close(self):
+		self.f.close()
+
+class BulkUpload:
+	# bulk mode: sequence-numbered blocks in any order, with an arrival map
+	# (one byte per block, so that the gaps are found with bytearray.find)
+	def __init__(self, f, file_size, block):
+		self.f = f
+		self.file_size = file_size
+		self.block = block
+		self.blocks = (file_size + block - 1) // block
+		self.got = bytearray(self.blocks)
+		self.count = 0
+		self.duplicates = 0
+		self.start = self.last = time.monotonic()
+		f.truncate(file_size)
+
+	def missing(self):
+		# ranges of the blocks not yet received
+		ranges = []
+		pos = self.got.find(0)
+		while pos != -1 and len(ranges) < MAX_RANGES * MAX_PARTS:
+			end = self.got.find(1, pos)
+			if end == -1:
+				end = self.blocks
+			ranges.append((pos, end - 1))
+			pos = self.got.find(0, end)
+		return ranges
+
+	def on_datagram(self, sockfd, data, who):
+		if data[:1] != BULK or len(data) < 2 + SEQ.size:
+			return True
+		if data[1:2] == b'D':
+			seq, = SEQ.unpack_from(data, 2)
+			payload = data[2 + SEQ.size:]
+			if seq >= self.blocks or len(payload) != min(self.block, self.file_size - seq * self.block):
+				return True
+			if self.got[seq]:
+				self.duplicates += 1
+				return True
+			os.pwrite(self.f.fileno(), payload, seq * self.block)
+			self.got[seq] = 1
+			self.count += 1
+		elif data[1:2] == b'E':
+			# end of a pass: reply with what is still missing
+			pass_no, = SEQ.unpack_from(data, 2)
+			ranges = self.missing()
+			parts = max((len(ranges) + MAX_RANGES - 1) // MAX_RANGES, 1)
+			for part in range(parts):
+				chunk = ranges[part * MAX_RANGES:(part + 1) * MAX_RANGES]
+				sockfd.sendto(BULK + b'N' + NACK.pack(pass_no, part, parts, len(chunk)) +
+					b''.join(RANGE.pack(*r) for r in chunk), who)
+			if not ranges:
+				elapsed = time.monotonic() - self.start
+				print(who, "[Completed] %d bytes in %.3f s, %.2f KB/s, %d passes, %d duplicate blocks" % (
+					self.file_size, elapsed, self.file_size / max(elapsed, 1e-9) / 1000.0, pass_no, self.duplicates))
+				return False
+		return True
+
+	def close(self):
+		self.f.close()
+
+
+def open_file(file_name, who):
+	# create the file in the server directory
+	try:
+		return open(os.path.basename(file_name), "wb")
+	except OSError as err:
+		print(who, "File open error: ", err)
+		return None
+
 def main(argv):
 	# set port number
 	# default is 32341 if no input argument
@@ -13,46 +122,90 @@ def main(argv):
 	# create socket and bind
 	sockfd = socket.socket(socket.AF_INET , socket.SOCK_DGRAM) # UDP
 	try:
+		sockfd.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
 		sockfd.bind(("", port_number))
 	except socket.error as err:
 		print("Socket bind error: ", err)
 		sys.exit(1)
+	sockfd.settimeout(1.0)
 
-	# receive file name, file size; and create the file
+	uploads = {}		# peer address -> its upload
+	finished = collections.OrderedDict()	# recently finished bulk peers, to repeat the last NACK
+	print("Serving on port", port_number)
 	try:
-		data = sockfd.recvfrom(100)
-		print("Remote peer info: " + str(data[1]))
-	except socket.error as err:
-		print("Recv error: ", err)
-		sys.exit(1)
-	if data == b'':
-		print("Connection is broken")
-		sys.exit(1)
+		while True:
+			try:
+				data, who = sockfd.recvfrom(65536)
+			except socket.timeout:
+				data = None
+			except socket.error as err:
+				print("Recv error: ", err)
+				continue
+			now = time.monotonic()
+			for peer in [p for p in uploads if now - uploads[p].last > IDLE]:
+				print(peer, "Session timed out; file incomplete")
+				uploads.pop(peer).close()
+			if data == None:
+				continue
 
-	file_name, file_size = data[0].split(b':')
-	
-	try:
-		f = open(file_name, "wb")
-	except OSError as err:
-		print("File open error: ", err)
-		sys.exit(1)
-	temp_filesize = int(file_size)
-
-	# receive the file contents
-	print("Start receiving . . .")
-	while (temp_filesize > 0):
-		message = sockfd.recvfrom(1000)
-		length_m = len(message[0])
-		if message == b"":
-			print("Connection is broken")
-			sys.exit(1)
-		f.write(message[0])
-		temp_filesize = temp_filesize - length_m
-
-	# close connection
-	print("[Completed]")
-	sockfd.close()
-	f.close()
+			upload = uploads.get(who)
+			if upload != None and not (data[:2] == BULK + b'S'):
+				upload.last = now
+				if not upload.on_datagram(sockfd, data, who):
+					uploads.pop(who).close()
+					if isinstance(upload, BulkUpload):
+						finished[who] = True
+						while len(finished) > 64:
+							finished.popitem(last=False)
+				continue
+
+			if data[:1] == BULK:
+				if data[1:2] == b'E' and who in finished and len(data) >= 2 + SEQ.size:
+					# the final NACK was lost
+					sockfd.sendto(BULK + b'N' + NACK.pack(SEQ.unpack_from(data, 2)[0], 0, 1, 0), who)
+					continue
+				if data[1:2] != b'S' or len(data) < 2 + START.size:
+					continue
+				file_size, block = START.unpack_from(data, 2)
+				file_name = data[2 + START.size:]
+				if upload != None:
+					# a repeated start: accept it again
+					if isinstance(upload, BulkUpload) and upload.file_size == file_size and upload.f.name == os.path.basename(file_name):
+						sockfd.sendto(BULK + b'A', who)
+						continue
+					upload.close()
+					del uploads[who]
+				finished.pop(who, None)
+				f = open_file(file_name, who) if block > 0 else None
+				if f == None:
+					sockfd.sendto(BULK + b'R', who)
+					continue
+				print(who, "Start receiving", file_name.decode('ascii', 'replace'), "(%d bytes, bulk mode)" % file_size)
+				uploads[who] = BulkUpload(f, file_size, block)
+				sockfd.sendto(BULK + b'A', who)
+				continue
+
+			# receive file name, file size; and create the file
+			try:
+				file_name, file_size = data.split(b':')
+				file_size = int(file_size)
+			except ValueError:
+				continue
+			print("Remote peer info: " + str(who))
+			f = open_file(file_name, who)
+			if f == None:
+				continue
+			print("Start receiving . . .")
+			if file_size > 0:
+				uploads[who] = PlainUpload(f, file_size)
+			else:
+				f.close()
+	except KeyboardInterrupt:
+		print("Server stopped")
+	finally:
+		for upload in uploads.values():
+			upload.close()
+		sockfd.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+"""Benchmark: aggregate throughput and per-client fairness of the
+multi-client server (test-server3.py --serve) against the no. of clients
+
+Usage:  bench-clients.py  <file size (bytes)>  <drop rate>  <error rate>  <Window size>  [client counts ...]
+"""
+
+import sys
+import tempfile
+import benchlib
+
+WORKERS = 8		#worker processes of the server
+
+
+def fairness(rates):
+	"""Jain's fairness index: 1 when all clients get the same throughput"""
+	return sum(rates) ** 2 / (len(rates) * sum(r * r for r in rates)) if rates else 0
+
+
+def main():
+
+	if len(sys.argv) < 5:
+		print("Usage:  "+sys.argv[0]+"  <file size (bytes)>  <drop rate>  <error rate>  <Window size>  [client counts ...]")
+		sys.exit(0)
+	size = int(sys.argv[1])
+	counts = [int(x) for x in sys.argv[5:]] or [1, 2, 4, 8, 16]
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		for n in counts:
+			filenames = ["client%d.bin" % i for i in range(n)]
+			for filename in filenames:
+				benchlib.make_file(workdir + "/" + filename, size)
+			result = benchlib.run_clients(workdir, filenames, sys.argv[2], sys.argv[3], sys.argv[4], WORKERS)
+			done = [r for r in result["clients"] if r != None]
+			rates = [r["throughput"] for r in done]
+			intact = sum(1 for r in done if r["same"])
+			if not rates:
+				rows.append((n, "%.3f" % result["wall"], "-", "-", "-", "-", "0/%d" % n))
+				continue
+			rows.append((n, "%.3f" % result["wall"], "%.2f" % (size * len(done) / result["wall"] / 1000.0),
+				"%.2f" % min(rates), "%.2f" % max(rates), "%.3f" % fairness(rates), "%d/%d" % (intact, n)))
+			print("%d clients: %.2f KB/s aggregate" % (n, size * len(done) / result["wall"] / 1000.0))
+
+	print()
+	benchlib.print_table(("clients", "wall (s)", "aggregate KB/s", "min KB/s", "max KB/s", "fairness", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+"""Benchmark: throughput and CPU cost of the compression stage on
+compressible (CSV-like text) and incompressible (random) files
+
+Usage:  bench-compress.py  <file size (bytes)>  <drop rate>  <error rate>  <Window size>  [levels ...]
+"""
+
+import sys
+import tempfile
+import benchlib
+
+
+def main():
+
+	if len(sys.argv) < 5:
+		print("Usage:  "+sys.argv[0]+"  <file size (bytes)>  <drop rate>  <error rate>  <Window size>  [levels ...]")
+		sys.exit(0)
+	size = int(sys.argv[1])
+	levels = [int(x) for x in sys.argv[5:]] or [0, 1, 6]
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		for kind in ("text", "random"):
+			filename = "compress-%s.bin" % kind
+			benchlib.make_file(workdir + "/" + filename, size, kind)
+			for level in levels:
+				opts = ["--compress=%d" % level] if level else []
+				result = benchlib.run_transfer(workdir, filename, sys.argv[2], sys.argv[3], sys.argv[4], client_opts=opts)
+				if result == None:
+					rows.append((kind, level or "off", "-", "-", "-", "-", "FAILED"))
+					continue
+				match = benchlib.COMP_RE.search(result["client_out"])
+				ratio = match.group(1).decode("ascii") if match else "1.00"
+				rows.append((kind, level or "off", "%.3f" % result["elapsed"], "%.2f" % result["throughput"],
+					ratio, "%.3f" % result["client_cpu"] if result["client_cpu"] != None else "n/a",
+					"yes" if result["same"] else "NO"))
+				print("%s level %s: %.2f KB/s, ratio %s" % (kind, level or "off", result["throughput"], ratio))
+
+	print()
+	benchlib.print_table(("data", "level", "time (s)", "KB/s", "ratio", "client CPU (s)", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
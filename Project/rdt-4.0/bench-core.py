@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+"""Benchmark: packets per second of the sans-IO protocol core alone, with
+no sockets, no clock and no packet trace
+
+The core plays both ends of the connection: every datagram it returns is
+fed straight back to it (DATA to its receiver, ACKs to its sender), less
+the ones dropped at the given rate. When nothing is in flight the clock
+jumps to the next timer event, so timeouts cost no waiting.
+
+Usage:  bench-core.py  <drop rate>  <Window size>  [no. of packets]
+"""
+
+import sys
+import os
+import time
+import random
+import importlib
+import collections
+import benchlib
+import rdt4
+
+MODES = (
+	("inet", lambda rdt: None),
+	("crc32", lambda rdt: rdt.rdt_set_integrity("crc32")),
+	("crc32+sack", lambda rdt: (rdt.rdt_set_integrity("crc32"), rdt.rdt_set_sack(True))),
+	("crc32+fec=4", lambda rdt: (rdt.rdt_set_integrity("crc32"), rdt.rdt_set_fec(4))),
+)
+
+
+def run_core(setup, drop, W, count):
+	"""Push count DATA packets through a fresh core
+
+	Return  -> (seconds, no. of datagrams the core has taken in)
+	"""
+	rdt = importlib.reload(rdt4)  # fresh connection state
+	rdt.rdt_network_init(0, 0, W)
+	setup(rdt)
+	rdt.rdt_set_logging(False)
+	msg = os.urandom(W * rdt.PAYLOAD)
+	rng = random.Random(1)
+	inflight = collections.deque()
+	now = 0.0
+	steps = delivered = 0
+	start = time.perf_counter()
+	while delivered < count:
+		if rdt.rdt_core_pending() < W:
+			rdt.rdt_core_send(msg)
+		recv_pkt = inflight.popleft() if inflight else None
+		out, got, deadline = rdt.rdt_core_step(now, recv_pkt)
+		steps += recv_pkt is not None
+		delivered += len(got)
+		for pkt in out:
+			if drop == 0 or rng.random() >= drop:
+				inflight.append(pkt)
+		if not inflight and deadline is not None:
+			now = deadline
+	return (time.perf_counter() - start, steps)
+
+
+def main():
+
+	if len(sys.argv) < 3:
+		print("Usage:  "+sys.argv[0]+"  <drop rate>  <Window size>  [no. of packets]")
+		sys.exit(0)
+	drop, W = float(sys.argv[1]), int(sys.argv[2])
+	count = int(sys.argv[3]) if len(sys.argv) > 3 else 100000
+
+	rows = []
+	for mode, setup in MODES:
+		elapsed, steps = run_core(setup, drop, W, count)
+		rows.append((mode, "%.3f" % elapsed, "%.0f" % (count / elapsed), "%.0f" % (steps / elapsed),
+			"%.2f" % (count * rdt4.PAYLOAD / elapsed / 1e6)))
+		print("%s: %.0f packets/s" % (mode, count / elapsed))
+
+	print()
+	benchlib.print_table(("mode", "time (s)", "DATA/s", "datagrams in/s", "MB/s"), rows)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""Benchmark: re-uploading a changed file in full against sending only the
+delta to the copy the server already holds (--delta)
+
+The server holds the old version of the file in ./Store; the new version
+differs from it in 16 scattered regions that make up the given fraction
+of the file (one of them is an insertion, which shifts all the data behind
+it). In delta mode the server sends the block signatures of its copy and
+the client sends block references and the changed bytes. The bytes on the
+wire are the payload bytes of the messages both ways, not counting
+retransmissions.
+
+Usage:  bench-delta.py  <drop rate>  <error rate>  <Window size>  [file size in KB]
+"""
+
+import sys
+import os
+import random
+import tempfile
+import benchlib
+
+FRACTIONS = (0.0, 0.001, 0.01, 0.1, 0.5, 1.0)
+REGIONS = 16		#no. of changed regions
+
+
+def change_file(src, dst, fraction):
+	"""Write a copy of src to dst with the given fraction of it changed"""
+	with open(src, "rb") as fobj:
+		data = bytearray(fobj.read())
+	if fraction >= 1.0:
+		data = bytearray(os.urandom(len(data)))
+	elif fraction > 0:
+		size = max(int(len(data) * fraction / REGIONS), 1)
+		for i in range(REGIONS):
+			pos = random.randrange(i * len(data) // REGIONS, (i + 1) * len(data) // REGIONS - size)
+			if i == REGIONS // 2:
+				data[pos:pos] = os.urandom(size)
+			else:
+				data[pos:pos+size] = os.urandom(size)
+	with open(dst, "wb") as fobj:
+		fobj.write(data)
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		print("Usage:  "+sys.argv[0]+"  <drop rate>  <error rate>  <Window size>  [file size in KB]")
+		sys.exit(0)
+	size = float(sys.argv[4]) if len(sys.argv) > 4 else 2000
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		old = os.path.join(workdir, "old.bin")
+		benchlib.make_file(old, int(size * 1000))
+		for fraction in FRACTIONS:
+			change_file(old, os.path.join(workdir, "delta.bin"), fraction)
+			filelength = os.path.getsize(os.path.join(workdir, "delta.bin"))
+			for mode, opts in (("full", []), ("delta", ["--delta"])):
+				result = benchlib.run_transfer(workdir, "delta.bin", sys.argv[1], sys.argv[2], sys.argv[3],
+					opts, [], basis=old)
+				if result == None:
+					rows.append(("%.1f" % (fraction * 100), mode, "-", "-", "-", "-", "-", "FAILED"))
+					print(rows[-1])
+					continue
+				sent, sigs = filelength, 0
+				match = benchlib.DELTA_RE.search(result["client_out"])
+				if match != None:
+					sigs, sent = int(match.group(3)), int(match.group(4))
+				rows.append(("%.1f" % (fraction * 100), mode, sent, sigs, "%.1f" % ((sent + sigs) * 100 / filelength),
+					"%.3f" % result["elapsed"], "%.3f" % result["client_wall"], "yes" if result["same"] else "NO"))
+				print(rows[-1])
+
+	print()
+	benchlib.print_table(("changed %", "mode", "bytes sent", "signature bytes", "wire % of file",
+		"time (s)", "client wall (s)", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,141 @@
+#!/usr/bin/python3
+"""Benchmark: datagrams per byte with the ACKs piggybacked on the DATA
+going back and delayed pure ACKs, against a pure ACK for every DATA
+packet (rdt_set_ack_delay(0))
+
+Two peer processes on localhost run one of the workloads:
+  one-way   peer A sends, peer B only ACKs (blocking mode)
+  echo      A sends one-packet requests, B answers each (blocking mode)
+  duplex    both send at once and receive in a thread (--threaded mode)
+The datagrams are those of both peers, of any type, including the ones
+the unreliable layer then loses.
+
+Usage:  bench-duplex.py  <drop rate>  <error rate>  <Window size>  [KB per direction]
+"""
+
+import sys
+import os
+import time
+import threading
+import multiprocessing
+import benchlib
+import rdt4 as rdt
+
+WORKLOADS = ("one-way", "echo", "duplex")
+ECHO_SIZE = 500		#bytes of an echo request or answer
+PEER_TIMEOUT = 300	#seconds a workload may take
+
+
+def receive(sockfd, size):
+	"""Return  -> no. of bytes received, up to size"""
+	got = 0
+	while got < size:
+		rmsg = rdt.rdt_recv(sockfd, size - got)
+		if rmsg == b'':
+			break
+		got += len(rmsg)
+	return got
+
+
+def send(sockfd, size, MSG_LEN):
+	"""Return  -> no. of bytes sent, up to size"""
+	sent = 0
+	while sent < size:
+		osize = rdt.rdt_send(sockfd, os.urandom(min(MSG_LEN, size - sent)))
+		if osize < 0:
+			break
+		sent += osize
+	return sent
+
+
+def peer(role, workload, delay, args, size, results):
+	"""Peer process: run its side of the workload and put (role, stats,
+	elapse time, bytes moved) in results"""
+	sys.stdout = open(os.devnull, "w")	#the unreliable layer reports every loss
+	rdt.rdt_network_init(args[1], args[2], args[3])
+	rdt.rdt_set_logging(False)
+	rdt.rdt_set_ack_delay(delay)
+	MSG_LEN = rdt.PAYLOAD * int(args[3])
+	sockfd = rdt.rdt_socket()
+	rdt.rdt_bind(sockfd, rdt.CPORT if role == "A" else rdt.SPORT)
+	rdt.rdt_peer("localhost", rdt.SPORT if role == "A" else rdt.CPORT)
+	if workload == "duplex":
+		rdt.rdt_start_io(sockfd)
+
+	starttime = time.monotonic()
+	moved = 0
+	if workload == "one-way":
+		moved = send(sockfd, size, MSG_LEN) if role == "A" else receive(sockfd, size)
+	elif workload == "echo":
+		for i in range(size // ECHO_SIZE):
+			if role == "A":
+				moved += send(sockfd, ECHO_SIZE, MSG_LEN) + receive(sockfd, ECHO_SIZE)
+			else:
+				moved += receive(sockfd, ECHO_SIZE) + send(sockfd, ECHO_SIZE, MSG_LEN)
+	else:
+		got = []
+		reader = threading.Thread(target=lambda: got.append(receive(sockfd, size)))
+		reader.start()
+		moved = send(sockfd, size, MSG_LEN)
+		rdt.rdt_flush(sockfd)
+		reader.join()
+		moved += got[0]
+	lapsed = time.monotonic() - starttime
+	rdt.rdt_close(sockfd)
+	results.put((role, rdt.rdt_stats(), lapsed, moved))
+
+
+def run_workload(workload, delay, args, size):
+	"""Run both peers of a workload
+
+	Return  -> (datagrams, pure ACKs, piggybacked ACKs, bytes moved,
+	elapse time) summed over the peers, None on failure
+	"""
+	ctx = multiprocessing.get_context("spawn")
+	results = ctx.Queue()
+	peers = [ctx.Process(target=peer, args=(role, workload, delay, args, size, results)) for role in "BA"]
+	for p in peers:
+		p.start()
+		time.sleep(0.2)
+	try:
+		done = [results.get(timeout=PEER_TIMEOUT) for p in peers]
+	except Exception:
+		done = None
+	for p in peers:
+		p.join(5)
+		if p.is_alive():
+			p.terminate()
+	if done is None:
+		return None
+	return (sum(r[1]["datagrams_sent"] for r in done), sum(r[1]["acks_sent"] for r in done),
+		sum(r[1]["acks_piggybacked"] for r in done), sum(r[3] for r in done), max(r[2] for r in done))
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		print("Usage:  "+sys.argv[0]+"  <drop rate>  <error rate>  <Window size>  [KB per direction]")
+		sys.exit(0)
+	size = int(float(sys.argv[4]) * 1000) if len(sys.argv) > 4 else 500000
+
+	rows = []
+	for workload in WORKLOADS:
+		#the echo round trips are slow; keep their count in proportion
+		amount = size // 10 if workload == "echo" else size
+		for mode, delay in (("ACK each", 0), ("piggyback", rdt.ACK_DELAY)):
+			result = run_workload(workload, delay, sys.argv, amount)
+			if result == None:
+				rows.append((workload, mode, "-", "-", "-", "-", "-", "FAILED"))
+			else:
+				datagrams, acks, piggybacked, moved, lapsed = result
+				rows.append((workload, mode, datagrams, acks, piggybacked, "%.2f" % (datagrams * 1000 / max(moved, 1)),
+					"%.3f" % lapsed, "%.2f" % (moved / lapsed / 1000)))
+			print(rows[-1])
+
+	print()
+	benchlib.print_table(("workload", "ACKs", "datagrams", "pure ACKs", "piggybacked", "datagrams/KB",
+		"time (s)", "KB/s"), rows)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,44 @@
+#!/usr/bin/python3
+"""Benchmark: goodput against the loss rate, without FEC and with XOR
+parity over groups of K packets
+
+Usage:  bench-fec.py  <file size (bytes)>  <error rate>  <Window size>  [drop rates ...]
+"""
+
+import sys
+import tempfile
+import benchlib
+
+GROUPS = (0, 8, 4)	#FEC group sizes; 0 is off
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		print("Usage:  "+sys.argv[0]+"  <file size (bytes)>  <error rate>  <Window size>  [drop rates ...]")
+		sys.exit(0)
+	size = int(sys.argv[1])
+	rates = [float(x) for x in sys.argv[4:]] or [0.0, 0.01, 0.02, 0.05, 0.1]
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		benchlib.make_file(workdir + "/fec.bin", size)
+		for drop in rates:
+			for k in GROUPS:
+				opts = ["--fec=%d" % k] if k else []
+				result = benchlib.run_transfer(workdir, "fec.bin", drop, sys.argv[2], sys.argv[3], client_opts=opts)
+				if result == None:
+					rows.append((drop, k or "off", "-", "-", "-", "FAILED"))
+					continue
+				match = benchlib.FEC_RE.search(result["server_out"])
+				rebuilt = match.group(1).decode("ascii") if match else "0"
+				rows.append((drop, k or "off", "%.3f" % result["elapsed"], "%.2f" % result["throughput"],
+					rebuilt, "yes" if result["same"] else "NO"))
+				print("drop %g FEC %s: %.2f KB/s, %s packets rebuilt" % (drop, k or "off", result["throughput"], rebuilt))
+
+	print()
+	benchlib.print_table(("drop rate", "FEC K", "time (s)", "goodput KB/s", "rebuilt", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
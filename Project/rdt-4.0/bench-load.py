@@ -0,0 +1,477 @@
+#!/usr/bin/python3
+"""Load generator: many clients uploading at once to one
+test-server3.py --serve, with tail-latency reporting
+
+All the clients run in this one process: each has its own instance of
+the rdt4 module (the module holds the state of one connection) and one
+select loop drives their sans-IO cores. A client speaks the protocol of
+test-client3.py with the default options - the request with the first
+window of data, the file, then the digest - and is done when the server
+answers MATCH. The clients arrive at random (Poisson) at the given rate,
+or all at once, with file sizes drawn from the given distribution; the
+same seed gives the same sizes and arrival times.
+
+The report gives the p50/p90/p99 completion time (arrival to MATCH), the
+aggregate goodput, the share of the datagrams sent by the clients that
+were retransmissions, and the CPU time of the server with its workers.
+Each run is appended as a JSON line to the results file, labelled with
+the git version of the tree, and the runs in it with the same settings
+are listed side by side.
+
+Usage:  bench-load.py  <drop rate>  <error rate>  <Window size>  [options]
+"""
+
+import sys
+import os
+import time
+import math
+import json
+import heapq
+import random
+import signal
+import socket
+import hashlib
+import selectors
+import tempfile
+import contextlib
+import subprocess
+import collections
+import benchlib
+import rdt4
+
+#optional arguments: name -> description
+OPTIONS = {
+	"clients": "=N  no. of clients (default 100)",
+	"rate": "=R  clients arriving per second on average (default 0: all at once)",
+	"sizes": "=DIST  file sizes: fixed:B, uniform:A:B, exp:MEAN or pareto:MIN:ALPHA (default fixed:100000)",
+	"workers": "=K  worker processes of the server (default 16)",
+	"seed": "=S  seed of the file sizes and arrival times (default 1)",
+	"timeout": "=T  give up on the clients not done T seconds after the start (default 300)",
+	"out": "=FILE  append the results to FILE (default load-results.jsonl)",
+	"label": "=NAME  label of the results (default: git version of the tree)",
+}
+
+#file size distributions: name -> function of a random.Random and the parameters
+SIZE_DISTS = {
+	"fixed": lambda rng, size: size,
+	"uniform": lambda rng, low, high: rng.uniform(low, high),
+	"exp": lambda rng, mean: rng.expovariate(1.0 / mean),
+	"pareto": lambda rng, low, alpha: min(low * rng.paretovariate(alpha), low * PARETO_CAP),
+}
+PARETO_CAP = 100	#a Pareto size is at most PARETO_CAP times its minimum
+PERCENTILES = (50, 90, 99)
+RECV_BURST = 64		#datagrams taken from a readable socket before the others get a turn
+SERVER_START = 1.0	#seconds the server takes to start up
+
+def size_sampler(spec):
+	"""Return  -> function of a random.Random giving a file size in bytes
+	drawn from the distribution spec ("name:param:..."), None if spec is
+	not valid"""
+	name, _, params = spec.partition(":")
+	if name not in SIZE_DISTS:
+		return None
+	try:
+		params = [float(x) for x in params.split(":")]
+		SIZE_DISTS[name](random.Random(0), *params)
+	except (ValueError, TypeError):
+		return None
+	if min(params) <= 0:
+		return None
+	return lambda rng: max(int(SIZE_DISTS[name](rng, *params)), 1)
+
+
+def percentile(values, p):
+	"""Return  -> the p-th percentile (nearest rank) of the sorted values,
+	None if there are none"""
+	if not values:
+		return None
+	return values[max(math.ceil(p / 100.0 * len(values)) - 1, 0)]
+
+
+def git_label():
+	"""Return  -> the git version of the tree ("unknown" outside git)"""
+	try:
+		result = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=benchlib.HERE,
+			stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=10)
+	except (OSError, subprocess.TimeoutExpired):
+		return "unknown"
+	return result.stdout.decode().strip() or "unknown"
+
+
+class LoadClient:
+	"""One client of the load: its rdt4 instance and the state of its upload
+
+	The state is "request" until the request is ACKed with the server's
+	reply, "data" while the file goes, "digest" until the server answers,
+	"closing" while it ACKs the server's retransmissions for TWAIT, and
+	"done" at the end; error tells why a client failed.
+	"""
+
+	def __init__(self, index, size, arrival):
+		self.index = index
+		self.name = "load-%d.bin" % index
+		self.size = size
+		self.arrival = arrival		#seconds after the start of the run
+		self.state = "waiting"
+		self.rdt = None
+		self.sockfd = None
+		self.started = None
+		self.finished = None		#time the server answered MATCH
+		self.heard = 0.0		#time the last datagram came
+		self.deadline = None		#time of the next timer event
+		self.timer = None		#time of its entry in the timer heap
+		self.error = None
+		self.sent = 0
+
+	def start(self, now, server, args, data):
+		"""Open the RDT socket and queue the request with the first window
+		of the file
+
+		Input arguments: the time now, server address, command line
+		arguments (drop rate, error rate, window size) and the file data
+		Return  -> True on success
+		"""
+		self.started = self.heard = now
+		self.state = "request"
+		rdt = self.rdt = benchlib.new_rdt("rdt4_%d" % self.index)
+		rdt.rdt_network_init(args[1], args[2], args[3])
+		rdt.rdt_set_logging(False)
+		self.W = int(args[3])
+		self.MSG_LEN = rdt.PAYLOAD * self.W
+		self.data = memoryview(data)[:self.size]
+		self.digest = hashlib.sha256(self.data).hexdigest().encode("ascii")
+		#the unreliable layer of the instance, so the losses are those
+		#test-client3.py sees
+		self.udt_send = getattr(rdt, "__udt_send")
+		self.server = server
+		self.sockfd = rdt.rdt_socket()
+		if self.sockfd == None or rdt.rdt_bind(self.sockfd, 0) == -1:
+			self.error = "socket error"
+			return False
+		self.sockfd.setblocking(False)
+		rdt.rdt_peer(*server)
+		request = ("%d:0:inet:0:0:0:0:%s\n" % (self.size, self.name)).encode("ascii")
+		self.sent = min(self.MSG_LEN - len(request), self.size)
+		rdt.rdt_core_send(request + self.data[:self.sent])
+		return True
+
+	def step(self, now, recv_pkt=None):
+		"""Drive the protocol core with a datagram from the server (or just
+		the time) and move the upload on
+
+		Return  -> True while the client is running
+		"""
+		rdt = self.rdt
+		if recv_pkt is not None:
+			self.heard = now
+		while True:
+			out, delivered, deadline = rdt.rdt_core_step(now, recv_pkt)
+			recv_pkt = None
+			try:
+				for snd_pkt in out:
+					self.udt_send(self.sockfd, self.server, snd_pkt)
+			except socket.error as emsg:
+				self.error = "socket error: %s" % emsg
+				return False
+			if rdt.rdt_core_error() is not None:
+				self.error = rdt.rdt_core_error()
+				return False
+			queued = self.advance(now, delivered)
+			if self.error != None:
+				return False
+			#new messages go out in the next step of the core
+			if not queued:
+				break
+		self.deadline = deadline
+		if self.state == "closing":
+			quiet = max(self.heard, self.finished) + rdt.TWAIT
+			if now >= quiet:
+				self.state = "done"
+				return False
+			self.deadline = quiet if deadline is None else min(deadline, quiet)
+		return True
+
+	def advance(self, now, delivered):
+		"""Move the upload on after a step of the core
+
+		Input arguments: the time now and the DATA packets delivered
+		Return  -> True if it queued a message for the core
+		"""
+		rdt = self.rdt
+		if self.state == "request" and rdt.rdt_core_pending() == 0:
+			reply = rdt.rdt_reply()
+			if reply == None:
+				self.error = "no response from the server"
+			elif reply == b'ERROR':
+				self.error = "file creation error"
+			self.state = "data"
+		queued = False
+		if self.state == "data":
+			#keep the window sliding: the next message goes before the
+			#last one is ACKed
+			while self.sent < self.size and rdt.rdt_core_pending() < self.W:
+				rdt.rdt_core_send(self.data[self.sent:self.sent+self.MSG_LEN])
+				self.sent += self.MSG_LEN
+				queued = True
+			if self.sent >= self.size and rdt.rdt_core_pending() == 0:
+				rdt.rdt_core_send(b'DIGEST ' + self.digest)
+				self.state = "digest"
+				queued = True
+		elif self.state == "digest":
+			for recv_pkt in delivered:
+				answer = rdt.unpack_msg(recv_pkt)[1]
+				if answer == b'MATCH':
+					self.finished = now
+					self.state = "closing"
+				elif answer == b'MISMATCH':
+					self.error = "digest mismatch"
+		return queued
+
+	def close(self):
+		"""Release the socket"""
+		if self.sockfd != None:
+			self.sockfd.close()
+			self.sockfd = None
+
+
+def run_load(clients, server, args, data, timeout):
+	"""Run the clients in one select loop until they are all done
+
+	Input arguments: list of LoadClient in order of arrival, server
+	address, command line arguments, file data and the seconds after the
+	start when the clients still running give up
+	Return  -> time of the start
+	"""
+	sel = selectors.DefaultSelector()
+	timers = []		#heap of (time, client index); stale entries are skipped
+	arriving = collections.deque(clients)
+	active = set()
+	starttime = time.monotonic()
+
+	def stepped(client, running):
+		if not running:
+			sel.unregister(client.sockfd)
+			client.close()
+			active.discard(client)
+		elif client.deadline not in (None, client.timer):
+			client.timer = client.deadline
+			heapq.heappush(timers, (client.deadline, client.index))
+
+	while arriving or active:
+		now = time.monotonic()
+		if now - starttime > timeout:
+			break
+		while arriving and starttime + arriving[0].arrival <= now:
+			client = arriving.popleft()
+			if not client.start(now, server, args, data):
+				client.close()
+				continue
+			sel.register(client.sockfd, selectors.EVENT_READ, client)
+			active.add(client)
+			stepped(client, client.step(now))
+		while timers and timers[0][0] <= now:
+			deadline, index = heapq.heappop(timers)
+			client = clients[index]
+			if client in active and client.timer == deadline:
+				client.timer = None
+				stepped(client, client.step(now))
+		if not (arriving or active):
+			break
+
+		#wait for a datagram, the next timer or the next arrival
+		wait = starttime + timeout - now
+		if timers:
+			wait = min(wait, timers[0][0] - now)
+		if arriving:
+			wait = min(wait, starttime + arriving[0].arrival - now)
+		for key, _ in sel.select(max(wait, 0)):
+			client = key.data
+			running = True
+			for i in range(RECV_BURST):
+				try:
+					recv_pkt = client.sockfd.recv(rdt4.PAYLOAD + rdt4.MAX_HEADER_SIZE)
+				except BlockingIOError:
+					break
+				except socket.error as emsg:
+					client.error = "socket error: %s" % emsg
+					running = False
+					break
+				running = client.step(time.monotonic(), recv_pkt)
+				if not running:
+					break
+			stepped(client, running)
+
+	for client in active:
+		if client.finished == None:
+			client.error = "timed out"
+		sel.unregister(client.sockfd)
+		client.close()
+	for client in arriving:
+		client.error = "not started"
+	sel.close()
+	return starttime
+
+
+def summarize(clients, starttime, server_cpu, loadgen_cpu):
+	"""Return  -> dictionary of the results of a run"""
+	done = [c for c in clients if c.error == None and c.finished != None]
+	times = sorted(c.finished - c.started for c in done)
+	stats = [c.rdt.rdt_stats() for c in clients if c.rdt != None]
+	datagrams = sum(s["datagrams_sent"] for s in stats)
+	retrans = sum(s["retrans_pkts"] for s in stats)
+	span = max(c.finished for c in done) - starttime if done else 0
+	errors = collections.Counter(c.error for c in clients if c.error != None)
+	result = {
+		"completed": len(done),
+		"failed": len(clients) - len(done),
+		"errors": dict(errors),
+	}
+	for p in PERCENTILES:
+		result["p%d" % p] = percentile(times, p)
+	result.update({
+		"mean": sum(times) / len(times) if times else None,
+		"max": times[-1] if times else None,
+		"goodput": sum(c.size for c in done) / span / 1000.0 if span > 0 else 0.0,
+		"bytes": sum(c.size for c in done),
+		"datagrams": datagrams,
+		"retrans_pkts": retrans,
+		"retrans_rate": retrans / datagrams if datagrams else 0.0,
+		"server_cpu": server_cpu,
+		"loadgen_cpu": loadgen_cpu,
+	})
+	return result
+
+
+def seconds(value):
+	"""Return  -> value formatted as seconds, "-" for None"""
+	return "-" if value == None else "%.3f" % value
+
+
+def report(record, path):
+	"""Print the results of the run and, side by side, the earlier runs
+	in the results file with the same settings"""
+	print()
+	print("%d of %d clients completed, %d failed" % (record["completed"],
+		record["completed"] + record["failed"], record["failed"]))
+	for error, count in sorted(record["errors"].items()):
+		print("  %d: %s" % (count, error))
+	runs = []
+	with open(path) as fobj:
+		for line in fobj:
+			try:
+				run = json.loads(line)
+			except ValueError:
+				continue
+			if run.get("settings") == record["settings"]:
+				runs.append(run)
+	rows = []
+	for run in runs:
+		rows.append((run["label"], run["date"], "%d/%d" % (run["completed"], run["completed"] + run["failed"]))
+			+ tuple(seconds(run["p%d" % p]) for p in PERCENTILES)
+			+ ("%.2f" % run["goodput"], "%.2f" % (run["retrans_rate"] * 100), seconds(run["server_cpu"]),
+			seconds(run["loadgen_cpu"])))
+	print()
+	benchlib.print_table(("version", "date", "done") + tuple("p%d (s)" % p for p in PERCENTILES)
+		+ ("goodput KB/s", "retrans %", "server CPU (s)", "loadgen CPU (s)"), rows)
+
+
+def usage():
+	print("Usage:  "+sys.argv[0]+"  <drop rate>  <error rate>  <Window size>  [options]")
+	print("Options:")
+	for name in OPTIONS:
+		print("  --%-20s %s" % (name, OPTIONS[name]))
+
+def get_options(args):
+	"""Parse the optional arguments of the form --name or --name=value
+
+	Input argument: list of the optional arguments
+	Return  -> dictionary of option values (True if no value given), None on error
+	"""
+	options = {}
+	for arg in args:
+		name, _, value = arg[2:].partition("=")
+		if not arg.startswith("--") or name not in OPTIONS:
+			print("Unknown option:", arg)
+			return None
+		options[name] = value if value else True
+	return options
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		usage()
+		sys.exit(0)
+	options = get_options(sys.argv[4:])
+	if options == None:
+		usage()
+		sys.exit(0)
+	try:
+		count = int(options.get("clients", 100))
+		rate = float(options.get("rate", 0))
+		workers = int(options.get("workers", 16))
+		seed = int(options.get("seed", 1))
+		timeout = float(options.get("timeout", 300))
+	except ValueError:
+		count = 0
+	sizes = size_sampler(str(options.get("sizes", "fixed:100000")))
+	if count < 1 or rate < 0 or workers < 1 or timeout <= 0 or sizes == None:
+		usage()
+		sys.exit(0)
+	path = os.path.abspath(str(options.get("out", "load-results.jsonl")))
+	label = str(options["label"]) if "label" in options else git_label()
+
+	#the same seed draws the same clients
+	rng = random.Random(seed)
+	clients = []
+	arrival = 0.0
+	for i in range(count):
+		clients.append(LoadClient(i, sizes(rng), arrival))
+		if rate > 0:
+			arrival += rng.expovariate(rate)
+	data = os.urandom(max(c.size for c in clients))
+	print("%d clients, %d bytes in all, arriving over %.1f s" % (count, sum(c.size for c in clients), arrival))
+
+	with tempfile.TemporaryDirectory() as workdir:
+		os.makedirs(os.path.join(workdir, "Store"))
+		slog = open(os.path.join(workdir, "server.log"), "w+b")
+		server = subprocess.Popen([sys.executable, benchlib.SERVER, "any", sys.argv[1], sys.argv[2], sys.argv[3],
+			"--serve=%d" % workers], cwd=workdir, stdout=slog, stderr=subprocess.STDOUT)
+		time.sleep(SERVER_START)
+		cpu = time.process_time()
+		#the unreliable layer reports every loss
+		with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+			starttime = run_load(clients, ("127.0.0.1", rdt4.SPORT), sys.argv, data, timeout)
+		loadgen_cpu = time.process_time() - cpu
+		#every client is done or has given up: Ctrl-C abandons the sessions
+		#still open (for the clients that gave up) and stops the workers
+		server.send_signal(signal.SIGINT)
+		try:
+			server_cpu = benchlib.wait_usage(server, benchlib.CLIENT_GRACE)[1]
+		except subprocess.TimeoutExpired:
+			server_cpu = None
+		slog.close()
+
+	record = {
+		"label": label,
+		"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+		"settings": {
+			"drop": float(sys.argv[1]),
+			"err": float(sys.argv[2]),
+			"W": int(sys.argv[3]),
+			"clients": count,
+			"rate": rate,
+			"sizes": str(options.get("sizes", "fixed:100000")),
+			"workers": workers,
+			"seed": seed,
+		},
+	}
+	record.update(summarize(clients, starttime, server_cpu, loadgen_cpu))
+	with open(path, "a") as fobj:
+		fobj.write(json.dumps(record) + "\n")
+	report(record, path)
+	print("Results appended to", path)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+"""Benchmark: client peak RSS and throughput against file size,
+reading the file with read() vs. sending slices of a memory-mapped file
+
+Usage:  bench-mmap.py  <drop rate>  <error rate>  <Window size>  [file sizes in MB ...]
+"""
+
+import sys
+import tempfile
+import benchlib
+
+MODES = (
+	("read", []),
+	("mmap", ["--mmap"]),
+	("mmap+madvise", ["--mmap", "--madvise"]),
+)
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		print("Usage:  "+sys.argv[0]+"  <drop rate>  <error rate>  <Window size>  [file sizes in MB ...]")
+		sys.exit(0)
+	sizes = [float(x) for x in sys.argv[4:]] or [1, 4, 16]
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		for size in sizes:
+			filename = "mmap-%gMB.bin" % size
+			benchlib.make_file(workdir + "/" + filename, int(size * 1000000))
+			for mode, opts in MODES:
+				result = benchlib.run_transfer(workdir, filename, sys.argv[1], sys.argv[2], sys.argv[3], client_opts=opts)
+				if result == None:
+					rows.append(("%g" % size, mode, "-", "-", "-", "FAILED"))
+					continue
+				rss = "%.1f" % (result["client_rss"] / 1024.0) if result["client_rss"] else "n/a"
+				rows.append(("%g" % size, mode, "%.3f" % result["elapsed"], "%.2f" % result["throughput"],
+					rss, "yes" if result["same"] else "NO"))
+				print("%gMB %s: %.2f KB/s, peak RSS %s MB" % (size, mode, result["throughput"], rss))
+
+	print()
+	benchlib.print_table(("size (MB)", "source", "time (s)", "KB/s", "client RSS (MB)", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
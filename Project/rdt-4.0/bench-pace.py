@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+"""Benchmark: bottleneck queue drops, retransmissions and throughput at
+large windows, with bursts against paced transmission
+
+Usage:  bench-pace.py  <file size (bytes)>  <link rate (KB/s)>  <queue length>  [window sizes ...]
+"""
+
+import sys
+import tempfile
+import benchlib
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		print("Usage:  "+sys.argv[0]+"  <file size (bytes)>  <link rate (KB/s)>  <queue length>  [window sizes ...]")
+		sys.exit(0)
+	size = int(sys.argv[1])
+	link = "--link=%s:%s" % (sys.argv[2], sys.argv[3])
+	windows = [int(x) for x in sys.argv[4:]] or [20, 50, 100, 200]
+	modes = (
+		("burst", []),
+		("pace W/RTT", ["--pace"]),
+		("pace %s KB/s" % sys.argv[2], ["--pace=%s" % sys.argv[2]]),
+	)
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		benchlib.make_file(workdir + "/pace.bin", size)
+		for W in windows:
+			for mode, opts in modes:
+				result = benchlib.run_transfer(workdir, "pace.bin", 0, 0, W, client_opts=opts + [link])
+				if result == None:
+					rows.append((W, mode, "-", "-", "-", "-", "FAILED"))
+					continue
+				match = benchlib.QUEUE_RE.search(result["client_out"])
+				drops = int(match.group(1)) if match else 0
+				match = benchlib.RETRANS_RE.search(result["client_out"])
+				retrans = int(match.group(1)) if match else 0
+				rows.append((W, mode, "%.3f" % result["elapsed"], "%.2f" % result["throughput"],
+					drops, retrans, "yes" if result["same"] else "NO"))
+				print("W %d %s: %.2f KB/s, %d queue drops" % (W, mode, result["throughput"], drops))
+
+	print()
+	benchlib.print_table(("W", "mode", "time (s)", "KB/s", "queue drops", "retransmitted", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+"""Benchmark: retransmitted bytes and throughput under bursty loss,
+Go-Back-N against selective acknowledgement (SACK)
+
+Usage:  bench-sack.py  <file size (bytes)>  <drop rate>  <error rate>  <Window size>  [mean burst lengths ...]
+"""
+
+import sys
+import tempfile
+import benchlib
+
+MODES = (
+	("go-back-n", []),
+	("sack", ["--sack"]),
+)
+
+
+def main():
+
+	if len(sys.argv) < 5:
+		print("Usage:  "+sys.argv[0]+"  <file size (bytes)>  <drop rate>  <error rate>  <Window size>  [mean burst lengths ...]")
+		sys.exit(0)
+	size = int(sys.argv[1])
+	bursts = [float(x) for x in sys.argv[5:]] or [1, 4, 8]
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		benchlib.make_file(workdir + "/sack.bin", size)
+		for burst in bursts:
+			for mode, opts in MODES:
+				net = ["--burst=%g" % burst]
+				result = benchlib.run_transfer(workdir, "sack.bin", sys.argv[2], sys.argv[3], sys.argv[4],
+					client_opts=opts + net, server_opts=net)
+				if result == None:
+					rows.append(("%g" % burst, mode, "-", "-", "-", "-", "FAILED"))
+					continue
+				match = benchlib.RETRANS_RE.search(result["client_out"])
+				packets, nbytes = (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+				rows.append(("%g" % burst, mode, "%.3f" % result["elapsed"], "%.2f" % result["throughput"],
+					packets, "%.1f" % (nbytes / 1000.0), "yes" if result["same"] else "NO"))
+				print("burst %g %s: %.2f KB/s, %d packets retransmitted" % (burst, mode, result["throughput"], packets))
+
+	print()
+	benchlib.print_table(("burst", "mode", "time (s)", "KB/s", "retransmitted", "retransmitted KB", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+"""Benchmark: completion time of small-file transfers, where the connection
+setup is a large share of the whole transfer
+
+The elapse time the client reports runs from its request to the last ACK;
+the client wall time adds the program start-up and the TWAIT of rdt_close(),
+which are the same in every run. Each point is the mean of RUNS runs, so
+that the timeouts of lost setup messages count as often as they happen.
+
+Usage:  bench-setup.py  <drop rate>  <error rate>  <Window size>  [file sizes in KB ...]
+"""
+
+import sys
+import statistics
+import tempfile
+import benchlib
+
+RUNS = 10
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		print("Usage:  "+sys.argv[0]+"  <drop rate>  <error rate>  <Window size>  [file sizes in KB ...]")
+		sys.exit(0)
+	sizes = [float(x) for x in sys.argv[4:]] or [1, 10, 100]
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		for size in sizes:
+			filename = "setup-%gKB.bin" % size
+			benchlib.make_file(workdir + "/" + filename, int(size * 1000))
+			results = [benchlib.run_transfer(workdir, filename, sys.argv[1], sys.argv[2], sys.argv[3])
+				for i in range(RUNS)]
+			done = [r for r in results if r != None]
+			if not done:
+				rows.append(("%g" % size, "-", "-", "FAILED"))
+				continue
+			elapsed = statistics.mean(r["elapsed"] for r in done)
+			wall = statistics.mean(r["client_wall"] for r in done)
+			rows.append(("%g" % size, "%.3f" % elapsed, "%.3f" % wall,
+				"%d/%d" % (sum(r["same"] for r in done), RUNS)))
+			print("%gKB: %.3f s to complete, client wall %.3f s" % (size, elapsed, wall))
+
+	print()
+	benchlib.print_table(("size (KB)", "time (s)", "client wall (s)", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+"""Benchmark: a server writing to a slow disk, with each message written
+between rdt_recv() calls (--direct) against the write-behind sink
+
+The disk is simulated by the server (--disk=MB/s:ms), so a small write
+costs its latency. With --direct a busy disk keeps the server from ACKing
+in the blocking mode, and the client times out and retransmits; the
+write-behind sink writes large blocks in the background, and when the
+disk still falls behind, the --threaded server advertises a smaller
+receive window instead.
+
+Usage:  bench-sink.py  <drop rate>  <error rate>  <Window size>  [file size in KB]  [disk MB/s:ms]
+"""
+
+import sys
+import tempfile
+import benchlib
+
+MODES = (
+	("blocking", "direct", [], ["--direct"]),
+	("blocking", "write-behind", [], []),
+	("threaded", "direct", ["--threaded"], ["--threaded", "--direct"]),
+	("threaded", "write-behind", ["--threaded"], ["--threaded"]),
+)
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		print("Usage:  "+sys.argv[0]+"  <drop rate>  <error rate>  <Window size>  [file size in KB]  [disk MB/s:ms]")
+		sys.exit(0)
+	size = float(sys.argv[4]) if len(sys.argv) > 4 else 2000
+	disk = "--disk=" + (sys.argv[5] if len(sys.argv) > 5 else "20:2")
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		benchlib.make_file(workdir + "/sink.bin", int(size * 1000))
+		for mode, sink, client_opts, server_opts in MODES:
+			result = benchlib.run_transfer(workdir, "sink.bin", sys.argv[1], sys.argv[2], sys.argv[3],
+				client_opts, server_opts + [disk])
+			if result == None:
+				rows.append((mode, sink, "-", "-", "-", "FAILED"))
+				continue
+			match = benchlib.RETRANS_RE.search(result["client_out"])
+			retrans = int(match.group(1)) if match else 0
+			rows.append((mode, sink, "%.3f" % result["elapsed"], "%.2f" % result["throughput"],
+				retrans, "yes" if result["same"] else "NO"))
+			print("%s %s: %.2f KB/s, %d packets retransmitted" % (mode, sink, result["throughput"], retrans))
+
+	print()
+	benchlib.print_table(("RDT mode", "server writes", "time (s)", "KB/s", "retransmitted", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+"""Benchmark: memory soak of a long-running RDT connection under loss
+
+One connection runs for the given time between two rdt4 instances in
+this process. The sender (full-duplex mode) keeps sending messages of
+mixed sizes, up to several times the memory cap, on four streams; the
+receiver (blocking mode) takes them and now and then stalls, as a slow
+disk would, so the window closes and the caps are tested. Every sample
+interval the current and peak RSS, the memory traced by tracemalloc and
+the allocation sites that have grown the most since the first sample
+are printed; at the end, the growth of the RSS per hour after the first
+sample tells whether memory creeps.
+
+Usage:  bench-soak.py  <drop rate>  <error rate>  <Window size>  [minutes]  [sample interval (s)]  [buffer KB]
+"""
+
+import sys
+import os
+import time
+import random
+import threading
+import tracemalloc
+import contextlib
+import benchlib
+
+try:
+	import resource
+except ImportError:	#not on Windows
+	resource = None
+
+MSG_SIZES = (100, 1000, 10000, 100000, 1000000)	#bytes of the messages sent
+STREAMS = 4		#streams the messages go on
+STALL_RATE = 0.002	#chance that the receiver stalls after a message
+STALL = 0.5		#seconds a stall lasts (well below MAX_RETRY timeouts)
+IDLE = 1.0		#seconds rdt_recv() waits before the receiver checks whether to stop
+HOT_SPOTS = 3		#allocation sites reported at each sample
+HOT_SPOTS_END = 10	#and at the end
+
+
+def current_rss():
+	"""Return  -> resident set size of the process in KB, None if unknown"""
+	try:
+		with open("/proc/self/statm") as fobj:
+			return int(fobj.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+	except (OSError, ValueError, AttributeError):
+		return None
+
+
+def peak_rss():
+	"""Return  -> peak resident set size of the process in KB, None if unknown"""
+	if resource == None:
+		return None
+	maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+
+def snapshot():
+	"""Return  -> tracemalloc snapshot of the allocations, less those of tracemalloc"""
+	return tracemalloc.take_snapshot().filter_traces((
+		tracemalloc.Filter(False, tracemalloc.__file__),
+		tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+	))
+
+
+def hot_spots(snap, baseline, count):
+	"""Return  -> list of "size change  file:line" of the count allocation
+	sites that have grown the most since baseline"""
+	spots = []
+	stats = sorted(snap.compare_to(baseline, "lineno"), key=lambda stat: stat.size_diff, reverse=True)
+	for stat in stats[:count]:
+		frame = stat.traceback[0]
+		spots.append("%+.1f KB  %s:%d" % (stat.size_diff / 1024, os.path.basename(frame.filename), frame.lineno))
+	return spots
+
+
+def mb(kbytes):
+	"""Return  -> KB formatted as MB, "-" for None"""
+	return "-" if kbytes == None else "%.1f" % (kbytes / 1024)
+
+
+def sender(rdt, sockfd, stop, sent, seed):
+	"""Sender thread: send messages until stop is set, then wait until they are ACKed"""
+	rng = random.Random(seed)
+	data = memoryview(os.urandom(max(MSG_SIZES)))
+	while not stop.is_set():
+		size, stream = rng.choice(MSG_SIZES), rng.randrange(STREAMS)
+		if rdt.rdt_send(sockfd, data[:size], stream) < 0:
+			break
+		sent[stream] += size
+	rdt.rdt_flush(sockfd)
+
+
+def receiver(rdt, sockfd, stop, got, seed):
+	"""Receiver thread: take the messages and stall now and then, until
+	stop is set and the peer has gone quiet"""
+	rng = random.Random(seed)
+	while True:
+		stream, rmsg = rdt.rdt_recv_stream(sockfd, rdt.PAYLOAD * 10)
+		if rmsg == b'':
+			if stop.is_set():
+				break
+			continue
+		got[stream] += len(rmsg)
+		if rng.random() < STALL_RATE:
+			time.sleep(STALL)
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		print("Usage:  "+sys.argv[0]+"  <drop rate>  <error rate>  <Window size>  [minutes]  [sample interval (s)]  [buffer KB]")
+		sys.exit(0)
+	duration = float(sys.argv[4]) * 60 if len(sys.argv) > 4 else 7200.0
+	interval = float(sys.argv[5]) if len(sys.argv) > 5 else 60.0
+	cap = int(float(sys.argv[6]) * 1000) if len(sys.argv) > 6 else None
+
+	tracemalloc.start()
+	out = sys.stdout
+	rdts = []
+	socks = []
+	for name in ("rdt4_sender", "rdt4_receiver"):
+		rdt = benchlib.new_rdt(name)
+		rdt.rdt_network_init(sys.argv[1], sys.argv[2], sys.argv[3])
+		rdt.rdt_set_logging(False)
+		if cap != None and rdt.rdt_set_memory(cap) == -1:
+			sys.exit(0)
+		sockfd = rdt.rdt_socket()
+		if sockfd == None or rdt.rdt_bind(sockfd, 0) == -1:
+			sys.exit(0)
+		rdts.append(rdt)
+		socks.append(sockfd)
+	rdts[0].rdt_peer("127.0.0.1", socks[1].getsockname()[1])
+	rdts[1].rdt_peer("127.0.0.1", socks[0].getsockname()[1])
+	socks[1].settimeout(IDLE)
+	rdts[0].rdt_start_io(socks[0])
+	print("Soak for %.1f minutes, a sample every %.0f s, memory cap %d bytes per direction" % (
+		duration / 60, interval, cap or rdts[0].MEM_CAP))
+
+	sent = [0] * STREAMS
+	got = [0] * STREAMS
+	stop = threading.Event()
+	threads = [threading.Thread(target=sender, args=(rdts[0], socks[0], stop, sent, 1)),
+		threading.Thread(target=receiver, args=(rdts[1], socks[1], stop, got, 2))]
+	rows = []
+	samples = []		#(seconds, RSS KB) after the first sample
+	baseline = None
+	#the unreliable layer reports every loss
+	with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+		starttime = time.monotonic()
+		for t in threads:
+			t.start()
+		while True:
+			time.sleep(max(min(interval, starttime + duration - time.monotonic()), 0))
+			lapsed = time.monotonic() - starttime
+			snap = snapshot()
+			traced, traced_peak = tracemalloc.get_traced_memory()
+			rss = current_rss()
+			if baseline == None:
+				baseline = snap
+			if rss != None:
+				samples.append((lapsed, rss))
+			spots = hot_spots(snap, baseline, HOT_SPOTS)
+			rows.append(("%.1f" % (lapsed / 60), "%.1f" % (sum(got) / 1e6), "%.2f" % (sum(got) / lapsed / 1e6),
+				mb(rss), mb(peak_rss()), "%.1f" % (traced / 2**20), "%.1f" % (traced_peak / 2**20)))
+			print("%s min: %s MB moved, RSS %s MB (peak %s), traced %s MB (peak %s)" % (rows[-1][:1] + rows[-1][1:2]
+				+ rows[-1][3:]), file=out, flush=True)
+			for spot in spots:
+				print("    " + spot, file=out, flush=True)
+			if lapsed >= duration or not all(t.is_alive() for t in threads):
+				break
+		stop.set()
+		for t in threads:
+			t.join()
+		rdts[0].rdt_close(socks[0])
+		rdts[1].rdt_close(socks[1])
+
+	print()
+	benchlib.print_table(("minutes", "MB moved", "MB/s", "RSS MB", "peak RSS MB", "traced MB", "traced peak MB"), rows)
+	print()
+	print("Allocation sites grown the most since the first sample:")
+	for spot in hot_spots(snapshot(), baseline, HOT_SPOTS_END):
+		print("  " + spot)
+	if len(samples) > 2:
+		#least-squares slope of the RSS over time
+		n = len(samples)
+		mean_t = sum(t for t, _ in samples) / n
+		mean_r = sum(r for _, r in samples) / n
+		var = sum((t - mean_t) ** 2 for t, _ in samples)
+		slope = sum((t - mean_t) * (r - mean_r) for t, r in samples) / var if var > 0 else 0
+		print("RSS growth after the first sample: %+.1f MB per hour" % (slope * 3600 / 1024))
+	print("Bytes sent %d, received %d: %s" % (sum(sent), sum(got), "intact" if sent == got else "MISMATCH"))
+
+
+if __name__ == "__main__":
+	main()
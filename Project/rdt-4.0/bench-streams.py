@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+"""Benchmark: sending several files one connection each, one after the
+other, against sending them at once on the streams of one connection
+
+The serial transfers each pay the connection setup, the program start-up
+and the TWAIT of rdt_close(); the streams pay them once and share the
+window, so a loss in one file no longer stalls the files behind it. The
+client wall time runs from the start of the first client to the exit of
+the last.
+
+Usage:  bench-streams.py  <drop rate>  <error rate>  <Window size>  [no. of files]  [file size in KB]
+"""
+
+import sys
+import tempfile
+import benchlib
+
+MODES = (
+	("blocking", []),
+	("threaded", ["--threaded"]),
+)
+
+
+def main():
+
+	if len(sys.argv) < 4:
+		print("Usage:  "+sys.argv[0]+"  <drop rate>  <error rate>  <Window size>  [no. of files]  [file size in KB]")
+		sys.exit(0)
+	count = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+	size = float(sys.argv[5]) if len(sys.argv) > 5 else 100
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		filenames = ["stream-%d.bin" % i for i in range(count)]
+		for filename in filenames:
+			benchlib.make_file(workdir + "/" + filename, int(size * 1000))
+		for mode, opts in MODES:
+			serial = [benchlib.run_transfer(workdir, filename, sys.argv[1], sys.argv[2], sys.argv[3], opts, opts)
+				for filename in filenames]
+			done = [r for r in serial if r != None]
+			if len(done) == count:
+				wall = sum(r["client_wall"] for r in done)
+				rows.append((mode, "serial", "%.3f" % sum(r["elapsed"] for r in done), "%.3f" % wall,
+					"%.2f" % (count * size / wall), "%d/%d" % (sum(r["same"] for r in done), count)))
+			else:
+				rows.append((mode, "serial", "-", "-", "-", "FAILED"))
+			result = benchlib.run_transfer(workdir, ",".join(filenames), sys.argv[1], sys.argv[2], sys.argv[3], opts, opts)
+			if result != None:
+				rows.append((mode, "streams", "%.3f" % result["elapsed"], "%.3f" % result["client_wall"],
+					"%.2f" % (count * size / result["client_wall"]), "all" if result["same"] else "DAMAGED"))
+			else:
+				rows.append((mode, "streams", "-", "-", "-", "FAILED"))
+			print(rows[-2])
+			print(rows[-1])
+
+	print()
+	benchlib.print_table(("RDT mode", "files sent", "time (s)", "client wall (s)", "KB/s", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
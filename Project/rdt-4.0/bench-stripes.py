@@ -0,0 +1,38 @@
+#!/usr/bin/python3
+"""Benchmark: striped transfer throughput against the number of stripes
+
+Usage:  bench-stripes.py  <file size (bytes)>  <drop rate>  <error rate>  <Window size>  [stripe counts ...]
+"""
+
+import sys
+import tempfile
+import benchlib
+
+
+def main():
+
+	if len(sys.argv) < 5:
+		print("Usage:  "+sys.argv[0]+"  <file size (bytes)>  <drop rate>  <error rate>  <Window size>  [stripe counts ...]")
+		sys.exit(0)
+	size = int(sys.argv[1])
+	counts = [int(x) for x in sys.argv[5:]] or [0, 1, 2, 4, 8]
+
+	rows = []
+	with tempfile.TemporaryDirectory() as workdir:
+		benchlib.make_file(workdir + "/stripes.bin", size)
+		for stripes in counts:
+			opts = ["--stripes=%d" % stripes] if stripes else []
+			result = benchlib.run_transfer(workdir, "stripes.bin", sys.argv[2], sys.argv[3], sys.argv[4], client_opts=opts)
+			if result == None:
+				rows.append((stripes or "off", "-", "-", "FAILED"))
+				continue
+			rows.append((stripes or "off", "%.3f" % result["elapsed"], "%.2f" % result["throughput"],
+				"yes" if result["same"] else "NO"))
+			print("stripes %s: %.2f KB/s" % (stripes or "off", result["throughput"]))
+
+	print()
+	benchlib.print_table(("stripes", "time (s)", "KB/s", "intact"), rows)
+
+
+if __name__ == "__main__":
+	main()
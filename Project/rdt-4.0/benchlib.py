@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+"""Helpers for the RDT4.0 benchmark programs
+
+functions: make_file(), run_transfer(), run_clients(), wait_usage(), print_table()
+           new_rdt()
+
+The benchmarks run test-server3.py and test-client3.py as two processes
+on localhost inside a scratch directory that has its own ./Store folder.
+"""
+
+import sys
+import os
+import re
+import time
+import shutil
+import filecmp
+import threading
+import subprocess
+import importlib.util
+import rdt4
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER = os.path.join(HERE, "test-server3.py")
+CLIENT = os.path.join(HERE, "test-client3.py")
+CLIENT_GRACE = 90	#seconds a stopped --serve server may take to finish its sessions
+
+#the rdt4 code, compiled once for all the instances made by new_rdt()
+RDT_CODE = rdt4.__spec__.loader.get_code(rdt4.__name__)
+
+#"Total elapse time: 1.234 s	Throughtput: 56.78 KB/s" printed by the client
+RESULT_RE = re.compile(rb"Total elapse time: ([0-9.]+) s\s+Throughtput: ([0-9.]+) KB/s")
+#"Compression: 2000000 -> 386000 bytes (ratio 5.18), ..." printed by the client
+COMP_RE = re.compile(rb"Compression: [0-9]+ -> [0-9]+ bytes \(ratio ([0-9.]+)\)")
+#"FEC: 12 lost packets rebuilt from parity" printed by the server
+FEC_RE = re.compile(rb"FEC: ([0-9]+) lost packets rebuilt")
+#"Retransmitted: 287 packets, 288722 bytes" printed by the client
+RETRANS_RE = re.compile(rb"Retransmitted: ([0-9]+) packets, ([0-9]+) bytes")
+#"Bottleneck queue drops: 12 packets" printed by the client
+QUEUE_RE = re.compile(rb"Bottleneck queue drops: ([0-9]+) packets")
+#"Delta: 2990000 bytes matched, 10000 literal bytes; 29280 bytes of signatures received, 10200 bytes sent"
+#printed by the client with --delta
+DELTA_RE = re.compile(rb"Delta: ([0-9]+) bytes matched, ([0-9]+) literal bytes; ([0-9]+) bytes of signatures received, ([0-9]+) bytes sent")
+
+
+def make_file(path, size, kind="random"):
+	"""Create a test file
+
+	Input arguments: path, size in bytes and the kind of content -
+	"random" (incompressible) or "text" (CSV-like lines)
+	"""
+	with open(path, "wb") as fobj:
+		if kind == "random":
+			while size > 0:
+				chunk = min(size, 1 << 20)
+				fobj.write(os.urandom(chunk))
+				size -= chunk
+		else:
+			i = 0
+			while size > 0:
+				line = ("%d,2021-04-27T12:%02d:%02d,host%d,GET,/index.html,200,%d\n" % (
+					i, (i // 60) % 60, i % 60, i % 17, (i * 7919) % 50000)).encode("ascii")
+				fobj.write(line[:size])
+				size -= len(line)
+				i += 1
+
+
+def wait_usage(proc, timeout):
+	"""Wait for a child process and collect its resource usage
+
+	Input arguments: subprocess.Popen object and the timeout in seconds
+	Return  -> (peak RSS in KB, CPU time in seconds) of the child, or
+	(None, None) where os.wait4() is not available
+	Note: raises subprocess.TimeoutExpired after killing the child on timeout
+	"""
+	if not hasattr(os, "wait4"):
+		proc.wait(timeout=timeout)
+		return (None, None)
+	starttime = time.monotonic()
+	timer = threading.Timer(timeout, proc.kill)
+	timer.start()
+	try:
+		_, status, usage = os.wait4(proc.pid, 0)
+	finally:
+		timer.cancel()
+	proc.returncode = os.waitstatus_to_exitcode(status)
+	if time.monotonic() - starttime >= timeout:
+		raise subprocess.TimeoutExpired(proc.args, timeout)
+	maxrss = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+	return (maxrss, usage.ru_utime + usage.ru_stime)
+
+
+def run_transfer(workdir, filename, drop, err, W, client_opts=(), server_opts=(), timeout=600, basis=None):
+	"""Run one file transfer between test-server3.py and test-client3.py
+
+	Input arguments: scratch directory holding the file, file name (relative
+	to the scratch directory; several names separated by commas go on the
+	streams of one connection), drop rate, error rate, window size and the
+	extra options of the client and the server; basis names a file copied
+	into ./Store as the copy the server already holds (for --delta)
+	Return  -> dictionary with the elapse time, throughput (KB/s), whether
+	the stored copy matches, the peak RSS (KB) and CPU time (s) of both
+	programs, the wall time (s) of the client program from start to exit,
+	and the client/server output; None on failure
+	"""
+	store = os.path.join(workdir, "Store")
+	os.makedirs(store, exist_ok=True)
+	for name in filename.split(","):
+		if os.path.exists(os.path.join(store, name)):
+			os.remove(os.path.join(store, name))
+	if basis != None:
+		shutil.copyfile(basis, os.path.join(store, filename))
+
+	#the programs log every packet, so their output goes to files, not pipes
+	slog = open(os.path.join(workdir, "server.log"), "w+b")
+	clog = open(os.path.join(workdir, "client.log"), "w+b")
+	server = subprocess.Popen([sys.executable, SERVER, "localhost", str(drop), str(err), str(W)] + list(server_opts),
+		cwd=workdir, stdout=slog, stderr=subprocess.STDOUT)
+	time.sleep(0.5)
+	starttime = time.monotonic()
+	client = subprocess.Popen([sys.executable, CLIENT, "localhost", filename, str(drop), str(err), str(W)] + list(client_opts),
+		cwd=workdir, stdout=clog, stderr=subprocess.STDOUT)
+	cusage = susage = (None, None)
+	client_wall = None
+	try:
+		cusage = wait_usage(client, timeout)
+		client_wall = time.monotonic() - starttime
+		susage = wait_usage(server, timeout)
+	except subprocess.TimeoutExpired:
+		print("run_transfer: transfer timed out")
+		for proc in (client, server):
+			if proc.returncode == None:
+				proc.kill()
+				proc.wait()
+	slog.seek(0)
+	clog.seek(0)
+	sout, cout = slog.read(), clog.read()
+	slog.close()
+	clog.close()
+
+	match = RESULT_RE.search(cout)
+	if match == None:
+		print("run_transfer: client did not complete")
+		return None
+	return {
+		"elapsed": float(match.group(1)),
+		"throughput": float(match.group(2)),
+		"same": all(os.path.exists(os.path.join(store, name)) and
+			filecmp.cmp(os.path.join(workdir, name), os.path.join(store, name), shallow=False)
+			for name in filename.split(",")),
+		"client_rss": cusage[0],
+		"client_cpu": cusage[1],
+		"client_wall": client_wall,
+		"server_rss": susage[0],
+		"server_cpu": susage[1],
+		"client_out": cout,
+		"server_out": sout,
+	}
+
+
+def run_clients(workdir, filenames, drop, err, W, workers, client_opts=(), server_opts=(), timeout=600):
+	"""Run concurrent file transfers from many clients to one
+	test-server3.py --serve
+
+	Input arguments: scratch directory holding the files, file names (one
+	client each), drop rate, error rate, window size, no. of server workers
+	and the extra options of the clients and the server
+	Return  -> dictionary with the wall time from the start of the first
+	client to the end of the last, and a list with the elapse time,
+	throughput (KB/s) and intactness of each client (None if it failed)
+	"""
+	store = os.path.join(workdir, "Store")
+	os.makedirs(store, exist_ok=True)
+	for filename in filenames:
+		if os.path.exists(os.path.join(store, filename)):
+			os.remove(os.path.join(store, filename))
+
+	slog = open(os.path.join(workdir, "server.log"), "w+b")
+	server = subprocess.Popen([sys.executable, SERVER, "any", str(drop), str(err), str(W),
+		"--serve=%d" % workers] + list(server_opts), cwd=workdir, stdout=slog, stderr=subprocess.STDOUT)
+	time.sleep(1.0)
+	clogs = []
+	clients = []
+	starttime = time.monotonic()
+	for i, filename in enumerate(filenames):
+		clogs.append(open(os.path.join(workdir, "client-%d.log" % i), "w+b"))
+		clients.append(subprocess.Popen([sys.executable, CLIENT, "localhost", filename, str(drop), str(err), str(W),
+			"--port=0"] + list(client_opts), cwd=workdir, stdout=clogs[i], stderr=subprocess.STDOUT))
+	for client in clients:
+		try:
+			client.wait(timeout=max(timeout - (time.monotonic() - starttime), 1))
+		except subprocess.TimeoutExpired:
+			print("run_clients: client timed out")
+			client.kill()
+			client.wait()
+	wall = time.monotonic() - starttime
+	server.terminate()	#lets the server finish writing the files
+	try:
+		server.wait(timeout=CLIENT_GRACE)
+	except subprocess.TimeoutExpired:
+		server.kill()
+		server.wait()
+	slog.close()
+
+	results = []
+	for filename, clog in zip(filenames, clogs):
+		clog.seek(0)
+		match = RESULT_RE.search(clog.read())
+		clog.close()
+		if match == None:
+			results.append(None)
+			continue
+		target = os.path.join(store, filename)
+		results.append({
+			"elapsed": float(match.group(1)),
+			"throughput": float(match.group(2)),
+			"same": os.path.exists(target) and filecmp.cmp(os.path.join(workdir, filename), target, shallow=False),
+		})
+	return {"wall": wall, "clients": results}
+
+
+def new_rdt(name):
+	"""Return  -> a fresh instance of the rdt4 module under the given name;
+	the module holds the state of one connection, so each instance is a
+	connection of its own"""
+	spec = importlib.util.spec_from_file_location(name, rdt4.__file__)
+	rdt = importlib.util.module_from_spec(spec)
+	exec(RDT_CODE, rdt.__dict__)
+	return rdt
+
+
+def print_table(header, rows):
+	"""Print the benchmark results as an aligned text table"""
+	widths = [max(len(str(x)) for x in col) for col in zip(header, *rows)]
+	for row in [header] + rows:
+		print("  ".join(str(x).rjust(w) for x, w in zip(row, widths)))
@@ -1,510 +1,1898 @@
-#!/usr/bin/python3
-"""Implementation of RDT4.0
-
-functions: rdt_network_init, rdt_socket(), rdt_bind(), rdt_peer()
-           rdt_send(), rdt_recv(), rdt_close()
-
-Student name: Utsav Raj
-Date and version: 27/04/2021 ver 1 
-Development platform: MacOS
-Python version: 3.8.8 64-bit
-"""
-
-import socket
-import random
-
-# --- other imports --- #
-import struct
-import select
-import math
-# --------------------- #
-
-
-#some constants
-PAYLOAD = 1000		#size of data payload of each packet
-CPORT = 100			#Client port number - Change to your port number
-SPORT = 200			#Server port number - Change to your port number
-TIMEOUT = 0.05		#retransmission timeout duration
-TWAIT = 10*TIMEOUT 	#TimeWait duration
-
-#store peer address info
-__peeraddr = ()		#set by rdt_peer()
-#define the error rates and window size
-__LOSS_RATE = 0.0	#set by rdt_network_init()
-__ERR_RATE = 0.0
-__W = 1
-
-#internal functions - being called within the module
-def __udt_send(sockd, peer_addr, byte_msg):
-	"""This function is for simulating packet loss or corruption in an unreliable channel.
-
-	Input arguments: Unix socket object, peer address 2-tuple and the message
-	Return  -> size of data sent, -1 on error
-	Note: it does not catch any exception
-	"""
-	global __LOSS_RATE, __ERR_RATE
-	if peer_addr == ():
-		print("Socket send error: Peer address not set yet")
-		return -1
-	else:
-		#Simulate packet loss
-		drop = random.random()
-		if drop < __LOSS_RATE:
-			#simulate packet loss of unreliable send
-			print("WARNING: udt_send: Packet lost in unreliable layer!!")
-			return len(byte_msg)
-
-		#Simulate packet corruption
-		corrupt = random.random()
-		if corrupt < __ERR_RATE:
-			err_bytearr = bytearray(byte_msg)
-			pos = random.randint(0,len(byte_msg)-1)
-			val = err_bytearr[pos]
-			if val > 1:
-				err_bytearr[pos] -= 2
-			else:
-				err_bytearr[pos] = 254
-			err_msg = bytes(err_bytearr)
-			print("WARNING: udt_send: Packet corrupted in unreliable layer!!")
-			return sockd.sendto(err_msg, peer_addr)
-		else:
-			return sockd.sendto(byte_msg, peer_addr)
-
-def __udt_recv(sockd, length):
-	"""Retrieve message from underlying layer
-
-	Input arguments: Unix socket object and the max amount of data to be received
-	Return  -> the received bytes message object
-	Note: it does not catch any exception
-	"""
-	(rmsg, peer) = sockd.recvfrom(length)
-	return rmsg
-
-def __IntChksum(byte_msg):
-	"""Implement the Internet Checksum algorithm
-
-	Input argument: the bytes message object
-	Return  -> 16-bit checksum value
-	Note: it does not check whether the input object is a bytes object
-	"""
-	total = 0
-	length = len(byte_msg)	#length of the byte message object
-	i = 0
-	while length > 1:
-		total += ((byte_msg[i+1] << 8) & 0xFF00) + ((byte_msg[i]) & 0xFF)
-		i += 2
-		length -= 2
-
-	if length > 0:
-		total += (byte_msg[i] & 0xFF)
-
-	while (total >> 16) > 0:
-		total = (total & 0xFFFF) + (total >> 16)
-
-	total = ~total
-
-	return total & 0xFFFF
-
-
-#These are the functions used by appliation
-
-def rdt_network_init(drop_rate, err_rate, W):
-	"""Application calls this function to set properties of underlying network.
-
-    Input arguments: packet drop probability, packet corruption probability and Window size
-	"""
-	random.seed()
-	global __LOSS_RATE, __ERR_RATE, __W
-	__LOSS_RATE = float(drop_rate)
-	__ERR_RATE = float(err_rate)
-	__W = int(W)
-	print("Drop rate:", __LOSS_RATE, "\tError rate:", __ERR_RATE, "\tWindow size:", __W)
-
-
-def rdt_socket():
-	"""Application calls this function to create the RDT socket.
-
-	Null input.
-	Return the Unix socket object on success, None on error
-
-	Note: Catch any known error and report to the user.
-	"""
-	######## Your implementation #######
-	### Taken from rdt1.py ###
-	try:
-		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-	except socket.error as err_msg:
-		print("Socket creation error: ", err_msg)
-		return None
-	return sock
-
-
-def rdt_bind(sockd, port):
-	"""Application calls this function to specify the port number
-	used by itself and assigns them to the RDT socket.
-
-	Input arguments: RDT socket object and port number
-	Return	-> 0 on success, -1 on error
-
-	Note: Catch any known error and report to the user.
-	"""
-	######## Your implementation #######
-	### Taken from rdt1.py ###
-	try:
-		sockd.bind(("", port))
-	except socket.error as err_msg:
-		print("Socket bind error: ", err_msg)
-		return -1
-	return 0
-
-def rdt_peer(peer_ip, port):
-	"""Application calls this function to specify the IP address
-	and port number used by remote peer process.
-
-	Input arguments: peer's IP address and port number
-	"""
-	######## Your implementation #######
-    ### Taken from rdt1.py ###
-	global __peeraddr
-	__peeraddr = (peer_ip, port)
-
-# Upnpck function for data packets
-def unpack_msg(msg):
-	size = struct.calcsize(MSG_FORMAT)
-	(msg_type, seq_num, recv_checksum, payload_len), payload = struct.unpack(
-        MSG_FORMAT, msg[:size]), msg[size:]
-	# Byte order conversion otherwise receiving error
-	return (msg_type, seq_num, recv_checksum,
-            socket.ntohs(payload_len)), payload 
-
-# if the received packet is corrupted - then true.
-def check_if_corrupt(recv_pkt):
-	(msg_type, seq_num, recv_checksum, payload_len), payload = unpack_msg(
-        recv_pkt)
-	init_msg = struct.Struct(MSG_FORMAT).pack(msg_type, seq_num, 0,
-                                              socket.htons(
-                                                  payload_len)) + payload
-
-	calc_checksum = __IntChksum(bytearray(init_msg))
-	result = recv_checksum != calc_checksum
-	return result
-
-# Check if the received packet is low <= pkt_type <= high
-def type_between(recv_pkt, pkt_type, low, high):
-	(recv_type, recv_seq_num, _, _), _ = unpack_msg(recv_pkt)
-	if recv_seq_num < low:  # Case -- Modular arithmetic
-		recv_seq_num += SEQ_SIZE
-	return recv_type == pkt_type and low <= recv_seq_num <= high
-
-# TRUE if the received packet is pkt_type
-def is_type(recv_pkt, pkt_type):
-	(recv_type, _, _, _), _ = unpack_msg(recv_pkt)
-	return recv_type == pkt_type
-
-# Create the ACK 
-def create_ACK(seq_num):
-    # Make initial message
-	msg_format = struct.Struct(MSG_FORMAT)
-	checksum = 0  # First set checksum to 0
-	init_msg = msg_format.pack(ACK_ID, seq_num, checksum,
-                               socket.htons(0)) + b''
-    # checksum calculation
-	checksum = __IntChksum(bytearray(init_msg))
-    # Complete msg
-	return msg_format.pack(ACK_ID, seq_num, checksum, socket.htons(0)) + b''
-
-
-def __checker(msg):
-	if check_if_corrupt(msg):
-		(msg_type, _, _, payload_len), payload = unpack_msg(msg)
-		if msg_type == ACK_ID:
-			return "Recieved a corrupt package: Type = ACK, Length = " + str(HEADER_SIZE)
-		elif msg_type == DATA_ID:
-			return "Recieved a corrupt package: Type = DATA, Length = " + str(payload_len + HEADER_SIZE)
-		else:
-			return "Corrupted message type ID - ACK or DATA"
-	msg_str = ""
-	(msg_type, seq_num, checksum, payload_len), payload = unpack_msg(msg)
-	if msg_type == ACK_ID:
-		msg_str += "the ACK"
-	elif msg_type == DATA_ID:
-		msg_str += "the DATA"
-	msg_str += " with the seqNo. : %d" % seq_num
-	return msg_str
-
-
-# -- other constants -- #
-DATA_ID = 12  # ID 12 for Data
-ACK_ID = 11  # ID 11 means ACK
-HEADER_SIZE = 6  # Header size is 6 bytes as mentioned
-MSG_FORMAT = 'BBHH'  # Header structure
-SEQ_SIZE = 256  # Sequence number from 0 to 255 (256 in total)
-
-next_seq_num = 0  # Next sequence number of sender (initially set to 0)
-exp_seq_num = 0  # Expected sequence number of receiver (initially set to 0)
-__S = 0  # base -- Sender 
-__N = 1  # Number of packets to be sent
-data_buffer = []  
-# --------------------- #
-
-
-def rdt_send(sockd, byte_msg):
-	"""Application calls this function to transmit a message (up to
-	W * PAYLOAD bytes) to the remote peer through the RDT socket.
-
-	Input arguments: RDT socket object and the message bytes object
-	Return  -> size of data sent on success, -1 on error
-
-	Note: (1) This function will return only when it knows that the
-	whole message has been successfully delivered to remote process.
-	(2) Catch any known error and report to the user.
-	"""
-	######## Your implementation #######
-	global __S, next_seq_num, __N, data_buffer
-	whole_msg_len = len(byte_msg)  # Size of the whole message, to be returned
-
-    # Number of packets needed to send the whole message (byte_msg)
-	__N = int(math.ceil(
-        float(len(byte_msg)) / PAYLOAD))  # float() to prevent less number of package
-
-	snd_pkt = [None] * __N  # Packets to be sent
-	first_unacked_ind = 0  # Index of the 1st unACK packet
-	__S = next_seq_num  # Update the baase -- sender
-
-	print("rdt_send: Send %d packets" % __N)
-
-    # Create and send all the data packets
-	for i in range(__N):
-		# Cut and extract message remaining
-		if len(byte_msg) > PAYLOAD:
-			data = byte_msg[0:PAYLOAD]
-			byte_msg = byte_msg[PAYLOAD:]
-		else:
-			data = byte_msg
-			byte_msg = None
-
-   		# Make the data packet
-		msg_format = struct.Struct(MSG_FORMAT)
-		checksum = 0  # First set checksum to 0
-		init_msg = msg_format.pack(DATA_ID, next_seq_num, checksum,
-                               socket.htons(len(data))) + data
-
-    	# Calculate checksum
-		checksum = __IntChksum(bytearray(init_msg))
-
-		# Complete msg
-		snd_pkt[i] = msg_format.pack(DATA_ID, next_seq_num, checksum,
-                                   socket.htons(len(data))) + data
-
-        # Send the new packet
-		try:
-			__udt_send(sockd, __peeraddr, snd_pkt[i])
-		except socket.error as err_msg:
-			print("send: Socket send error: ", err_msg)
-			return -1
-		print("rdt_send: Sent " + __checker(snd_pkt[i]))
-
-        # Increase the sequence number
-		next_seq_num = (next_seq_num + 1) % SEQ_SIZE
-
-	r_sock_list = [sockd]  
-	while True:  # While all ACKs not received 
-        # Wait for timeout or the ACK
-		r, _, _ = select.select(r_sock_list, [], [], TIMEOUT)
-		if r:  # ACK r DATA just reached
-			for sock in r:
-                # Try to receive ACK or DATA
-				try:
-                    # Include header
-					recv_pkt = __udt_recv(sock, PAYLOAD + HEADER_SIZE)
-				except socket.error as err_msg:
-					print("__udt_recv error: ", err_msg)
-					return -1
-				
-                # If corrupted, Ignore
-				if check_if_corrupt(recv_pkt):
-					print("rdt_send: " +  __checker(recv_pkt))
-                # If is not corrupted,  ACK
-				elif is_type(recv_pkt, ACK_ID):
-                    # IF out-of-range, Ignore
-					if not type_between(recv_pkt, ACK_ID, __S,
-                                             __S + __N - 1):
-						print("rdt_send: received out-of-range ACK")
-                    # ELSE, accept and set ACK status.
-					elif type_between(recv_pkt, ACK_ID, __S,
-                                           __S + __N - 2):
-						print("rdt_send: All segments %d to %d are acknowledged" % (
-                            __S, __S + __N - 2))
-						(_, recv_seq_num, _, _), _ = unpack_msg(recv_pkt)
-                        # Update the first unACK index (as it is cumulative ACK)
-						first_unacked_ind = max( (recv_seq_num - __S + SEQ_SIZE) % SEQ_SIZE + 1,
-                            first_unacked_ind)
-                    # Last and final ACK and return
-					elif type_between(recv_pkt, ACK_ID, __S + __N - 1,
-                                           __S + __N - 1):
-						return whole_msg_len  
-                # If is a not corrupt DATA
-				elif is_type(recv_pkt, DATA_ID):
-					print("rdt_send: Not Received " + __checker(recv_pkt))
-                    # If expected, buffer and ACK
-					(_, recv_seq_num, _, _), _ = unpack_msg(recv_pkt)
-					if (recv_seq_num == exp_seq_num):
-						print("rdt_send: Expected (%d)" % exp_seq_num)
-                        # If not in buffer, add the msg to buffer
-						if recv_pkt not in data_buffer:
-							data_buffer.append(recv_pkt)
-                        # ACK the expected DATA
-						try:
-							__udt_send(sockd, __peeraddr,
-                                       create_ACK(exp_seq_num))
-						except socket.error as err_msg:
-							print("rdt_send: Error in sending ACK to received "
-                                  "data: " + str(
-                                    err_msg))
-							return -1
-						print("rdt_send: Sent ACK[%d]" % exp_seq_num)
-                    # If DATA not expected, send ACK to expected - 1 (older)
-					else:
-                        # Send ACK for the previous to the expected
-						try:
-							__udt_send(sockd, __peeraddr, create_ACK(
-                                ((exp_seq_num - 1 + SEQ_SIZE) % SEQ_SIZE)))
-						except socket.error as err_msg:
-							print("send(): Error in ACK-ing expected data: " +
-                                  str(err_msg))
-							return b''
-						print(
-                            "rdt_send: NOT expected (%d) , sent ACK["
-                            "%d]" % (
-                                exp_seq_num,
-                                (exp_seq_num - 1 + SEQ_SIZE) % SEQ_SIZE))
-        # Timeout and re-transmitting the packet
-		else:
-			for i in range(first_unacked_ind, __N):
-				try:
-					__udt_send(sockd, __peeraddr, snd_pkt[i])
-					print("rdt_send: TIMEOUT!! Retransmit " + (__checker(snd_pkt[i]))+ " again" )
-				except socket.error as err_msg:
-					print("Socket send error: ", err_msg)
-					return -1
-
-
-
-def rdt_recv(sockd, length):
-	"""Application calls this function to wait for a message from the
-	remote peer; the caller will be blocked waiting for the arrival of
-	the message. Upon receiving a message from the underlying UDT layer,
-    the function returns immediately.
-
-	Input arguments: RDT socket object and the size of the message to
-	received.
-	Return  -> the received bytes message object on success, b'' on error
-
-	Note: Catch any known error and report to the user.
-	"""
-	######## Your implementation #######
-	global exp_seq_num, data_buffer
-
-    # Check if buffer
-	while len(data_buffer) > 0:
-        # FIFO manner Pop 
-		recv_pkt = data_buffer.pop(0)  # NOT corrupted as buffer
-
-        # Buffered data with expected seq num, accept and return
-		(_, recv_seq_num, _, _), _ = unpack_msg(recv_pkt)
-		if (recv_seq_num == exp_seq_num):
-			print("rdt_recv: Expected (%d)" % exp_seq_num)
-            # Increase expected sequence number
-			exp_seq_num = (exp_seq_num + 1) % SEQ_SIZE
-			(_), payload = unpack_msg(recv_pkt)  # Extract payload
-			return payload
-
-	while True:  # Repeat until received the expected DATA
-		try:
-			recv_pkt = __udt_recv(sockd, length + HEADER_SIZE)
-		except socket.error as err_msg:
-			print("rdt_recv: Socket receive error: " + str(err_msg))
-			return b''
-		print("rdt_recv: " + __checker(recv_pkt))
-
-        # If packet is corrupt or is ACK, Ignore
-		if check_if_corrupt(recv_pkt) or is_type(recv_pkt, ACK_ID):
-			print("rdt_recv: Received corrupted or ACK")
-
-        # If received DATA
-		elif is_type(recv_pkt, DATA_ID):
-            # If DATA has expected seq num, accept
-			(_, recv_seq_num, _, _), _ = unpack_msg(recv_pkt)
-			if (recv_seq_num == exp_seq_num):
-                # Send ACK for this expected packet
-				try:
-					 __udt_send(sockd, __peeraddr, create_ACK(exp_seq_num))
-				except socket.error as err_msg:
-					print("recv(): Error in ACK-ing expected data: " + str(
-                        err_msg))
-					return b''
-				print("rdt_recv: Expected, sent ACK seqNo. %d" % exp_seq_num)
-                # Increment expected sequence number
-				exp_seq_num = (exp_seq_num + 1) % SEQ_SIZE
-				(_), payload = unpack_msg(recv_pkt)  # Extract payload
-				return payload
-            # If DATA is not expected DATA
-			else:
-                # Send ACK for the previous expected DATA
-				try:
-					__udt_send(sockd, __peeraddr,
-                               create_ACK((exp_seq_num - 1 + SEQ_SIZE) % SEQ_SIZE))
-				except socket.error as err_msg:
-					print("rdt_recv: Error in ACK-ing expected data: " + str(
-                        err_msg))
-					return b''
-				print("rdt_recv: NOT expected (%d) (expected : %d )" % (
-                    exp_seq_num, (exp_seq_num - 1 + SEQ_SIZE) % SEQ_SIZE))
-
-
-def rdt_close(sockd):
-	"""Application calls this function to close the RDT socket.
-
-	Input argument: RDT socket object
-
-	Note: (1) Catch any known error and report to the user.
-	(2) Before closing the RDT socket, the reliable layer needs to wait for TWAIT
-	time units before closing the socket.
-	"""
-	######## Your implementation #######
-	r_sock_list = [sockd]  # Used in select.select()
-
-	can_close = False 
-
-	while not can_close:
-		r, _, _ = select.select(r_sock_list, [], [],
-                                TWAIT)  # Wait for TWAIT time
-		if r:  # If any activity
-			for sock in r:
-                # Try to receive 
-				try:
-					recv_pkt = __udt_recv(sock, PAYLOAD + HEADER_SIZE)
-				except socket.error as e:
-					print("Socket recv error: ", e)
-				print("rdt_recv: Received a message of size " + __checker(recv_pkt) )
-
-				# Not corrupted
-				if not check_if_corrupt(recv_pkt):
-                    # Ack the DATA packet
-					(_, recv_seq_num, _, _), _ = unpack_msg(recv_pkt)
-					try:
-						length = __udt_send(sockd, __peeraddr, create_ACK(recv_seq_num))
-					except socket.error as err_msg:
-						print("close(): Error in ACK-ing data: " + str(
-                            err_msg))
-					print("rdt_send: Sent last ACK message of size %d" % length)
-		# Timeout
-		else:  
-			can_close = True
-			try:
-				print("rdt_close: Nothing happened for 0.500 second")
-				# Close socket
-				sockd.close()
-				print("rdt_close: Release the socket")
-			except socket.error as err_msg:
-				print("Socket close error: ", err_msg)
+#!/usr/bin/python3
+"""Implementation of RDT4.0
+
+functions: rdt_network_init, rdt_socket(), rdt_bind(), rdt_peer()
+           rdt_send(), rdt_recv(), rdt_close()
+           rdt_start_io(), rdt_flush(), rdt_set_integrity()
+           rdt_set_compression(), rdt_set_fec(), rdt_set_sack()
+           rdt_set_pacing(), rdt_set_profiling(), rdt_stats()
+           rdt_profile(), rdt_set_acceptor(), rdt_reply()
+           rdt_set_logging(), rdt_core_send(), rdt_core_step()
+           rdt_core_pending(), rdt_core_error(), rdt_recv_stream()
+           rdt_core_set_window(), rdt_set_ack_delay()
+           rdt_set_memory()
+
+Student name: Utsav Raj
+Date and version: 27/04/2021 ver 1 
+Development platform: MacOS
+Python version: 3.8.8 64-bit
+"""
+
+import socket
+import random
+
+# --- other imports --- #
+import struct
+import select
+import time
+import queue
+import threading
+import collections
+import zlib
+import os
+# --------------------- #
+
+
+#some constants
+PAYLOAD = 1000		#size of data payload of each packet
+CPORT = 100			#Client port number - Change to your port number
+SPORT = 200			#Server port number - Change to your port number
+TIMEOUT = 0.05		#retransmission timeout duration
+TWAIT = 10*TIMEOUT 	#TimeWait duration
+
+#store peer address info
+__peeraddr = ()		#set by rdt_peer()
+#define the error rates and window size
+__LOSS_RATE = 0.0	#set by rdt_network_init()
+__ERR_RATE = 0.0
+__W = 1
+__BURST = 1.0		#mean length of a loss burst
+__in_burst = False	#the unreliable layer is losing a burst of packets
+__LINK_RATE = 0.0	#bottleneck link rate in bytes/s, 0 for none
+__LINK_QUEUE = 0	#no. of packets its drop-tail queue holds
+__link_backlog = 0.0	#bytes waiting in the bottleneck queue
+__link_at = 0.0		#time when __link_backlog was last drained
+
+#internal functions - being called within the module
+def __udt_send(sockd, peer_addr, byte_msg):
+	"""This function is for simulating packet loss or corruption in an unreliable channel.
+
+	Input arguments: Unix socket object, peer address 2-tuple and the message
+	Return  -> size of data sent, -1 on error
+	Note: it does not catch any exception
+	"""
+	global __LOSS_RATE, __ERR_RATE, __in_burst, __link_backlog, __link_at
+	if peer_addr == ():
+		print("Socket send error: Peer address not set yet")
+		return -1
+	else:
+		__stats["datagrams_sent"] += 1
+		#Simulate a bottleneck link: a burst that overflows its queue is dropped
+		if __LINK_RATE > 0:
+			now = time.monotonic()
+			__link_backlog = max(__link_backlog - (now - __link_at) * __LINK_RATE, 0)
+			__link_at = now
+			if __link_backlog + len(byte_msg) > __LINK_QUEUE * (PAYLOAD + HEADER_SIZE):
+				print("WARNING: udt_send: Packet dropped at the bottleneck queue!!")
+				__stats["queue_drops"] += 1
+				return len(byte_msg)
+			__link_backlog += len(byte_msg)
+
+		#Simulate packet loss; a loss starts a burst that lasts __BURST
+		#packets on average (Gilbert model), keeping the mean loss rate
+		drop = random.random()
+		if __in_burst or drop < __LOSS_RATE / __BURST:
+			__in_burst = random.random() >= 1.0 / __BURST
+			#simulate packet loss of unreliable send
+			print("WARNING: udt_send: Packet lost in unreliable layer!!")
+			return len(byte_msg)
+
+		#Simulate packet corruption
+		corrupt = random.random()
+		if corrupt < __ERR_RATE:
+			err_bytearr = bytearray(byte_msg)
+			pos = random.randint(0,len(byte_msg)-1)
+			val = err_bytearr[pos]
+			if val > 1:
+				err_bytearr[pos] -= 2
+			else:
+				err_bytearr[pos] = 254
+			err_msg = bytes(err_bytearr)
+			print("WARNING: udt_send: Packet corrupted in unreliable layer!!")
+			return sockd.sendto(err_msg, peer_addr)
+		else:
+			return sockd.sendto(byte_msg, peer_addr)
+
+def __udt_recv(sockd, length):
+	"""Retrieve message from underlying layer
+
+	Input arguments: Unix socket object and the max amount of data to be received
+	Return  -> the received bytes message object
+	Note: it does not catch any exception
+	"""
+	(rmsg, peer) = sockd.recvfrom(length)
+	return rmsg
+
+def __wait_readable(socks, timeout):
+	"""Wait until a socket has data to read
+
+	Input arguments: list of sockets and the max time to wait (None for no limit)
+	Return  -> list of the readable sockets, empty on timeout
+	Note: it does not catch any exception
+	"""
+	r, _, _ = select.select(socks, [], [], timeout)
+	return r
+
+def __IntChksum(byte_msg):
+	"""Implement the Internet Checksum algorithm
+
+	Input argument: the bytes message object
+	Return  -> 16-bit checksum value
+	Note: it does not check whether the input object is a bytes object
+	"""
+	total = 0
+	length = len(byte_msg)	#length of the byte message object
+	i = 0
+	while length > 1:
+		total += ((byte_msg[i+1] << 8) & 0xFF00) + ((byte_msg[i]) & 0xFF)
+		i += 2
+		length -= 2
+
+	if length > 0:
+		total += (byte_msg[i] & 0xFF)
+
+	while (total >> 16) > 0:
+		total = (total & 0xFFFF) + (total >> 16)
+
+	total = ~total
+
+	return total & 0xFFFF
+
+def __crc(header, payload):
+	"""CRC32 (C-accelerated zlib.crc32) over the base header and the payload
+
+	Return  -> 32-bit CRC value
+	"""
+	return zlib.crc32(payload, zlib.crc32(header))
+
+
+#These are the functions used by appliation
+
+def rdt_network_init(drop_rate, err_rate, W, burst=1, link_rate=0, link_queue=0):
+	"""Application calls this function to set properties of underlying network.
+
+    Input arguments: packet drop probability, packet corruption probability, Window size,
+	the mean no. of packets lost in a row (1 for independent losses), and the rate
+	(bytes/s, 0 for none) and queue length (packets) of a bottleneck link
+	"""
+	random.seed()
+	global __LOSS_RATE, __ERR_RATE, __W, __BURST, __LINK_RATE, __LINK_QUEUE
+	__LOSS_RATE = float(drop_rate)
+	__ERR_RATE = float(err_rate)
+	__W = int(W)
+	__BURST = max(float(burst), 1.0)
+	__LINK_RATE = float(link_rate)
+	__LINK_QUEUE = int(link_queue)
+	print("Drop rate:", __LOSS_RATE, "\tError rate:", __ERR_RATE, "\tWindow size:", __W)
+	if __BURST > 1:
+		print("Mean loss burst:", __BURST)
+	if __LINK_RATE > 0:
+		print("Bottleneck link: %.0f B/s\tqueue: %d packets" % (__LINK_RATE, __LINK_QUEUE))
+
+
+def rdt_set_integrity(mode):
+	"""Application calls this function to choose the integrity check of
+	the packets it sends.
+
+	Input argument: "inet" (16-bit Internet checksum) or "crc32" (CRC32 in
+	an extended header)
+	Return  -> 0 on success, -1 on error
+
+	Note: received packets are checked by the mode marked in their header,
+	so the two peers only need to agree on the mode for efficiency.
+	"""
+	global __INTEGRITY
+	if mode not in INTEGRITY_MODES:
+		print("rdt_set_integrity: Unknown integrity mode", mode)
+		return -1
+	__INTEGRITY = mode
+	print("Integrity check:", __INTEGRITY)
+	return 0
+
+
+def rdt_socket():
+	"""Application calls this function to create the RDT socket.
+
+	Null input.
+	Return the Unix socket object on success, None on error
+
+	Note: Catch any known error and report to the user.
+	"""
+	######## Your implementation #######
+	### Taken from rdt1.py ###
+	try:
+		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	except socket.error as err_msg:
+		print("Socket creation error: ", err_msg)
+		return None
+	if os.environ.get("RDT_PROFILE"):
+		rdt_set_profiling(True)
+	return sock
+
+
+def rdt_bind(sockd, port):
+	"""Application calls this function to specify the port number
+	used by itself and assigns them to the RDT socket.
+
+	Input arguments: RDT socket object and port number
+	Return	-> 0 on success, -1 on error
+
+	Note: Catch any known error and report to the user.
+	"""
+	######## Your implementation #######
+	### Taken from rdt1.py ###
+	try:
+		sockd.bind(("", port))
+	except socket.error as err_msg:
+		print("Socket bind error: ", err_msg)
+		return -1
+	return 0
+
+def rdt_peer(peer_ip, port):
+	"""Application calls this function to specify the IP address
+	and port number used by remote peer process.
+
+	Input arguments: peer's IP address and port number
+	"""
+	######## Your implementation #######
+    ### Taken from rdt1.py ###
+	global __peeraddr
+	__peeraddr = (peer_ip, port)
+
+# Upnpck function for data packets
+def unpack_msg(msg):
+	size = struct.calcsize(MSG_FORMAT)
+	(msg_type, seq_num, recv_checksum, payload_len), payload = struct.unpack(
+        MSG_FORMAT, msg[:size]), msg[size:]
+	# Extended header: skip the CRC32 and report the plain type
+	if msg_type & FLAG_CRC:
+		payload = payload[CRC_SIZE:]
+	if msg_type & ~FLAG_MASK == DATA_ID:
+		# Piggybacked ACK of a DATA packet: skip the ACK seq no. and window
+		if msg_type & FLAG_ACK:
+			payload = payload[ACK_SIZE:]
+		# Stream extension of a DATA packet: skip the stream ID and seq no.
+		if msg_type & FLAG_STREAM:
+			payload = payload[STREAM_SIZE:]
+	msg_type &= ~FLAG_MASK
+	# Byte order conversion otherwise receiving error
+	return (msg_type, seq_num, recv_checksum,
+            socket.ntohs(payload_len)), payload 
+
+# if the received packet is corrupted - then true.
+def check_if_corrupt(recv_pkt):
+	if len(recv_pkt) < HEADER_SIZE:
+		return True
+	# CRC32 mode: check the CRC in the extended header
+	if recv_pkt[0] & FLAG_CRC:
+		if len(recv_pkt) < HEADER_SIZE + CRC_SIZE:
+			return True
+		(recv_crc,) = struct.unpack_from(CRC_FORMAT, recv_pkt, HEADER_SIZE)
+		return recv_crc != __crc(recv_pkt[:HEADER_SIZE],
+                                 recv_pkt[HEADER_SIZE + CRC_SIZE:])
+	(msg_type, seq_num, recv_checksum, payload_len) = struct.unpack_from(
+        MSG_FORMAT, recv_pkt)
+	init_msg = struct.Struct(MSG_FORMAT).pack(msg_type, seq_num, 0,
+                                              payload_len) + recv_pkt[HEADER_SIZE:]
+
+	calc_checksum = __IntChksum(init_msg)
+	result = recv_checksum != calc_checksum
+	return result
+
+# Check if the received packet is low <= pkt_type <= high
+def type_between(recv_pkt, pkt_type, low, high):
+	(recv_type, recv_seq_num, _, _), _ = unpack_msg(recv_pkt)
+	if recv_seq_num < low:  # Case -- Modular arithmetic
+		recv_seq_num += SEQ_SIZE
+	return recv_type == pkt_type and low <= recv_seq_num <= high
+
+# TRUE if the received packet is pkt_type
+def is_type(recv_pkt, pkt_type):
+	(recv_type, _, _, _), _ = unpack_msg(recv_pkt)
+	return recv_type == pkt_type
+
+# Create a packet protected by the current integrity mode
+def __make_pkt(pkt_type, seq_num, data):
+	msg_format = struct.Struct(MSG_FORMAT)
+	checksum = 0  # First set checksum to 0
+    # CRC32 mode: base header, then the CRC32 over header and payload
+	if __INTEGRITY == "crc32":
+		header = msg_format.pack(pkt_type | FLAG_CRC, seq_num, checksum,
+                                 socket.htons(len(data)))
+		pkt = bytearray(header)
+		pkt += struct.pack(CRC_FORMAT, __crc(header, data))
+		pkt += data
+		return pkt
+    # Make initial message
+	pkt = bytearray(msg_format.pack(pkt_type, seq_num, checksum,
+                                    socket.htons(len(data))))
+	pkt += data  # the only copy of the payload
+    # checksum calculation
+	checksum = __IntChksum(pkt)
+    # Complete msg - fill in the checksum in place
+	msg_format.pack_into(pkt, 0, pkt_type, seq_num, checksum,
+                         socket.htons(len(data)))
+	return pkt
+
+# Create the ACK (sack: SACK blocks of the packets held beyond seq_num);
+# it advertises the receive window when the application lags behind, and
+# the ACKs of the first window carry the reply of rdt_set_acceptor().
+# It settles the delayed ACK, if one is owed.
+def create_ACK(seq_num, sack=b''):
+	global __advertised, __ack_owed, __ack_due
+	flags = 0
+	head = b''
+	__advertised = max(__rwnd, 0)
+	if __advertised < RECV_WINDOW:
+		flags |= FLAG_WINDOW
+		head = bytes([__advertised])
+	if __replying(seq_num):
+		flags |= FLAG_REPLY
+		head += bytes([len(__ack_reply)]) + __ack_reply
+	__ack_owed, __ack_due = 0, None
+	__stats["acks_sent"] += 1
+	return __make_pkt(ACK_ID | flags, seq_num, head + sack)
+
+# Create the DATA packet (flags: FLAG_COMP for a compressed message,
+# FLAG_STREAM when data starts with the stream extension, FLAG_ACK when
+# it starts with the piggybacked ACK, before the stream extension)
+def create_DATA(seq_num, data, flags=0):
+	return __make_pkt(DATA_ID | flags, seq_num, data)
+
+# Offset of the data of a DATA packet, after the CRC and the piggybacked
+# ACK; it starts with the stream extension, if any
+def __data_offset(recv_pkt):
+	offset = HEADER_SIZE + CRC_SIZE if recv_pkt[0] & FLAG_CRC else HEADER_SIZE
+	return offset + ACK_SIZE if recv_pkt[0] & FLAG_ACK else offset
+
+
+def __checker(msg):
+	if check_if_corrupt(msg):
+		(msg_type, _, _, payload_len), payload = unpack_msg(msg)
+		if msg_type == ACK_ID:
+			return "Recieved a corrupt package: Type = ACK, Length = " + str(HEADER_SIZE)
+		elif msg_type == DATA_ID:
+			return "Recieved a corrupt package: Type = DATA, Length = " + str(payload_len + HEADER_SIZE)
+		else:
+			return "Corrupted message type ID - ACK or DATA"
+	msg_str = ""
+	(msg_type, seq_num, checksum, payload_len), payload = unpack_msg(msg)
+	if msg_type == ACK_ID:
+		msg_str += "the ACK"
+	elif msg_type == DATA_ID:
+		msg_str += "the DATA"
+	elif msg_type == FEC_ID:
+		msg_str += "the FEC parity"
+	msg_str += " with the seqNo. : %d" % seq_num
+	return msg_str
+
+
+# -- other constants -- #
+DATA_ID = 12  # ID 12 for Data
+ACK_ID = 11  # ID 11 means ACK
+HEADER_SIZE = 6  # Header size is 6 bytes as mentioned
+MSG_FORMAT = 'BBHH'  # Header structure
+SEQ_SIZE = 256  # Sequence number from 0 to 255 (256 in total)
+FLAG_MASK = 0xF0  # High bits of the type byte mark header extensions
+FLAG_CRC = 0x80  # Extended header: CRC32 follows the base header
+FLAG_COMP = 0x40  # Packet belongs to a compressed message
+FLAG_REPLY = 0x20  # ACK carries the receiver's reply to the first DATA packet
+FLAG_STREAM = 0x20  # DATA belongs to a stream: the stream extension follows (the CRC)
+FLAG_WINDOW = 0x10  # ACK advertises the receive window in its first payload byte
+FLAG_ACK = 0x10  # DATA carries a piggybacked ACK: the ACK extension follows (the CRC)
+CRC_FORMAT = '!I'  # CRC32 extension
+CRC_SIZE = 4
+ACK_FORMAT = 'BB'  # Piggybacked ACK extension: cumulative ACK seq no. and receive window
+ACK_SIZE = 2
+STREAM_FORMAT = '!BH'  # Stream extension: stream ID and seq no. within the stream
+STREAM_SIZE = 3
+FEC_ROOM = 8  # Room for the FEC headers in front of a parity payload
+MAX_HEADER_SIZE = HEADER_SIZE + CRC_SIZE + ACK_SIZE + STREAM_SIZE + FEC_ROOM  # Largest header of any packet
+INTEGRITY_MODES = ("inet", "crc32")
+
+__INTEGRITY = "inet"  # set by rdt_set_integrity()
+
+next_seq_num = 0  # Next sequence number of sender (initially set to 0)
+exp_seq_num = 0  # Expected sequence number of receiver (initially set to 0)
+data_buffer = collections.deque()  # DATA delivered in order, not yet taken by rdt_recv()
+# --------------------- #
+
+
+# -- compression stage and transfer statistics -- #
+COMP_MIN = 512  # Messages shorter than this are never compressed
+COMP_SAMPLE = 4096  # Bytes test-compressed to detect incompressible data
+COMP_RATIO = 0.9  # Send compressed only if it shrinks below this ratio
+COMP_FORMAT = '!I'  # Compressed frame: its length precedes the zlib data
+COMP_SIZE = 4
+
+__COMPRESS = 0  # zlib level set by rdt_set_compression(), 0 is off
+__frames = {}  # stream ID -> [length, frame] of a compressed message being reassembled
+__recv_rest = b''  # data not yet returned by rdt_recv()
+__recv_stream = 0  # stream ID of __recv_rest
+__stats = {
+	"msg_bytes_sent": 0,  # bytes passed to rdt_send()
+	"payload_bytes_sent": 0,  # bytes segmented into DATA packets
+	"msgs_compressed": 0,
+	"msgs_uncompressed": 0,  # compression off, too short or incompressible
+	"compress_cpu": 0.0,  # CPU seconds spent compressing
+	"msg_bytes_recv": 0,  # bytes returned by rdt_recv()
+	"payload_bytes_recv": 0,  # bytes of accepted DATA packets
+	"decompress_cpu": 0.0,  # CPU seconds spent decompressing
+	"fec_parity_sent": 0,  # FEC parity packets sent
+	"fec_rebuilt": 0,  # lost DATA packets rebuilt from FEC parity
+	"retrans_pkts": 0,  # DATA packets sent again after a timeout
+	"retrans_bytes": 0,
+	"srtt": 0.0,  # smoothed round-trip time in seconds, 0 before the first sample
+	"queue_drops": 0,  # packets dropped at the simulated bottleneck queue
+	"datagrams_sent": 0,  # datagrams passed to the unreliable layer, of any type
+	"acks_sent": 0,  # pure ACK packets
+	"acks_piggybacked": 0,  # ACKs carried by DATA packets
+}
+
+
+def rdt_set_compression(level):
+	"""Application calls this function to turn the compression stage
+	on or off; both peers should agree on it at connection start.
+
+	Input argument: zlib level - 0 is off, 1 is the fastest, 9 the best
+	Return  -> 0 on success, -1 on error
+
+	Note: rdt_send() compresses each message before segmentation and skips
+	data that does not compress; rdt_recv() always decompresses messages
+	marked as compressed in the header.
+	"""
+	global __COMPRESS
+	level = int(level)
+	if not 0 <= level <= 9:
+		print("rdt_set_compression: Compression level must be 0 to 9")
+		return -1
+	__COMPRESS = level
+	print("Compression level:", __COMPRESS)
+	return 0
+
+
+def rdt_stats():
+	"""Application calls this function to get the transfer statistics
+
+	Return  -> dictionary of counters (see __stats)
+	"""
+	return dict(__stats)
+
+
+def __compress(byte_msg):
+	"""Compress a message before segmentation when it is worth it
+
+	Return  -> (data to be segmented, header flags for its packets)
+	"""
+	__stats["msg_bytes_sent"] += len(byte_msg)
+	if __COMPRESS == 0 or len(byte_msg) < COMP_MIN:
+		__stats["msgs_uncompressed"] += 1
+		__stats["payload_bytes_sent"] += len(byte_msg)
+		return (byte_msg, 0)
+	start = time.thread_time()
+    # Test a sample at the fastest level first, so incompressible data
+    # (already compressed, encrypted) costs little CPU
+	sample = byte_msg[:COMP_SAMPLE]
+	data = None
+	if len(zlib.compress(sample, 1)) < len(sample) * COMP_RATIO:
+		data = zlib.compress(byte_msg, __COMPRESS)
+		if len(data) + COMP_SIZE >= len(byte_msg) * COMP_RATIO:
+			data = None
+	__stats["compress_cpu"] += time.thread_time() - start
+	if data is None:
+		__stats["msgs_uncompressed"] += 1
+		__stats["payload_bytes_sent"] += len(byte_msg)
+		return (byte_msg, 0)
+	__stats["msgs_compressed"] += 1
+	__stats["payload_bytes_sent"] += COMP_SIZE + len(data)
+	return (struct.pack(COMP_FORMAT, len(data)) + data, FLAG_COMP)
+
+
+def __unframe(recv_pkt):
+	"""Return the application data carried by an accepted DATA packet
+
+	The packets of a compressed message are collected until the whole
+	frame is in and then decompressed; each stream has its own frame.
+	Return  -> the data, b'' while a frame is incomplete, None on error
+	"""
+	(_), payload = unpack_msg(recv_pkt)
+	__stats["payload_bytes_recv"] += len(payload)
+	if not recv_pkt[0] & FLAG_COMP:
+		__stats["msg_bytes_recv"] += len(payload)
+		return payload
+	stream = __stream_of(recv_pkt)[0]
+	frame = __frames.get(stream)
+	if frame is None:  # First packet of a compressed message
+		frame = __frames[stream] = [struct.unpack_from(COMP_FORMAT, payload)[0], bytearray()]
+		payload = payload[COMP_SIZE:]
+	frame[1] += payload
+	if len(frame[1]) < frame[0]:
+		return b''
+	del __frames[stream]
+	start = time.thread_time()
+	try:
+		data = zlib.decompress(frame[1])
+	except zlib.error as err_msg:
+		print("rdt_recv: Decompression error: ", err_msg)
+		data = None
+	__stats["decompress_cpu"] += time.thread_time() - start
+	if data is not None:
+		__stats["msg_bytes_recv"] += len(data)
+	return data
+# --------------------- #
+
+
+# -- receiver reorder buffer and selective acknowledgement -- #
+SACK_FORMAT = 'BB'  # SACK block in the ACK payload: first and last seq no. held
+SACK_SIZE = 2
+SACK_MAX = 8  # Max no. of SACK blocks in an ACK
+HOLD_RANGE = SEQ_SIZE // 2  # DATA up to this far ahead of exp_seq_num is held
+
+__SACK = False  # set by rdt_set_sack()
+__held = {}  # seq no. -> DATA packet received (or rebuilt) ahead of exp_seq_num
+
+
+def rdt_set_sack(on):
+	"""Application calls this function to retransmit only the packets
+	the receiver does not hold, as reported by the SACK blocks of its ACKs.
+
+	Input argument: True to use SACK, False for plain Go-Back-N
+	Return  -> 0
+
+	Note: the receiver always holds DATA that arrives out of order and
+	reports it in SACK blocks; a sender without SACK ignores them.
+	"""
+	global __SACK
+	__SACK = bool(on)
+	print("Selective ACK:", "on" if __SACK else "off")
+	return 0
+
+
+def __hold(recv_pkt):
+	"""Keep a DATA packet that arrived ahead of the expected one, to be
+	delivered without a retransmission once the gap is filled"""
+	seq_num = recv_pkt[1]
+	if 0 < (seq_num - exp_seq_num) % SEQ_SIZE < HOLD_RANGE:
+		__held[seq_num] = recv_pkt
+		if recv_pkt[0] & FLAG_STREAM:
+			__stream_held[__stream_of(recv_pkt)] = seq_num
+
+
+def __take():
+	"""Return the held DATA packet with the expected seq no., None if absent"""
+	return __held.get(exp_seq_num)
+
+
+def __delivered(recv_pkt):
+	"""Account for the delivery of the expected DATA packet"""
+	__held.pop(recv_pkt[1], None)
+	if recv_pkt[0] & FLAG_STREAM:
+		__stream_held.pop(__stream_of(recv_pkt), None)
+	__fec_delivered(recv_pkt)
+	__accept(recv_pkt)
+
+
+def __sack_blocks():
+	"""Return -> SACK blocks of the held packets, for the payload of an ACK"""
+	if not __held:
+		return b''
+	blocks = []
+	for dist in sorted((seq_num - exp_seq_num) % SEQ_SIZE for seq_num in __held):
+		if blocks and dist == blocks[-1][1] + 1:
+			blocks[-1][1] = dist
+		else:
+			blocks.append([dist, dist])
+	return b''.join(struct.pack(SACK_FORMAT, (exp_seq_num + first) % SEQ_SIZE,
+                                (exp_seq_num + last) % SEQ_SIZE) for first, last in blocks[:SACK_MAX])
+
+
+def __sacked(recv_pkt):
+	"""Return -> seq nos. in the SACK blocks of an ACK packet"""
+	(_, _, payload) = __ack_parts(recv_pkt)
+	seqs = []
+	for i in range(0, len(payload) - SACK_SIZE + 1, SACK_SIZE):
+		first, last = struct.unpack_from(SACK_FORMAT, payload, i)
+		seqs.extend((first + j) % SEQ_SIZE for j in range((last - first) % SEQ_SIZE + 1))
+	return seqs
+# --------------------- #
+
+
+# -- multiplexed streams -- #
+# Stream 0 is the plain byte stream of the connection. The DATA packets
+# of streams 1 to STREAM_MAX carry the stream extension and share the seq
+# nos., window, timer and retransmissions of the connection; the receiver
+# delivers a held packet at once when it is the next of its stream, so a
+# loss only delays its own stream (and stream 0, which waits for all).
+STREAM_MAX = 255  # Largest stream ID
+STREAM_SEQ_SIZE = 1 << 16  # Seq no. within a stream from 0 to 65535
+
+__stream_next = {}  # stream ID -> seq no. of its next payload to send
+__stream_exp = {}  # stream ID -> seq no. of its next payload to deliver
+__stream_held = {}  # (stream ID, seq no. in stream) -> seq no. of the held packet
+__early = set()  # seq nos. of held packets already delivered to their stream
+
+
+def __stream_of(recv_pkt):
+	"""Return -> (stream ID, seq no. in the stream) of a DATA packet,
+	(0, None) for stream 0"""
+	if not recv_pkt[0] & FLAG_STREAM:
+		return (0, None)
+	return struct.unpack_from(STREAM_FORMAT, recv_pkt, __data_offset(recv_pkt))
+
+
+def __segment(byte_msg, stream):
+	"""Compress a message (if on) and cut it into payloads; the payloads
+	of streams 1 to STREAM_MAX start with the stream extension
+
+	Return  -> list of (flags, payload)
+	"""
+	byte_msg, flags = __compress(byte_msg)  # Compression stage (if on)
+	byte_msg = memoryview(byte_msg)  # Cut the payloads without copying
+	if stream == 0:
+		return [(flags, byte_msg[i:i+PAYLOAD]) for i in range(0, len(byte_msg), PAYLOAD)]
+	payloads = []
+	stream_seq = __stream_next.get(stream, 0)
+	for i in range(0, len(byte_msg), PAYLOAD):
+		payloads.append((flags | FLAG_STREAM,
+                         struct.pack(STREAM_FORMAT, stream, stream_seq) + byte_msg[i:i+PAYLOAD]))
+		stream_seq = (stream_seq + 1) % STREAM_SEQ_SIZE
+	__stream_next[stream] = stream_seq
+	return payloads
+
+
+def __stream_deliver(recv_pkt, delivered):
+	"""Deliver a DATA packet to its stream"""
+	delivered.append(recv_pkt)
+	if recv_pkt[0] & FLAG_STREAM:
+		stream, stream_seq = __stream_of(recv_pkt)
+		__stream_exp[stream] = (stream_seq + 1) % STREAM_SEQ_SIZE
+
+
+def __stream_ahead(recv_pkt, delivered):
+	"""Deliver a packet held ahead of the gap if it is the next of its
+	stream, then the held packets of the stream that follow it"""
+	stream, stream_seq = __stream_of(recv_pkt)
+	seq_num = __stream_held.get((stream, stream_seq))
+	while seq_num is not None and seq_num not in __early and __stream_exp.get(stream, 0) == stream_seq:
+		__early.add(seq_num)
+		__stream_deliver(__held[seq_num], delivered)
+		stream_seq = (stream_seq + 1) % STREAM_SEQ_SIZE
+		seq_num = __stream_held.get((stream, stream_seq))
+# --------------------- #
+
+
+# -- single round-trip connection setup -- #
+REPLY_MAX = 255  # Longest reply to the first DATA packet
+
+__acceptor = None  # set by rdt_set_acceptor()
+__ack_reply = b''  # reply of the acceptor, carried by the ACKs of the first window
+__ack_reply_seq = 0  # seq no. of the first DATA packet
+__peer_reply = None  # reply found in the peer's ACKs, returned by rdt_reply()
+
+
+def rdt_set_acceptor(acceptor):
+	"""Application calls this function to answer the first DATA packet
+	of the connection in its ACK, before the data reaches rdt_recv()
+
+	Input argument: function called with the payload of the first DATA
+	packet; it returns the reply (bytes of up to REPLY_MAX), or None
+	Return  -> 0
+
+	Note: the reply rides on every ACK of the first W packets, so the
+	sender finds it on the ACK that completes its first message, even if
+	other ACKs are lost. The first message must not be compressed.
+	"""
+	global __acceptor
+	__acceptor = acceptor
+	return 0
+
+
+def rdt_reply():
+	"""Application calls this function to get the peer's reply to the
+	first DATA packet (see rdt_set_acceptor())
+
+	Return  -> the reply bytes, None if no reply has arrived
+	"""
+	return __peer_reply
+
+
+def __accept(recv_pkt):
+	"""Hand the first DATA packet to the acceptor and keep its reply"""
+	global __acceptor, __ack_reply, __ack_reply_seq
+	if __acceptor is None:
+		return
+	acceptor, __acceptor = __acceptor, None
+	(_, seq_num, _, _), payload = unpack_msg(recv_pkt)
+	reply = acceptor(bytes(payload)) or b''
+	if len(reply) > REPLY_MAX:
+		print("rdt_recv: Reply to the first packet is too long, not sent")
+		reply = b''
+	__ack_reply, __ack_reply_seq = bytes(reply), seq_num
+
+
+def __replying(seq_num):
+	"""Return -> True if the ACK of seq_num carries the reply to the first packet"""
+	return bool(__ack_reply) and (seq_num - __ack_reply_seq) % SEQ_SIZE < __W
+
+
+def __note_reply(recv_pkt):
+	"""Keep the reply carried by an ACK from the peer"""
+	global __peer_reply
+	if recv_pkt[0] & FLAG_REPLY and __peer_reply is None:
+		(_, __peer_reply, _) = __ack_parts(recv_pkt)
+# --------------------- #
+
+
+# -- flow control: advertised receive window -- #
+# The receiver buffers up to RECV_WINDOW delivered DATA packets that the
+# application has not read yet. While some are waiting, its ACKs advertise
+# how many more it can take, and the sender keeps no more than that in
+# flight; a sender facing a zero window probes it with one packet every
+# TIMEOUT, and the receiver sends a window update once the application
+# has read a window's worth. So a slow reader slows the sender down
+# instead of making it time out.
+RECV_WINDOW = 255  # DATA packets buffered for the application (fits the ACK byte)
+
+__rwnd = RECV_WINDOW  # free receive buffer in packets, set by rdt_core_set_window()
+__advertised = RECV_WINDOW  # window advertised in the last ACK
+__window_update = False  # an ACK must tell the sender that the window reopened
+__peer_window = RECV_WINDOW  # receive window advertised by the peer
+
+
+def rdt_core_set_window(free):
+	"""Tell the core how many more DATA packets the application can take
+	(the room left in the receive buffer, see rdt_set_memory()); the ACKs
+	advertise it, and DATA that finds no room is not delivered
+
+	Input argument: no. of packets
+	Return  -> 0
+	"""
+	global __rwnd, __window_update
+	__rwnd = free
+	if __advertised == 0 and free >= min(__W, __MEM_CAP // PAYLOAD):
+		__window_update = True
+	return 0
+
+
+def __ack_parts(recv_pkt):
+	"""Return -> (advertised window, reply, SACK blocks) of an ACK packet;
+	the window is RECV_WINDOW and the reply None when absent"""
+	(_), payload = unpack_msg(recv_pkt)
+	window = RECV_WINDOW
+	if recv_pkt[0] & FLAG_WINDOW and payload:
+		window, payload = payload[0], payload[1:]
+	reply = None
+	if recv_pkt[0] & FLAG_REPLY and payload and len(payload) > payload[0]:
+		reply, payload = bytes(payload[1:1 + payload[0]]), payload[1 + payload[0]:]
+	return (window, reply, payload)
+# --------------------- #
+
+
+# -- memory caps: backpressure -- #
+# Each direction of the connection buffers at most __MEM_CAP bytes of
+# payload. The receive buffer (DATA delivered but not read yet) advertises
+# the room it has left as the window, and DATA that finds no room, e.g. a
+# zero window probe, is ACKed but not delivered, so the sender sends it
+# again later. The send side takes a message in pieces: rdt_send() hands
+# the core no more than the cap at a time and waits for ACKs before the
+# next piece, and the full-duplex send queue holds at most the cap.
+MEM_CAP = RECV_WINDOW * PAYLOAD  # Default and largest cap of each direction in bytes
+
+__MEM_CAP = MEM_CAP  # set by rdt_set_memory()
+
+
+def rdt_set_memory(cap):
+	"""Application calls this function to cap the payload bytes the
+	connection buffers in each direction; call it before rdt_start_io().
+
+	Input argument: cap in bytes, from PAYLOAD to MEM_CAP
+	Return  -> 0 on success, -1 on error
+
+	Note: the cap holds by backpressure, not by dropping data: rdt_send()
+	waits for ACKs, and the receive window shrinks while the application
+	lags behind.
+	"""
+	global __MEM_CAP
+	cap = int(cap)
+	if not PAYLOAD <= cap <= MEM_CAP:
+		print("rdt_set_memory: Memory cap must be %d to %d bytes" % (PAYLOAD, MEM_CAP))
+		return -1
+	if __io_thread is not None:
+		print("rdt_set_memory: I/O thread is already running")
+		return -1
+	__MEM_CAP = cap
+	return 0
+
+
+def __recv_room(buffered):
+	"""Return -> no. of DATA packets the receive buffer has room for, with
+	buffered packets in it"""
+	return __MEM_CAP // PAYLOAD - buffered
+
+
+def __pieces(byte_msg):
+	"""Return -> the message cut into pieces of at most the cap, without copying"""
+	view = memoryview(byte_msg)
+	return [view[i:i+__MEM_CAP] for i in range(0, len(view), __MEM_CAP)] or [view]
+# --------------------- #
+
+
+# -- delayed and piggybacked ACKs -- #
+# In-order DATA is not ACKed at once: the ACK rides on the next DATA packet
+# going back (the ACK extension carries the cumulative ACK seq no. and the
+# receive window), and a pure ACK is sent only when no DATA has gone back
+# within the ACK delay, or at once for every ACK_EVERY packets. DATA out of
+# order, the ACKs that report held packets (SACK) and those carrying the
+# reply to the first packet are never delayed.
+ACK_DELAY = 0.005  # Default delay of a pure ACK in seconds (well below TIMEOUT)
+ACK_EVERY = 2  # A pure ACK goes at once when it acknowledges this many packets
+
+__ACK_DELAY = ACK_DELAY  # set by rdt_set_ack_delay()
+__ack_owed = 0  # in-order DATA packets delivered but not acknowledged yet
+__ack_due = None  # when the owed ACK goes as a pure ACK; None when none is owed
+
+
+def rdt_set_ack_delay(delay):
+	"""Application calls this function to set how long the ACK of received
+	DATA waits for a DATA packet going back to carry it.
+
+	Input argument: the delay in seconds, 0 to ACK every packet at once
+	(unless DATA goes back in the same rdt_core_step())
+	Return  -> 0 on success, -1 on error
+
+	Note: the peer needs no setting; it always takes the ACKs carried by
+	DATA packets.
+	"""
+	global __ACK_DELAY
+	delay = float(delay)
+	if not 0 <= delay < TIMEOUT:
+		print("rdt_set_ack_delay: Delay must be at least 0 and less than TIMEOUT")
+		return -1
+	__ACK_DELAY = delay
+	print("ACK delay: %.3f s" % __ACK_DELAY)
+	return 0
+
+
+def __ack_delivered(now, count, out):
+	"""Owe the ACK of count DATA packets just delivered in order, or send
+	it at once if it must not wait
+
+	Note: an ACK due at once still rides on DATA sent in the same
+	rdt_core_step(); only the ACKs with SACK blocks or the reply cannot.
+	While DATA is queued, the ACK waits for it (at most the ACK delay)
+	however many packets it acknowledges, as the window may open soon.
+	"""
+	global __ack_owed, __ack_due
+	__ack_owed += count
+	if __ack_due is None:
+		__ack_due = now + __ACK_DELAY
+	ack_num = (exp_seq_num - 1) % SEQ_SIZE
+	if __held or __replying(ack_num):
+		out.append(create_ACK(ack_num, __sack_blocks()))
+	elif __ack_owed >= ACK_EVERY and not __out_q:
+		__ack_due = now
+
+
+def __piggyback():
+	"""Return -> the ACK extension for the next DATA packet, which settles
+	the owed ACK; b'' when none is owed"""
+	global __ack_owed, __ack_due, __advertised
+	if not __ack_owed:
+		return b''
+	__ack_owed, __ack_due = 0, None
+	__advertised = min(max(__rwnd, 0), RECV_WINDOW)
+	__stats["acks_piggybacked"] += 1
+	return struct.pack(ACK_FORMAT, (exp_seq_num - 1) % SEQ_SIZE, __advertised)
+
+
+def __piggybacked(recv_pkt):
+	"""Return -> (cumulative ACK seq no., advertised window) carried by a
+	DATA packet with FLAG_ACK"""
+	offset = HEADER_SIZE + CRC_SIZE if recv_pkt[0] & FLAG_CRC else HEADER_SIZE
+	return struct.unpack_from(ACK_FORMAT, recv_pkt, offset)
+# --------------------- #
+
+
+# -- paced transmission -- #
+PACE_COST = PAYLOAD + HEADER_SIZE  # Tokens (bytes) taken by each DATA packet
+PACE_BURST = 4  # Packets the token bucket lets out back-to-back
+RTT_GAIN = 0.125  # Weight of a new RTT sample in the smoothed RTT
+
+__PACE = False  # set by rdt_set_pacing()
+__PACE_CAP = 0.0  # max rate in bytes/s, 0 is no cap
+__tokens = 0.0  # bytes the token bucket allows to be sent now
+__tokens_at = 0.0  # time when __tokens was last topped up
+__srtt = 0.0  # smoothed round-trip time, 0 before the first sample
+
+
+def rdt_set_pacing(on, rate_cap=0):
+	"""Application calls this function to spread the packets it sends
+	over the round-trip time instead of sending the window in a burst.
+
+	Input arguments: True to pace, and the max rate in bytes/s (0 for none)
+	Return  -> 0 on success, -1 on error
+
+	Note: the pace is W packets per smoothed RTT, capped at rate_cap; until
+	the first RTT sample arrives only the cap applies.
+	"""
+	global __PACE, __PACE_CAP
+	rate_cap = float(rate_cap)
+	if rate_cap < 0:
+		print("rdt_set_pacing: Rate cap must not be negative")
+		return -1
+	__PACE, __PACE_CAP = bool(on), rate_cap
+	if __PACE:
+		print("Pacing: on\trate cap:", "%.0f B/s" % __PACE_CAP if __PACE_CAP else "none")
+	return 0
+
+
+def __rtt_sample(sample):
+	"""Update the smoothed RTT with the RTT of a packet sent only once (Karn)"""
+	global __srtt
+	__srtt = sample if __srtt == 0 else (1 - RTT_GAIN) * __srtt + RTT_GAIN * sample
+	__stats["srtt"] = __srtt
+
+
+def __pace_delay(now):
+	"""Token bucket: take the tokens of one DATA packet
+
+	Input argument: the time now
+	Return  -> 0 if the packet may be sent now, otherwise the seconds to
+	wait before asking again (no tokens are taken)
+	"""
+	global __tokens, __tokens_at
+	if not __PACE:
+		return 0
+	rate = __W * PACE_COST / __srtt if __srtt > 0 else 0
+	if __PACE_CAP > 0:
+		rate = min(rate, __PACE_CAP) if rate > 0 else __PACE_CAP
+	if rate == 0:  # no RTT sample and no cap yet
+		return 0
+	__tokens = min(__tokens + (now - __tokens_at) * rate, PACE_BURST * PACE_COST)
+	__tokens_at = now
+	if __tokens >= PACE_COST:
+		__tokens -= PACE_COST
+		return 0
+	return (PACE_COST - __tokens) / rate
+# --------------------- #
+
+
+# -- forward error correction -- #
+FEC_ID = 13  # ID 13 for FEC parity; its seq no. is the first of its group
+FEC_FORMAT = 'BBB'  # FEC header: no. of DATA packets in the group, code ID, parity index
+FEC_SIZE = 3
+FEC_MAX_K = 16  # Largest group of DATA packets protected together
+FEC_KEEP = SEQ_SIZE // 2  # Delivered DATA packets are kept for this many seq nos.
+XOR_FORMAT = '!BH'  # XOR parity: XOR of the flags and of the lengths
+XOR_SIZE = 3
+
+__FEC_K = 0  # group size set by rdt_set_fec(), 0 is off
+__FEC_CODE = 1  # code ID set by rdt_set_fec()
+__fec_active = False  # set when the first parity packet arrives
+__fec_done = collections.OrderedDict()  # seq no. -> DATA packet delivered lately
+__fec_bodies = collections.OrderedDict()  # first seq no. -> {parity index: body}
+
+
+def __xor_encode(group):
+	"""XOR parity code: encode a group of packets
+
+	Input argument: list of (flags, data) of the DATA packets
+	Return  -> list of parity bodies (a single one)
+	"""
+	flags = length = parity = 0
+	for flag, data in group:
+		flags ^= flag
+		length ^= len(data)
+		parity ^= int.from_bytes(data, 'little')  # shorter data is zero-padded
+	size = max(len(data) for _, data in group)
+	return [struct.pack(XOR_FORMAT, flags, length) + parity.to_bytes(size, 'little')]
+
+
+def __xor_decode(bodies, present, count):
+	"""XOR parity code: rebuild the one lost packet of a group
+
+	Input arguments: {parity index: body}, {position: (flags, data)} of the
+	packets received and the no. of packets in the group
+	Return  -> {position: (flags, data)} of the rebuilt packets, None if
+	the group cannot be rebuilt
+	"""
+	if 0 not in bodies or len(present) != count - 1:
+		return None
+	flags, length = struct.unpack_from(XOR_FORMAT, bodies[0])
+	parity = int.from_bytes(bodies[0][XOR_SIZE:], 'little')
+	for flag, data in present.values():
+		flags ^= flag
+		length ^= len(data)
+		parity ^= int.from_bytes(data, 'little')
+	if length > PAYLOAD + STREAM_SIZE or parity >> (8 * length):  # inconsistent group
+		return None
+	(lost,) = set(range(count)) - set(present)
+	return {lost: (flags, parity.to_bytes(length, 'little'))}
+
+
+# code ID -> (name, encode, decode); a stronger erasure code only needs the
+# same two functions, returning several parity bodies and rebuilding as many
+# packets as it can
+FEC_CODES = {
+	1: ("xor", __xor_encode, __xor_decode),
+}
+
+
+def rdt_set_fec(k, code="xor"):
+	"""Application calls this function to protect the DATA packets it
+	sends with forward error correction.
+
+	Input arguments: no. of DATA packets per parity group (0 is off) and
+	the name of the code
+	Return  -> 0 on success, -1 on error
+
+	Note: the receiver needs no setting; it rebuilds the lost DATA packets
+	of a group from its parity packets without asking for a retransmission.
+	"""
+	global __FEC_K, __FEC_CODE
+	k = int(k)
+	if not 0 <= k <= FEC_MAX_K:
+		print("rdt_set_fec: Group size must be 0 to", FEC_MAX_K)
+		return -1
+	for code_id in FEC_CODES:
+		if FEC_CODES[code_id][0] == code:
+			break
+	else:
+		print("rdt_set_fec: Unknown FEC code", code)
+		return -1
+	__FEC_K, __FEC_CODE = k, code_id
+	print("FEC group size:", __FEC_K, "\tcode:", code)
+	return 0
+
+
+def __fec_encode(group):
+	"""Return -> the parity packets of the group of (flags, data) just sent"""
+	first_seq = (next_seq_num - len(group)) % SEQ_SIZE
+	_, encode, _ = FEC_CODES[__FEC_CODE]
+	par_pkts = []
+	for index, body in enumerate(encode(group)):
+		par_pkt = __make_pkt(FEC_ID, first_seq,
+                             struct.pack(FEC_FORMAT, len(group), __FEC_CODE, index) + body)
+		par_pkts.append(par_pkt)
+		__stats["fec_parity_sent"] += 1
+		if __LOG:
+			print("rdt_fec: Sent " + __checker(par_pkt) + " for %d packets" % len(group))
+	return par_pkts
+
+
+def __fec_delivered(recv_pkt):
+	"""Remember a delivered DATA packet for rebuilding the rest of its group"""
+	if not __fec_active:
+		return
+	seq_num = recv_pkt[1]
+	__fec_done.pop(seq_num, None)
+	__fec_done[seq_num] = recv_pkt
+	if len(__fec_done) > FEC_KEEP:
+		__fec_done.popitem(last=False)
+
+
+def __fec_rebuild(recv_pkt):
+	"""Rebuild the lost DATA packets of the group protected by a parity
+	packet; the rebuilt packets are held for __take()
+
+	Return  -> list of the rebuilt packets
+	"""
+	global __fec_active
+	__fec_active = True
+	(_, first_seq, _, _), payload = unpack_msg(recv_pkt)
+	if len(payload) < FEC_SIZE:
+		return []
+	count, code_id, index = struct.unpack_from(FEC_FORMAT, payload)
+	if code_id not in FEC_CODES or not 0 < count <= FEC_MAX_K:
+		print("rdt_fec: Unknown FEC code or group")
+		return []
+	present = {}
+	lost = []
+	for i in range(count):
+		seq_num = (first_seq + i) % SEQ_SIZE
+		pkt = __fec_done.get(seq_num) or __held.get(seq_num)
+		if pkt is not None:
+            # The data as sent, with the stream extension (if any)
+			data = pkt[__data_offset(pkt):]
+			present[i] = (pkt[0] & (FLAG_COMP | FLAG_STREAM), data)
+		elif (seq_num - exp_seq_num) % SEQ_SIZE < HOLD_RANGE:
+			lost.append(i)
+		else:
+			return []  # group is too old
+	if not lost:
+		return []
+	bodies = __fec_bodies.setdefault(first_seq, {})
+	bodies[index] = payload[FEC_SIZE:]
+	if len(__fec_bodies) > FEC_KEEP:
+		__fec_bodies.popitem(last=False)
+	_, _, decode = FEC_CODES[code_id]
+	rebuilt = decode(bodies, present, count)
+	if rebuilt is None:
+		return []
+	del __fec_bodies[first_seq]
+	rebuilt_pkts = []
+	for i, (flags, data) in rebuilt.items():
+		seq_num = (first_seq + i) % SEQ_SIZE
+		rebuilt_pkts.append(create_DATA(seq_num, data, flags))
+		__hold(rebuilt_pkts[-1])
+		__stats["fec_rebuilt"] += 1
+		print("rdt_fec: Rebuilt the DATA with the seqNo. : %d" % seq_num)
+	return rebuilt_pkts
+# --------------------- #
+
+
+# -- sans-IO protocol core -- #
+# The state machine of both directions of the connection. It never touches
+# a socket or a clock: rdt_core_step() takes a datagram from the peer (or
+# just the time) and returns the datagrams to send, the DATA delivered in
+# order and when it wants to be called again. rdt_send(), rdt_recv(),
+# rdt_close() and the I/O thread are drivers that move datagrams between
+# the core and the socket.
+MAX_RETRY = 100  # Give up after this many timeouts in a row without ACK progress
+
+__LOG = True  # set by rdt_set_logging()
+__out_q = collections.deque()  # (flags, payload) queued by rdt_core_send(), not yet sent
+__unacked = collections.deque()  # sent but unACKed DATA packets, oldest first
+__base = 0  # seq no. of the oldest unACKed packet
+__deadline = None  # retransmission timer; None when stopped
+__last_progress = 0.0  # last time the window moved forward
+__retries = 0  # timeouts in a row without ACK progress
+__fec_group = []  # (flags, data) sent since the last FEC parity
+__sacked_seqs = set()  # seq nos. of unACKed packets the receiver holds (SACK)
+__resend = collections.deque()  # packets to retransmit, sent before new data
+__sent_at = {}  # seq no. -> send time of unACKed packets sent only once
+__core_error = None  # why the core gave up on the peer
+
+
+def rdt_set_logging(on):
+	"""Application calls this function to turn the per-packet trace of
+	the protocol core on or off.
+
+	Input argument: True to print a line for every packet event
+	Return  -> 0
+	"""
+	global __LOG
+	__LOG = bool(on)
+	return 0
+
+
+def rdt_core_send(byte_msg, stream=0):
+	"""Queue a message for the core: compress it (if on) and cut it into
+	payloads, which rdt_core_step() sends as the window allows
+
+	Input arguments: the message bytes-like object and its stream ID
+	Return  -> size of the message
+	"""
+	__out_q.extend(__segment(byte_msg, stream))
+	return len(byte_msg)
+
+
+def rdt_core_pending():
+	"""Return -> no. of payloads queued or sent and not yet acknowledged"""
+	return len(__out_q) + len(__unacked)
+
+
+def rdt_core_step(now, recv_pkt=None):
+	"""Advance the protocol state machine; it does no I/O
+
+	Input arguments: the time now (seconds, e.g. time.monotonic()) and a
+	datagram from the peer, or None when only the time has moved on
+	Return  -> (datagrams to send, DATA packets delivered in order, time
+	of the next timer event, None if no timer is running)
+
+	Note: Go-Back-N with a window of W packets that slides across
+	messages and streams; received DATA is ACKed and delivered (in order
+	within each stream), lost packets are retransmitted when the timer expires. After MAX_RETRY timeouts without
+	progress it stops retransmitting and sets the error of rdt_core_error().
+	"""
+	global __window_update
+	out = []
+	delivered = []
+	if recv_pkt is not None:
+		__core_input(now, recv_pkt, out, delivered)
+	if __window_update:  # the application has caught up: reopen the window
+		__window_update = False
+		out.append(create_ACK((exp_seq_num - 1) % SEQ_SIZE, __sack_blocks()))
+	if __deadline is not None and now >= __deadline:
+		__core_timeout(now)
+	pace = __core_output(now, out)
+	if __ack_due is not None and now >= __ack_due:  # no DATA went back: ACK on its own
+		out.append(create_ACK((exp_seq_num - 1) % SEQ_SIZE, __sack_blocks()))
+	deadline = __deadline
+	if pace > 0:  # wake up when the token bucket lets the next packet out
+		deadline = now + pace if deadline is None else min(deadline, now + pace)
+	if __ack_due is not None:
+		deadline = __ack_due if deadline is None else min(deadline, __ack_due)
+	return (out, delivered, deadline)
+
+
+def rdt_core_error():
+	"""Return -> why the core gave up on the peer, None while it has not"""
+	return __core_error
+
+
+def __core_output(now, out):
+	"""Retransmit, then fill the window from the queue, as fast as the
+	token bucket allows
+
+	Return  -> 0, or the seconds until the token bucket lets the next packet out
+	"""
+	global next_seq_num, __deadline, __last_progress, __fec_group
+	pace = 0
+	while __resend or (len(__unacked) < min(__W, __peer_window) and __out_q):
+		pace = __pace_delay(now)
+		if pace > 0:
+			break
+		if __resend:
+			snd_pkt = __resend.popleft()
+			out.append(snd_pkt)
+			__stats["retrans_pkts"] += 1
+			__stats["retrans_bytes"] += len(snd_pkt)
+			if __LOG:
+				print("rdt_core: TIMEOUT!! Retransmit " + __checker(snd_pkt) + " again")
+			continue
+		flags, data = __out_q.popleft()
+		ack = __piggyback()  # the owed ACK rides along
+		snd_pkt = create_DATA(next_seq_num, ack + data if ack else data, flags | FLAG_ACK if ack else flags)
+		__unacked.append(snd_pkt)
+		out.append(snd_pkt)
+		__sent_at[next_seq_num] = now
+		if __LOG:
+			print("rdt_core: Sent " + __checker(snd_pkt))
+		next_seq_num = (next_seq_num + 1) % SEQ_SIZE
+		if __deadline is None:
+			__deadline = now + TIMEOUT
+			__last_progress = now
+		if __FEC_K > 0:
+			__fec_group.append((flags, data))
+			if len(__fec_group) == __FEC_K:
+				out.extend(__fec_encode(__fec_group))
+				__fec_group = []
+    # Nothing more to send for now: protect the partial group
+	if __fec_group and not __out_q:
+		out.extend(__fec_encode(__fec_group))
+		__fec_group = []
+    # Zero window: the timer probes it (see __core_timeout())
+	if __out_q and not __unacked and __peer_window == 0 and __deadline is None:
+		__deadline = now + TIMEOUT
+	return pace
+
+
+def __core_input(now, recv_pkt, out, delivered):
+	"""Handle a datagram from the peer"""
+	global __peer_window, __retries
+    # If corrupted, Ignore
+	if check_if_corrupt(recv_pkt):
+		if __LOG:
+			print("rdt_core: " + __checker(recv_pkt))
+    # ACK: cumulative, slide the window
+	elif is_type(recv_pkt, ACK_ID):
+		__note_reply(recv_pkt)
+		__peer_window = __ack_parts(recv_pkt)[0] if recv_pkt[0] & FLAG_WINDOW else RECV_WINDOW
+		if __SACK:  # Scoreboard: note the packets the receiver holds
+			for seq_num in __sacked(recv_pkt):
+				if (seq_num - __base) % SEQ_SIZE < len(__unacked):
+					__sacked_seqs.add(seq_num)
+		if __core_acked(now, recv_pkt[1]):
+			pass
+		elif __peer_window == 0:  # the receiver is there but full: keep probing
+			__retries = 0
+		elif __LOG:
+			print("rdt_core: received out-of-range ACK")
+    # FEC parity: rebuild a lost DATA packet, deliver what it completes
+	elif is_type(recv_pkt, FEC_ID):
+		for rebuilt_pkt in __fec_rebuild(recv_pkt):
+			__stream_ahead(rebuilt_pkt, delivered)
+		__core_deliver(now, __take(), out, delivered)
+    # DATA: deliver if expected, ACK the last in-order one; a held
+    # packet goes to its stream at once if it is next there
+	elif is_type(recv_pkt, DATA_ID):
+		if recv_pkt[0] & FLAG_ACK:  # the ACK it carries; a stale one changes nothing
+			ack_num, window = __piggybacked(recv_pkt)
+			if __core_acked(now, ack_num) or (ack_num + 1) % SEQ_SIZE == __base:
+				__peer_window = window
+		if recv_pkt[1] == exp_seq_num and __rwnd <= 0:  # no room: ACK, the sender probes again
+			out.append(create_ACK((exp_seq_num - 1) % SEQ_SIZE, __sack_blocks()))
+			if __LOG:
+				print("rdt_core: No room for (%d), sent ACK[%d]" % (recv_pkt[1], (exp_seq_num - 1) % SEQ_SIZE))
+		elif recv_pkt[1] == exp_seq_num:
+			__core_deliver(now, recv_pkt, out, delivered)
+		else:
+			__hold(recv_pkt)
+			__stream_ahead(recv_pkt, delivered)
+			out.append(create_ACK((exp_seq_num - 1) % SEQ_SIZE, __sack_blocks()))
+			if __LOG:
+				print("rdt_core: NOT expected (%d), sent ACK[%d]" % (recv_pkt[1], (exp_seq_num - 1) % SEQ_SIZE))
+
+
+def __core_acked(now, ack_num):
+	"""Take a cumulative ACK (of an ACK packet or piggybacked on DATA):
+	slide the window
+
+	Return  -> True if it acknowledged packets in the window
+	"""
+	global __base, __deadline, __last_progress, __retries
+	count = (ack_num - __base + 1) % SEQ_SIZE
+	if not 0 < count <= len(__unacked):
+		return False
+	if __LOG:
+		print("rdt_core: Received the ACK with the seqNo. : %d" % ack_num)
+	if ack_num in __sent_at:
+		__rtt_sample(now - __sent_at[ack_num])
+	for i in range(count):
+		seq_num = __unacked.popleft()[1]
+		__sacked_seqs.discard(seq_num)
+		__sent_at.pop(seq_num, None)
+	__base = (ack_num + 1) % SEQ_SIZE
+    # Drop the ACKed packets from the retransmissions
+	while __resend and (__resend[0][1] - __base) % SEQ_SIZE >= len(__unacked):
+		__resend.popleft()
+	__deadline = now + TIMEOUT if __unacked else None
+	__last_progress = now
+	__retries = 0
+	return True
+
+
+def __core_deliver(now, recv_pkt, out, delivered):
+	"""Deliver the expected DATA packet, then the held packets that
+	follow it, and owe their ACK"""
+	global exp_seq_num
+	count = 0
+	while recv_pkt is not None:
+		if recv_pkt[1] in __early:  # delivered to its stream ahead of the gap
+			__early.discard(recv_pkt[1])
+		else:
+			__stream_deliver(recv_pkt, delivered)
+		__delivered(recv_pkt)
+		if __LOG:
+			print("rdt_core: Expected, ACK seqNo. %d" % exp_seq_num)
+		exp_seq_num = (exp_seq_num + 1) % SEQ_SIZE
+		count += 1
+		recv_pkt = __take()
+	if count:
+		__ack_delivered(now, count, out)
+
+
+def __core_timeout(now):
+	"""Retransmission timer expired: queue the window for retransmission"""
+	global __deadline, __retries, __core_error, __peer_window
+	if not __unacked:  # Zero window: probe it with one packet
+		__peer_window = 1
+		__deadline = None
+		return
+	__retries += 1
+	if __retries > MAX_RETRY:
+        # Peer has gone: stop retransmitting and report the unACKed data
+		print("rdt_core: No ACK progress, give up with %d packets unacknowledged" % len(__unacked))
+		__core_error = "peer is not responding"
+		__deadline = None
+		return
+	__resend.clear()
+	for i, snd_pkt in enumerate(__unacked):
+        # Skip what the receiver holds, but always resend the oldest
+        # packet: its cumulative ACK may be the one that was lost
+		if i > 0 and snd_pkt[1] in __sacked_seqs:
+			continue
+		__resend.append(snd_pkt)
+		__sent_at.pop(snd_pkt[1], None)  # no RTT sample from it (Karn)
+	__deadline = now + TIMEOUT
+# --------------------- #
+
+
+# -- full-duplex mode: background I/O thread -- #
+__io_thread = None  # set by rdt_start_io()
+__io_send_q = None  # (flags, payload) waiting for the I/O thread to send them
+__io_recv_q = None  # DATA packets delivered by the I/O thread
+__io_wake = ()  # socket pair used to wake up the I/O thread
+__io_closing = None  # set by rdt_close() to drain and stop the I/O thread
+__io_cond = threading.Condition()  # guards __io_pending
+__io_pending = 0  # no. of queued payloads not yet acknowledged
+__io_error = None  # socket error that stopped the I/O thread
+
+
+def rdt_start_io(sockd):
+	"""Application calls this function to hand the RDT socket over to
+	a background I/O thread (full-duplex mode).
+
+	Input argument: RDT socket object
+	Return  -> 0 on success, -1 on error
+
+	Note: (1) Afterwards rdt_send() only queues the message and returns,
+	rdt_recv() takes the next payload delivered by the I/O thread, and the
+	I/O thread keeps ACKing and retransmitting while the application is busy.
+	(2) Call rdt_flush() to wait until all queued data is acknowledged.
+	"""
+	global __io_thread, __io_send_q, __io_recv_q, __io_wake, __io_closing
+	global __io_pending, __io_error
+	if __io_thread is not None:
+		print("rdt_start_io: I/O thread is already running")
+		return -1
+	try:
+		__io_wake = socket.socketpair()
+		__io_wake[1].setblocking(False)
+	except socket.error as err_msg:
+		print("rdt_start_io: Socket pair error: ", err_msg)
+		return -1
+	__io_send_q = queue.Queue(__MEM_CAP // PAYLOAD)
+	__io_recv_q = queue.Queue(__MEM_CAP // PAYLOAD + 1)  # the window keeps a slot for the end mark
+	__io_closing = threading.Event()
+	__io_pending = 0
+	__io_error = None
+
+    # Hand over the DATA delivered to the blocking calls
+	while data_buffer:
+		__io_recv_q.put(data_buffer.popleft())
+
+	__io_thread = threading.Thread(target=__io_loop, args=(sockd,), daemon=True)
+	__io_thread.start()
+	print("rdt_start_io: Started the I/O thread")
+	return 0
+
+
+def rdt_flush(sockd):
+	"""Application calls this function to wait until all the messages
+	passed to rdt_send() have been acknowledged by the remote peer.
+
+	Input argument: RDT socket object
+	Return  -> 0 on success, -1 on error
+
+	Note: returns at once when the I/O thread is not running, as rdt_send()
+	only returns after delivery in that case.
+	"""
+	if __io_thread is None:
+		return 0
+	with __io_cond:
+		while __io_pending > 0 and __io_thread.is_alive():
+			__io_wait_acked()
+		if __io_pending > 0:
+			print("rdt_flush: I/O thread stopped with %d payloads unacknowledged" % __io_pending)
+			return -1
+	return 0
+
+
+def __io_wait_acked():
+	"""Wait (holding __io_cond) until the I/O thread counts off ACKs, at most TIMEOUT"""
+	__io_cond.wait(TIMEOUT)
+
+
+def __io_stop():
+	"""Let the I/O thread drain the send queue and wait TWAIT before stopping"""
+	__io_closing.set()
+	__io_wakeup()
+	__io_thread.join()
+
+
+def __io_wakeup():
+	"""Wake the I/O thread up from select()"""
+	try:
+		__io_wake[1].send(b'x')
+	except (BlockingIOError, socket.error):
+		pass  # a wake-up is already pending
+
+
+def __io_send(byte_msg, stream):
+	"""rdt_send() of the full-duplex mode: queue the message payload by payload
+
+	Return  -> size of data queued, -1 on error
+	"""
+	global __io_pending
+	if __io_error is not None or not __io_thread.is_alive():
+		print("rdt_send: I/O thread is not running")
+		return -1
+	for piece in __pieces(byte_msg):
+		for payload in __segment(piece, stream):
+			with __io_cond:
+				while True:  # Block while the send queue is full
+					try:
+						__io_send_q.put_nowait(payload)
+						__io_pending += 1  # counted before the I/O thread can ACK it
+						break
+					except queue.Full:
+						if not __io_thread.is_alive():
+							print("rdt_send: I/O thread has stopped")
+							return -1
+						__io_wait_acked()
+			__io_wakeup()
+	return len(byte_msg)
+
+
+def __io_recv():
+	"""Full-duplex mode: take the next DATA packet delivered by the I/O thread
+
+	Return  -> the DATA packet, b'' on error
+	"""
+	recv_pkt = __io_recv_q.get()
+	if recv_pkt is None:  # I/O thread has stopped
+		__io_recv_q.put(None)
+		return b''
+	if __advertised == 0:  # let the I/O thread reopen the window
+		__io_wakeup()
+	return recv_pkt
+
+
+def __io_acked(count):
+	"""Count off the acknowledged payloads and wake up rdt_flush()"""
+	global __io_pending
+	with __io_cond:
+		__io_pending -= count
+		__io_cond.notify_all()
+
+
+def __io_loop(sockd):
+	"""Body of the I/O thread, a driver of the protocol core; it owns the
+	socket and feeds the core the datagrams, the timer events and the
+	payloads queued by rdt_send(), and delivers to __io_recv_q.
+	"""
+	global __io_error
+	last_activity = time.monotonic()
+	wake_r = __io_wake[0]
+	recv_pkt = None
+	try:
+		while True:
+            # Hand the core the payloads its window has room for
+			while len(__out_q) < __W and not __io_send_q.empty():
+				__out_q.append(__io_send_q.get_nowait())
+			rdt_core_set_window(__recv_room(__io_recv_q.qsize()))
+			pending = rdt_core_pending()
+			now = time.monotonic()
+			out, delivered, deadline = rdt_core_step(now, recv_pkt)
+			for snd_pkt in out:
+				__udt_send(sockd, __peeraddr, snd_pkt)
+			for pkt in delivered:
+				__io_recv_q.put(pkt)
+			if rdt_core_pending() < pending:
+				__io_acked(pending - rdt_core_pending())
+			if __core_error is not None:
+				__io_error = __core_error
+				break
+
+			if rdt_core_pending() > 0:
+                # Peer has gone while closing: report the unACKed data
+				if __io_closing.is_set() and now - __last_progress > TWAIT:
+					print("rdt_io: No ACK progress, give up with %d packets unacknowledged" % rdt_core_pending())
+					__io_error = "peer is not responding"
+					break
+				wait = None if deadline is None else max(deadline - now, 0)
+			elif __io_closing.is_set() and __io_send_q.empty():
+				wait = last_activity + TWAIT - now
+				if wait <= 0:
+					print("rdt_io: Nothing happened for %.3f second" % TWAIT)
+					break
+				if deadline is not None:  # a delayed ACK
+					wait = min(wait, max(deadline - now, 0))
+			else:
+				# idle until data arrives, rdt_send() wakes us up or a delayed ACK is due
+				wait = None if deadline is None else max(deadline - now, 0)
+
+			recv_pkt = None
+			r = __wait_readable([sockd, wake_r], wait)
+			if wake_r in r:
+				wake_r.recv(4096)
+			if sockd in r:
+				recv_pkt = __udt_recv(sockd, PAYLOAD + MAX_HEADER_SIZE)
+				last_activity = time.monotonic()
+	except socket.error as err_msg:
+		print("rdt_io: Socket error: ", err_msg)
+		__io_error = err_msg
+	__io_recv_q.put(None)  # unblock rdt_recv()
+	with __io_cond:
+		__io_cond.notify_all()
+# --------------------- #
+
+
+# -- profiling -- #
+# Phase of each module function timed while profiling is on; the time
+# between timed calls goes to "other". Only the "wait" functions leave the
+# CPU idle (the socket is readable before __udt_recv() is called), so the
+# thread CPU time, a system call to read, is taken around them alone.
+PROF_PHASES = {
+	"protocol": ("rdt_core_step",),
+	"encode": ("__make_pkt", "__compress", "__unframe", "__fec_encode", "__fec_rebuild"),
+	"checksum": ("__IntChksum", "__crc"),
+	"send": ("__udt_send",),
+	"recv": ("__udt_recv",),
+	"verify": ("check_if_corrupt", "is_type", "type_between", "__sacked"),
+	"buffer": ("__hold", "__take", "__delivered", "__sack_blocks", "__core_deliver", "__note_reply",
+		"__stream_ahead", "__ack_delivered", "__piggyback"),
+	"log": ("print", "__checker"),
+	"wait": ("__wait_readable", "__io_recv", "__io_wait_acked", "__io_stop"),
+}
+
+__prof_orig = {}  # function name -> original function while profiling is on
+__prof_counters = []  # per thread: phase -> [calls, wall ns, CPU ns of "wait"]
+__prof_gen = 0  # bumped when profiling is (re)started
+__prof_local = threading.local()  # profile state of this thread
+__prof_start = (0, 0)  # wall and CPU ns when profiling was turned on
+
+
+def rdt_set_profiling(on):
+	"""Application calls this function to turn the per-phase profiling of
+	this connection on or off; setting RDT_PROFILE in the environment
+	turns it on in rdt_socket().
+
+	Input argument: True to (re)start profiling, False to stop it
+	Return  -> 0 on success
+
+	Note: the profile is printed by rdt_close(); rdt_profile() returns it.
+	Turning profiling on replaces the functions in PROF_PHASES by timed
+	wrappers, so it costs nothing while off.
+	"""
+	global __prof_counters, __prof_gen, __prof_start
+	if on:
+		__prof_counters = []
+		__prof_gen += 1
+		__prof_start = (time.perf_counter_ns(), time.process_time_ns())
+		if not __prof_orig:
+			for phase, names in PROF_PHASES.items():
+				for name in names:
+					__prof_orig[name] = globals().get(name)
+					globals()[name] = __prof_wrap(phase, globals().get(name, print))
+		print("Profiling on")
+	else:
+		for name, fn in __prof_orig.items():
+			if fn is None:
+				del globals()[name]  # "print" is the builtin again
+			else:
+				globals()[name] = fn
+		__prof_orig.clear()
+	return 0
+
+
+def __prof_thread():
+	"""Start the state of this thread for the current profile
+
+	Return  -> [profile generation, phase being timed, wall ns when it
+	began or resumed, phase -> [calls, wall ns, CPU ns]]
+	"""
+	counters = {p: [0, 0, 0] for p in list(PROF_PHASES) + ["other"]}
+	__prof_counters.append(counters)
+	__prof_local.state = [__prof_gen, "other", time.perf_counter_ns(), counters]
+	return __prof_local.state
+
+
+def __prof_wrap(phase, fn):
+	"""Return fn wrapped to charge its time, less that of the timed calls
+	it makes, to phase"""
+	waits = phase == "wait"
+	clock = time.perf_counter_ns
+	def timed(*args, **kwargs):
+		state = getattr(__prof_local, "state", None)
+		if state is None or state[0] != __prof_gen:
+			state = __prof_thread()
+		counters = state[3]
+		outer = state[1]
+		wall = clock()
+		counters[outer][1] += wall - state[2]
+		counter = counters[phase]
+		counter[0] += 1
+		state[1] = phase
+		state[2] = wall
+		if waits:
+			cpu = time.thread_time_ns()
+		try:
+			return fn(*args, **kwargs)
+		finally:
+			if waits:
+				counter[2] += time.thread_time_ns() - cpu
+			wall = clock()
+			counter[1] += wall - state[2]
+			state[1] = outer
+			state[2] = wall
+	return timed
+
+
+def rdt_profile():
+	"""Application calls this function to get the per-phase profile
+
+	Return  -> dictionary of phase -> (calls, wall s, CPU s) summed over the
+	threads, plus "total" -> (0, wall s, process CPU s) since profiling was
+	turned on; None if profiling is off
+
+	Note: the CPU time is measured for "wait" only; the other phases keep
+	the CPU busy, so their CPU time is their wall time.
+	"""
+	if not __prof_orig:
+		return None
+	profile = {}
+	for phase in list(PROF_PHASES) + ["other"]:
+		wall = sum(c[phase][1] for c in __prof_counters) / 1e9
+		profile[phase] = (sum(c[phase][0] for c in __prof_counters), wall,
+			sum(c[phase][2] for c in __prof_counters) / 1e9 if phase == "wait" else wall)
+	profile["total"] = (0, (time.perf_counter_ns() - __prof_start[0]) / 1e9,
+		(time.process_time_ns() - __prof_start[1]) / 1e9)
+	return profile
+
+
+def __prof_report():
+	"""Print the per-phase profile of the transfer"""
+	profile = rdt_profile()
+	if profile is None:
+		return
+	_, total_wall, total_cpu = profile.pop("total")
+	print("Profile: %.3f s wall, %.3f s CPU; %d thread(s), phases summed over them" % (
+		total_wall, total_cpu, len(__prof_counters)))
+	print("  %-9s %9s %10s %7s %10s" % ("phase", "calls", "wall (s)", "wall %", "CPU (s)"))
+	for phase, (calls, wall, cpu) in profile.items():
+		print("  %-9s %9s %10.3f %6.1f%% %10.3f" % (phase, calls if phase != "other" else "",
+			wall, 100 * wall / max(total_wall, 1e-9), cpu))
+# --------------------- #
+
+def rdt_send(sockd, byte_msg, stream=0):
+	"""Application calls this function to transmit a message (up to
+	W * PAYLOAD bytes) to the remote peer through the RDT socket.
+
+	Input arguments: RDT socket object, the message bytes object (or any
+	bytes-like object, e.g. a memoryview of a memory-mapped file) and the
+	stream ID (0 to STREAM_MAX) of the message
+	Return  -> size of data sent on success, -1 on error
+
+	Note: (1) This function will return only when it knows that the
+	whole message has been successfully delivered to remote process.
+	(2) Catch any known error and report to the user.
+	(3) In full-duplex mode the message is queued by reference, so the
+	caller must not modify a mutable buffer after passing it in.
+	(4) The streams are independent ordered byte streams; the receiver
+	gets the data of each in order, and a loss in one does not hold up
+	the others (see rdt_recv_stream()).
+	(5) A message larger than the memory cap goes to the protocol core a
+	piece at a time (see rdt_set_memory()).
+	"""
+	######## Your implementation #######
+	if not 0 <= stream <= STREAM_MAX:
+		print("rdt_send: Stream ID must be 0 to", STREAM_MAX)
+		return -1
+	if __io_thread is not None:  # Full-duplex mode
+		return __io_send(byte_msg, stream)
+
+    # Hand the core the message piece by piece, each once the ACKs have
+    # made room for it under the cap, then wait until all is ACKed
+	for piece in __pieces(byte_msg):
+		if __drive(sockd, lambda: rdt_core_pending() * PAYLOAD + len(piece) <= __MEM_CAP) != 0:
+			return -1
+		rdt_core_send(piece, stream)
+		if __LOG:
+			print("rdt_send: Send %d packets" % len(__out_q))
+	if __drive(sockd, lambda: rdt_core_pending() == 0) != 0:
+		return -1
+	return len(byte_msg)
+
+
+def rdt_recv(sockd, length):
+	"""Application calls this function to wait for a message from the
+	remote peer; the caller will be blocked waiting for the arrival of
+	the message. Upon receiving a message from the underlying UDT layer,
+    the function returns immediately.
+
+	Input arguments: RDT socket object and the size of the message to
+	received.
+	Return  -> the received bytes message object on success, b'' on error
+
+	Note: (1) Catch any known error and report to the user.
+	(2) The data may come from any stream; rdt_recv_stream() also
+	tells which.
+	"""
+	######## Your implementation #######
+	return rdt_recv_stream(sockd, length)[1]
+
+
+def rdt_recv_stream(sockd, length):
+	"""Application calls this function to wait for a message on any
+	stream of the connection (see rdt_send()).
+
+	Input arguments: RDT socket object and the size of the message to
+	received.
+	Return  -> (stream ID, the received bytes message object) on success,
+	(0, b'') on error
+
+	Note: the data of each stream comes in order, but the streams are
+	interleaved in the order their data arrived.
+	"""
+	global __recv_rest, __recv_stream
+    # Take DATA packets until there is data for the application
+    # (a compressed message needs all its packets)
+	while len(__recv_rest) == 0:
+		if __io_thread is not None:  # Full-duplex mode
+			recv_pkt = __io_recv()
+		else:
+            # DATA delivered while rdt_send() waited for ACKs comes first
+			if not data_buffer:
+				result = __drive(sockd, lambda: len(data_buffer) > 0, sockd.gettimeout())
+				if result == 1:
+					print("rdt_recv: Socket receive error: timed out")
+				if result != 0:
+					return (0, b'')
+			recv_pkt = data_buffer.popleft()
+		if recv_pkt == b'':
+			return (0, b'')
+		__recv_rest = __unframe(recv_pkt)
+		__recv_stream = __stream_of(recv_pkt)[0]
+		if __recv_rest is None:
+			__recv_rest = b''
+			return (0, b'')
+	msg, __recv_rest = __recv_rest[:length], __recv_rest[length:]
+	return (__recv_stream, msg)
+
+
+def __drive(sockd, done, idle=None):
+	"""Blocking driver of the protocol core: pass it the datagrams of the
+	socket and the timer events, and send what it returns, until done()
+
+	Input arguments: RDT socket object, the condition to wait for, and the
+	max seconds to wait for a datagram when no timer runs (None: no limit)
+	Return  -> 0 when done() is true, 1 when the peer has been silent for
+	idle seconds, -1 on error
+	"""
+	recv_pkt = None
+	silent_since = time.monotonic()
+	while True:
+		now = time.monotonic()
+		rdt_core_set_window(__recv_room(len(data_buffer)))
+		out, delivered, deadline = rdt_core_step(now, recv_pkt)
+		data_buffer.extend(delivered)
+		try:
+			for snd_pkt in out:
+				__udt_send(sockd, __peeraddr, snd_pkt)
+		except socket.error as err_msg:
+			print("Socket send error: ", err_msg)
+			return -1
+		if __core_error is not None:
+			return -1
+		if done():
+			return 0
+
+        # Wait for a datagram, the timer, or the end of the silence
+		wait = None if deadline is None else max(deadline - now, 0)
+		if idle is not None:
+			wait = min(wait, silent_since + idle - now) if wait is not None else silent_since + idle - now
+			if wait <= 0:
+				return 1
+		recv_pkt = None
+		try:
+			if __wait_readable([sockd], wait):
+				recv_pkt = __udt_recv(sockd, PAYLOAD + MAX_HEADER_SIZE)
+				silent_since = time.monotonic()
+		except socket.error as err_msg:
+			print("Socket receive error: ", err_msg)
+			return -1
+
+
+def rdt_close(sockd):
+	"""Application calls this function to close the RDT socket.
+
+	Input argument: RDT socket object
+
+	Note: (1) Catch any known error and report to the user.
+	(2) Before closing the RDT socket, the reliable layer needs to wait for TWAIT
+	time units before closing the socket.
+	(3) Prints the per-phase profile when profiling is on.
+	"""
+	######## Your implementation #######
+	global __io_thread
+	if __io_thread is not None:  # Full-duplex mode
+		__io_stop()
+		__io_thread = None
+		if __io_pending > 0:
+			print("rdt_close: %d payloads were not acknowledged" % __io_pending)
+		for s in __io_wake:
+			s.close()
+	else:
+        # Keep ACKing the retransmissions of the peer until it has been
+        # silent for TWAIT
+		if __drive(sockd, lambda: False, TWAIT) == 1:
+			print("rdt_close: Nothing happened for %.3f second" % TWAIT)
+	try:
+		sockd.close()
+		print("rdt_close: Release the socket")
+	except socket.error as err_msg:
+		print("Socket close error: ", err_msg)
+	__prof_report()
@@ -1,102 +1,709 @@
-#!/usr/bin/python3
-"""File transfer client program
-
-This is for testing of the RDT4.0 layer.
-
-"""
-
-import sys
-import os
-import time
-import rdt4 as rdt
-
-def main():
-
-	#Check the number of input arguments
-	if len(sys.argv) != 6:
-		print("Usage:  "+sys.argv[0]+"  <server IP>  <filename>  <drop rate>  <error rate>  <Window size>")
-		sys.exit(0)
-	#Get the filename
-	filename = sys.argv[2]
-	MSG_LEN = rdt.PAYLOAD * int(sys.argv[5])	#define the max message length
-
-	#open file
-	try:
-		fobj = open(filename, 'rb')
-	except OSError as emsg:
-		print("Open file error: ", emsg)
-		sys.exit(0)
-	print("Open file successfully")
-
-	#get the file size
-	filelength = os.path.getsize(filename)
-	print("File bytes are ",filelength)
-
-	#set up the RDT simulation
-	rdt.rdt_network_init(sys.argv[3], sys.argv[4], sys.argv[5])
-
-	#create RDT socket
-	sockfd = rdt.rdt_socket()
-	if sockfd == None:
-		sys.exit(0)
-
-    #specify my own IP address & port number
-    #if I do not specify, others can not send things to me.
-	if rdt.rdt_bind(sockfd, rdt.CPORT) == -1:
-		sys.exit(0)
-
-	#specify the IP address & port number of remote peer
-	if rdt.rdt_peer(sys.argv[1], rdt.SPORT) == -1:
-		sys.exit(0)
-
-	#implement a simple handshaking protocol at the application layer
-	#first send the size of the file to server
-	osize = rdt.rdt_send(sockfd, str(filelength).encode("ascii"))
-	if osize < 0:
-		print("Cannot send message1")
-		sys.exit(0)
-	#then send the filename to server
-	osize = rdt.rdt_send(sockfd, filename.encode("ascii"))
-	if osize < 0:
-		print("Cannot send message2")
-		sys.exit(0)
-	#now wait for server response
-	rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
-	if rmsg == b'':
-		sys.exit(0)
-	elif rmsg == b'ERROR':
-		print("Server experienced file creation error.\nProgram terminated.")
-		sys.exit(0)
-	else:
-		print("Received server positive response")
-
-	#start the data transfer
-	print("Start the file transfer . . .")
-	starttime = time.monotonic()	#record start time
-	sent = 0
-	while sent < filelength:
-		smsg = fobj.read(MSG_LEN)
-		if smsg == b'':
-			print("EOF is reached!!")
-			sys.exit(0)
-		osize = rdt.rdt_send(sockfd, smsg)
-		if osize > 0:
-			sent += osize
-		else:
-			print("Experienced sending error! Has sent",sent,"bytes of message so far.")
-			sys.exit(0)
-
-	endtime = time.monotonic()	#record end time
-	print("Completed the file transfer.")
-	lapsed = endtime - starttime
-	print("Total elapse time: %.3f s\tThroughtput: %.2f KB/s" % (lapsed, filelength/lapsed/1000.0))
-
-	#Closing
-	fobj.close()
-	rdt.rdt_close(sockfd)
-	print("Client program terminated")
-
-
-if __name__ == "__main__":
-	main()
-
+#!/usr/bin/python3
+"""File transfer client program
+
+This is for testing of the RDT4.0 layer.
+
+"""
+
+import sys
+import os
+import time
+import zlib
+import mmap
+import struct
+import hashlib
+import multiprocessing
+import cProfile
+import pstats
+import rdt4 as rdt
+
+#optional arguments: name -> description
+OPTIONS = {
+	"threaded": "run the RDT layer in a background I/O thread",
+	"stripes": "=K  split the file into K ranges sent by K worker processes",
+	"mmap": "memory-map the file and send memoryview slices of it (no copy)",
+	"madvise": "with --mmap: sequential read-ahead and drop pages already sent",
+	"resume": "continue a broken transfer from the server checkpoint",
+	"delta": "send only the differences to the copy of the file the server already holds",
+	"crc32": "protect the packets with CRC32 instead of the Internet checksum",
+	"compress": "[=LEVEL]  compress the messages with zlib (1 fastest .. 9 best, default 6)",
+	"fec": "=K  send an XOR parity packet after every K DATA packets",
+	"sack": "retransmit only the packets the server has not acknowledged selectively",
+	"burst": "=B  lose packets in bursts of B packets on average",
+	"pace": "[=KB/s]  spread each window over the RTT (token bucket), optionally capped",
+	"link": "=KB/s:N  send through a bottleneck link with a queue of N packets",
+	"port": "=P  use port P instead of CPORT (0 for any free port)",
+	"buffer": "=KB  cap the data the RDT connection buffers in each direction (default 255)",
+	"profile": "time the protocol phases (encode, checksum, send, recv, wait, ...) and print a breakdown",
+	"cprofile": "[=FILE]  run under cProfile and write the profile sorted by time to FILE",
+}
+
+DROP_STEP = 1 << 20		#with --madvise, drop the sent pages every DROP_STEP bytes
+SIG_FORMAT = "!I16s"		#delta signature of a block: Adler-32 and a 16-byte BLAKE2b hash
+SIG_SIZE = struct.calcsize(SIG_FORMAT)
+ADLER_MOD = 65521		#modulus of the Adler-32 sums
+DELTA_RUN = 1024		#a delta copy instruction names at most DELTA_RUN blocks
+
+def map_file(fobj, filelength, options):
+	"""Memory-map the file for the zero-copy send path (--mmap)
+
+	Input arguments: file object, file size and the options
+	Return  -> (mmap object, memoryview of the mapping), or (None, None)
+	when the file is to be read with read()
+	"""
+	if not options.get("mmap") or filelength == 0:
+		return (None, None)
+	try:
+		mm = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ)
+	except (OSError, ValueError) as emsg:
+		print("mmap error: ", emsg, " - fall back to read()")
+		return (None, None)
+	if options.get("madvise") and hasattr(mm, "madvise"):
+		mm.madvise(mmap.MADV_SEQUENTIAL)
+	return (mm, memoryview(mm))
+
+def next_chunk(fobj, view, pos, size):
+	"""Return the next chunk of the file starting at byte pos
+
+	With a mapping this is a memoryview slice of the file pages (no copy),
+	otherwise the bytes read from fobj.
+	"""
+	if view is not None:
+		return view[pos:pos+size]
+	return fobj.read(size)
+
+def drop_pages(mm, dropped, upto, options):
+	"""Let the kernel drop the mapped pages before byte upto (--madvise)
+	so that the resident memory stays flat
+
+	Return  -> offset up to which the pages have been dropped
+	"""
+	if mm is None or not options.get("madvise") or not hasattr(mmap, "MADV_DONTNEED"):
+		return dropped
+	upto -= upto % mmap.PAGESIZE
+	if upto - dropped >= DROP_STEP:
+		mm.madvise(mmap.MADV_DONTNEED, dropped, upto - dropped)
+		return upto
+	return dropped
+
+def unmap_file(mm, view):
+	"""Release the mapping made by map_file()"""
+	if mm is not None:
+		view.release()
+		mm.close()
+
+def verify_prefix(fobj, offset, block, hashes, digest):
+	"""Compare the block hashes of the prefix the server holds with the file
+
+	Input arguments: file object, no. of bytes held by the server, block
+	size, the concatenated SHA-1 digests of the server's blocks and the
+	whole-file digest, which is updated with the matching prefix
+	Return  -> no. of leading bytes that match and need not be sent again
+	"""
+	fobj.seek(0)
+	matched = 0
+	for i in range(len(hashes) // 20):
+		data = fobj.read(min(block, offset - matched))
+		if hashlib.sha1(data).digest() != hashes[i*20:(i+1)*20]:
+			break
+		digest.update(data)
+		matched += len(data)
+	return matched
+
+def strong_hash(data):
+	"""Return the strong hash of a delta block, which confirms an Adler-32 match"""
+	return hashlib.blake2b(data, digest_size=16).digest()
+
+def send_delta(sockfd, fobj, filelength, block, sigs, MSG_LEN, digest):
+	"""Send the file as the differences to the copy the server holds (--delta)
+
+	The server's blocks are looked up by their Adler-32 checksum, which is
+	rolled over the file one byte at a time; a hit confirmed by the strong
+	hash is sent as a reference to the block, the bytes in between as
+	literal data. The delta is a byte stream of instructions:
+	  b'C' + (first block, no. of blocks)   copy blocks of the server's copy
+	  b'L' + (length) + data                literal data
+	Input arguments: RDT socket, file object, file size, block size, the
+	concatenated block signatures of the server's copy, the max message
+	length and the whole-file digest, which is updated with the file
+	Return  -> (no. of bytes matched, no. of literal bytes), None on error
+	"""
+	table = {}		#Adler-32 -> {strong hash -> block no.}
+	for i in range(len(sigs) // SIG_SIZE):
+		weak, strong = struct.unpack_from(SIG_FORMAT, sigs, i * SIG_SIZE)
+		table.setdefault(weak, {}).setdefault(strong, i)
+	try:
+		data = mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ) if filelength else b''
+	except (OSError, ValueError):
+		fobj.seek(0)
+		data = fobj.read()
+	digest.update(data)
+	try:
+		return scan_delta(sockfd, data, filelength, block, table, MSG_LEN)
+	finally:
+		if isinstance(data, mmap.mmap):
+			data.close()
+
+def scan_delta(sockfd, data, filelength, block, table, MSG_LEN):
+	"""The rolling scan of send_delta() over the file contents data
+
+	Return  -> (no. of bytes matched, no. of literal bytes), None on error
+	"""
+	out = bytearray()	#instructions not yet sent
+	def drain(final=False):
+		while len(out) >= MSG_LEN or (final and out):
+			if rdt.rdt_send(sockfd, bytes(out[:MSG_LEN])) < 0:
+				return False
+			del out[:MSG_LEN]
+		return True
+	def literal(end):
+		out.extend(b'L' + struct.pack("!I", end - lit))
+		out.extend(data[lit:end])
+		return drain()
+
+	run = [0, 0]		#pending copy instruction: first block, no. of blocks
+	matched = 0
+	lit = pos = 0		#start of the pending literal data, scan position
+	weak = None
+	while pos + block <= filelength:
+		if weak is None:
+			weak = zlib.adler32(data[pos:pos+block])
+		hit = table.get(weak)
+		index = hit.get(strong_hash(data[pos:pos+block])) if hit else None
+		if index is not None:
+			if pos > lit or run[0] + run[1] != index or run[1] == DELTA_RUN:
+				if run[1]:
+					out.extend(b'C' + struct.pack("!II", *run))
+				if pos > lit and not literal(pos):
+					return None
+				run = [index, 0]
+			run[1] += 1
+			matched += block
+			pos = lit = pos + block
+			weak = None
+			continue
+		#roll the checksum one byte on
+		if pos + block < filelength:
+			a, b = weak & 0xffff, weak >> 16
+			old, new = data[pos], data[pos+block]
+			a = (a - old + new) % ADLER_MOD
+			b = (b - block * old + a - 1) % ADLER_MOD
+			weak = (b << 16) | a
+		pos += 1
+		#keep the literal data within one message
+		if pos - lit >= MSG_LEN:
+			if run[1]:
+				out.extend(b'C' + struct.pack("!II", *run))
+				run = [0, 0]
+			if not literal(pos):
+				return None
+			lit = pos
+	if run[1]:
+		out.extend(b'C' + struct.pack("!II", *run))
+	if (filelength > lit and not literal(filelength)) or not drain(final=True):
+		return None
+	return (matched, filelength - matched)
+
+def pace_cap(options):
+	"""Return the pacing rate cap in bytes/s given by --pace (0 for none), -1 if invalid"""
+	try:
+		cap = float(options["pace"]) * 1000 if options.get("pace", True) is not True else 0
+	except ValueError:
+		return -1
+	return cap if cap >= 0 else -1
+
+def link_option(options):
+	"""Return the (rate in bytes/s, queue length) given by --link, (0, 0)
+	if not given, None if invalid"""
+	if "link" not in options:
+		return (0, 0)
+	try:
+		rate, queue = str(options["link"]).split(":")
+		rate, queue = float(rate) * 1000, int(queue)
+	except ValueError:
+		return None
+	return (rate, queue) if rate > 0 and queue > 0 else None
+
+def buffer_option(options):
+	"""Return the memory cap of the RDT connection (--buffer) in bytes, None if invalid"""
+	try:
+		cap = int(float(options.get("buffer", rdt.MEM_CAP / 1000)) * 1000)
+	except ValueError:
+		return None
+	return cap if rdt.PAYLOAD <= cap <= rdt.MEM_CAP else None
+
+def stripe_range(index, stripes, filelength):
+	"""Return the (start, end) byte offsets of a stripe of the file"""
+	return (index * filelength // stripes, (index + 1) * filelength // stripes)
+
+def send_stripe(index, stripes, filename, filelength, args, options):
+	"""Worker process: send one stripe over its own RDT connection
+
+	The stripe uses ports CPORT+1+index and SPORT+1+index.
+	"""
+	start, end = stripe_range(index, stripes, filelength)
+	MSG_LEN = rdt.PAYLOAD * int(args[5])
+
+	rdt.rdt_network_init(args[3], args[4], args[5], options.get("burst", 1), *link_option(options))
+	sockfd = rdt.rdt_socket()
+	if sockfd == None:
+		sys.exit(1)
+	if options.get("profile"):
+		rdt.rdt_set_profiling(True)
+	if rdt.rdt_bind(sockfd, rdt.CPORT + 1 + index) == -1:
+		sys.exit(1)
+	if rdt.rdt_peer(args[1], rdt.SPORT + 1 + index) == -1:
+		sys.exit(1)
+	rdt.rdt_set_memory(buffer_option(options))
+	if options.get("threaded") and rdt.rdt_start_io(sockfd) == -1:
+		sys.exit(1)
+	if rdt.rdt_set_fec(options.get("fec", 0)) == -1:
+		sys.exit(1)
+	rdt.rdt_set_sack(options.get("sack"))
+	rdt.rdt_set_pacing("pace" in options, pace_cap(options))
+
+	try:
+		fobj = open(filename, 'rb')
+		fobj.seek(start)
+	except OSError as emsg:
+		print("Stripe", index, "open file error: ", emsg)
+		sys.exit(1)
+	mm, view = map_file(fobj, filelength, options)
+	sent = 0
+	dropped = start - start % mmap.PAGESIZE
+	smsg = b''
+	while sent < end - start:
+		smsg = next_chunk(fobj, view, start + sent, min(MSG_LEN, end - start - sent))
+		if len(smsg) == 0:
+			print("Stripe", index, "EOF is reached!!")
+			sys.exit(1)
+		osize = rdt.rdt_send(sockfd, smsg)
+		if osize > 0:
+			sent += osize
+		else:
+			print("Stripe", index, "experienced sending error! Has sent",sent,"bytes of message so far.")
+			sys.exit(1)
+		dropped = drop_pages(mm, dropped, start + sent, options)
+	if rdt.rdt_flush(sockfd) == -1:
+		sys.exit(1)
+
+	rdt.rdt_close(sockfd)
+	del smsg
+	unmap_file(mm, view)
+	fobj.close()
+	sys.exit(0)
+
+def send_streams(sockfd, filenames, fobjs, filelengths, MSG_LEN):
+	"""Send several files concurrently over one connection, file i on
+	stream i+1, one message of each file in turn
+
+	Each stream carries "<size>:<filename>\n", the file data and then
+	"DIGEST <hex digest>"; the server answers on the same stream.
+	Return  -> no. of bytes sent, -1 on error
+	"""
+	sent = [0] * len(filenames)
+	digests = [hashlib.sha256() for name in filenames]
+	for i, name in enumerate(filenames):
+		if rdt.rdt_send(sockfd, ("%d:%s\n" % (filelengths[i], name)).encode("ascii"), i + 1) < 0:
+			print("Cannot send the header of", name)
+			return -1
+	todo = list(range(len(filenames)))
+	while todo:
+		for i in list(todo):
+			smsg = fobjs[i].read(min(MSG_LEN, filelengths[i] - sent[i]))
+			if smsg:
+				digests[i].update(smsg)
+				osize = rdt.rdt_send(sockfd, smsg, i + 1)
+				if osize < 0:
+					print("Experienced sending error! Has sent",sum(sent),"bytes of message so far.")
+					return -1
+				sent[i] += osize
+			elif sent[i] < filelengths[i]:
+				print("EOF is reached in", filenames[i])
+				return -1
+			if sent[i] == filelengths[i]:
+				todo.remove(i)
+				if rdt.rdt_send(sockfd, b'DIGEST ' + digests[i].hexdigest().encode("ascii"), i + 1) < 0:
+					return -1
+	#wait until the queued messages are acknowledged
+	if rdt.rdt_flush(sockfd) == -1:
+		print("Experienced sending error! Has queued",sum(sent),"bytes of message so far.")
+		return -1
+	return sum(sent)
+
+def check_streams(sockfd, filenames, MSG_LEN):
+	"""Collect the server's answers to the digests of send_streams()
+
+	Return  -> no. of files whose digest the server verified
+	"""
+	verified = 0
+	for _ in filenames:
+		stream, rmsg = rdt.rdt_recv_stream(sockfd, MSG_LEN)
+		if rmsg == b'' or not 1 <= stream <= len(filenames):
+			print("Cannot verify the file digests")
+			break
+		name = filenames[stream - 1]
+		if rmsg == b'MATCH':
+			print("File", name, "digest verified by server")
+			verified += 1
+		elif rmsg == b'MISMATCH':
+			print("File", name, "digest MISMATCH! The stored file is damaged.")
+		else:
+			print("Server could not store the file", name)
+	return verified
+
+def usage():
+	print("Usage:  "+sys.argv[0]+"  <server IP>  <filename>[,<filename>...]  <drop rate>  <error rate>  <Window size>  [options]")
+	print("Several files are sent concurrently, each on its own stream of the connection")
+	print("Options:")
+	for name in OPTIONS:
+		print("  --%-20s %s" % (name, OPTIONS[name]))
+
+def get_options(args):
+	"""Parse the optional arguments of the form --name or --name=value
+
+	Input argument: list of the optional arguments
+	Return  -> dictionary of option values (True if no value given), None on error
+	"""
+	options = {}
+	for arg in args:
+		name, _, value = arg[2:].partition("=")
+		if not arg.startswith("--") or name not in OPTIONS:
+			print("Unknown option:", arg)
+			return None
+		options[name] = value if value else True
+	return options
+
+def main():
+
+	#Check the number of input arguments
+	if len(sys.argv) < 6:
+		usage()
+		sys.exit(0)
+	options = get_options(sys.argv[6:])
+	if options == None:
+		usage()
+		sys.exit(0)
+	try:
+		burst = float(options.get("burst", 1))
+	except ValueError:
+		burst = 0
+	if burst < 1:
+		print("Mean loss burst must be a number not less than 1")
+		usage()
+		sys.exit(0)
+	try:
+		port = int(options.get("port", rdt.CPORT))
+	except ValueError:
+		port = -1
+	if not 0 <= port <= 65535:
+		print("Port must be an integer between 0 and 65535")
+		usage()
+		sys.exit(0)
+	link = link_option(options)
+	if link == None:
+		print("Bottleneck link must be given as <KB/s>:<queue length>")
+		usage()
+		sys.exit(0)
+	if buffer_option(options) == None:
+		print("RDT buffer must be %d to %d KB" % (rdt.PAYLOAD / 1000, rdt.MEM_CAP / 1000))
+		usage()
+		sys.exit(0)
+	stripes = 0
+	if "stripes" in options:
+		try:
+			stripes = int(options["stripes"]) if options["stripes"] is not True else 0
+		except ValueError:
+			stripes = 0
+		if stripes < 1 or rdt.CPORT + stripes >= rdt.SPORT:
+			print("Number of stripes must be an integer between 1 and", rdt.SPORT - rdt.CPORT - 1)
+			usage()
+			sys.exit(0)
+	#Get the filename(s); several files go on streams 1, 2, ...
+	filenames = sys.argv[2].split(",")
+	streams = len(filenames) if len(filenames) > 1 else 0
+	if streams and (stripes or options.get("resume") or options.get("delta")):
+		print("--stripes, --resume and --delta take a single file")
+		usage()
+		sys.exit(0)
+	if options.get("delta") and (stripes or options.get("resume")):
+		print("--delta cannot be combined with --stripes or --resume")
+		usage()
+		sys.exit(0)
+	if streams > rdt.STREAM_MAX:
+		print("At most", rdt.STREAM_MAX, "files can be sent at once")
+		sys.exit(0)
+	filename = filenames[0] if not streams else ""
+	MSG_LEN = rdt.PAYLOAD * int(sys.argv[5])	#define the max message length
+
+	#open file
+	try:
+		fobjs = [open(name, 'rb') for name in filenames]
+	except OSError as emsg:
+		print("Open file error: ", emsg)
+		sys.exit(0)
+	fobj = fobjs[0]
+	print("Open file successfully")
+
+	#get the file size
+	filelengths = [os.path.getsize(name) for name in filenames]
+	filelength = sum(filelengths)
+	print("File bytes are ",filelength)
+
+	#set up the RDT simulation
+	rdt.rdt_network_init(sys.argv[3], sys.argv[4], sys.argv[5], burst, *link)
+
+	#create RDT socket
+	sockfd = rdt.rdt_socket()
+	if sockfd == None:
+		sys.exit(0)
+	if options.get("profile"):
+		rdt.rdt_set_profiling(True)
+
+    #specify my own IP address & port number
+    #if I do not specify, others can not send things to me.
+	if rdt.rdt_bind(sockfd, port) == -1:
+		sys.exit(0)
+
+	#specify the IP address & port number of remote peer
+	if rdt.rdt_peer(sys.argv[1], rdt.SPORT) == -1:
+		sys.exit(0)
+
+	#cap the memory of the connection, then hand the socket over to the
+	#background I/O thread
+	rdt.rdt_set_memory(buffer_option(options))
+	if options.get("threaded") and rdt.rdt_start_io(sockfd) == -1:
+		sys.exit(0)
+
+	#implement a simple handshaking protocol at the application layer
+	#ask for CRC32 packets; the server checks our packets by their header
+	#flag, and switches its own packets to CRC32 when it sees the request
+	integrity = "crc32" if options.get("crc32") else "inet"
+	if rdt.rdt_set_integrity(integrity) == -1:
+		sys.exit(0)
+	#the compression level is agreed in the same request, which itself
+	#goes uncompressed so that the server can read it from the first packet
+	try:
+		level = 0
+		if "compress" in options:
+			level = 6 if options["compress"] is True else int(options["compress"])
+	except ValueError:
+		level = -1
+	if not 0 <= level <= 9:
+		rdt.rdt_set_compression(level)
+		usage()
+		sys.exit(0)
+	#the server rebuilds lost packets from the parity without being told
+	try:
+		fec = int(options.get("fec", 0))
+	except ValueError:
+		fec = -1
+	if rdt.rdt_set_fec(fec) == -1:
+		usage()
+		sys.exit(0)
+	rdt.rdt_set_sack(options.get("sack"))
+	if rdt.rdt_set_pacing("pace" in options, pace_cap(options)) == -1:
+		usage()
+		sys.exit(0)
+
+	#send the whole request in the first message, with the first window of
+	#file data behind it:
+	#"<size>:<stripes>:<integrity>:<compression level>:<resume>:<delta>:<streams>:<filename>\n"
+	#the server answers in the ACKs of that window (OKAY, ERROR, RESUME
+	#with its checkpoint, or DELTA when it holds a copy of the file), so
+	#the setup costs no extra round trip; with several files, each stream
+	#names its own file (see send_streams())
+	starttime = time.monotonic()	#record start time
+	resume = 1 if options.get("resume") else 0
+	delta = 1 if options.get("delta") else 0
+	request = ("%d:%d:%s:%d:%d:%d:%d:%s\n" % (filelength, stripes, integrity, level, resume, delta,
+		streams, filename)).encode("ascii")
+	if len(request) > rdt.PAYLOAD:
+		print("File name is too long")
+		sys.exit(0)
+	digest = hashlib.sha256()	#end-to-end digest of the whole file
+	start = 0
+	first = b''
+	if not (resume or delta or stripes or streams):
+		#optimistic data: the server stores it once it accepts the file
+		first = fobj.read(MSG_LEN - len(request))
+		digest.update(first)
+		request += first
+	osize = rdt.rdt_send(sockfd, request)
+	if osize < 0 or rdt.rdt_flush(sockfd) == -1:
+		print("Cannot send the request")
+		sys.exit(0)
+	rmsg = rdt.rdt_reply()
+	if rmsg == None:
+		print("No response from the server.\nProgram terminated.")
+		sys.exit(0)
+	elif rmsg == b'ERROR':
+		print("Server experienced file creation error.\nProgram terminated.")
+		sys.exit(0)
+	else:
+		print("Received server positive response")
+	rdt.rdt_set_compression(level)
+
+	#the server offers to resume: "RESUME <offset> <block size> <no. of hashes>"
+	if rmsg.startswith(b'RESUME '):
+		offset, block, nblocks = [int(x) for x in rmsg.split()[1:]]
+		hashes = b''
+		while len(hashes) < nblocks * 20:
+			rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
+			if rmsg == b'':
+				sys.exit(0)
+			hashes += rmsg
+		start = verify_prefix(fobj, offset, block, hashes, digest)
+		print("Server holds", offset, "bytes,", start, "bytes verified")
+		fobj.seek(start)
+		osize = rdt.rdt_send(sockfd, b'START %d' % start)
+		if osize < 0:
+			print("Cannot send the start offset")
+			sys.exit(0)
+
+	#the server holds a copy of the file: "DELTA <block size> <no. of blocks>",
+	#and the block signatures follow as messages
+	delta_block = 0
+	sigs = b''
+	if rmsg.startswith(b'DELTA '):
+		delta_block, nblocks = [int(x) for x in rmsg.split()[1:]]
+		while len(sigs) < nblocks * SIG_SIZE:
+			rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
+			if rmsg == b'':
+				sys.exit(0)
+			sigs += rmsg
+		print("Server holds a copy of", nblocks, "blocks of", delta_block, "bytes")
+
+	#striped transfer: one worker process and RDT connection per stripe
+	if stripes:
+		print("Start the file transfer over", stripes, "stripes . . .")
+		ctx = multiprocessing.get_context("spawn")
+		workers = [ctx.Process(target=send_stripe,
+			args=(i, stripes, filename, filelength, sys.argv, options)) for i in range(stripes)]
+		for w in workers:
+			w.start()
+		#keep ACKing the server response while the stripes run
+		rdt.rdt_close(sockfd)
+		for w in workers:
+			w.join()
+		endtime = time.monotonic()	#record end time
+		fobj.close()
+		if any(w.exitcode != 0 for w in workers):
+			print("Some stripes failed! The file transfer is incomplete.")
+			sys.exit(0)
+		print("Completed the file transfer.")
+		lapsed = endtime - starttime
+		print("Total elapse time: %.3f s\tThroughtput: %.2f KB/s" % (lapsed, filelength/lapsed/1000.0))
+		print("Client program terminated")
+		return
+
+	#several files: one stream each, sent concurrently
+	if streams:
+		print("Start the transfer of", streams, "files . . .")
+		osize = send_streams(sockfd, filenames, fobjs, filelengths, MSG_LEN)
+		endtime = time.monotonic()	#record end time
+		if osize < 0:
+			sys.exit(0)
+		print("Completed the file transfer.")
+		lapsed = endtime - starttime
+		print("Total elapse time: %.3f s\tThroughtput: %.2f KB/s" % (lapsed, filelength/lapsed/1000.0))
+		stats = rdt.rdt_stats()
+		print("Retransmitted: %d packets, %d bytes" % (stats["retrans_pkts"], stats["retrans_bytes"]))
+		print("%d of %d files verified by server" % (check_streams(sockfd, filenames, MSG_LEN), streams))
+		rdt.rdt_close(sockfd)
+		for f in fobjs:
+			f.close()
+		print("Client program terminated")
+		return
+
+	#start the data transfer
+	print("Start the file transfer . . .")
+	mm, view = map_file(fobj, filelength, options)
+	if start:
+		print("Resume from byte", start)
+	sent = start + len(first)
+	if delta_block:
+		#only the differences to the server's copy go
+		result = send_delta(sockfd, fobj, filelength, delta_block, sigs, MSG_LEN, digest)
+		if result == None:
+			print("Experienced sending error while sending the delta!")
+			sys.exit(0)
+		sent = filelength
+	dropped = start - start % mmap.PAGESIZE
+	smsg = b''
+	while sent < filelength:
+		smsg = next_chunk(fobj, view, sent, MSG_LEN)
+		if len(smsg) == 0:
+			print("EOF is reached!!")
+			sys.exit(0)
+		digest.update(smsg)
+		osize = rdt.rdt_send(sockfd, smsg)
+		if osize > 0:
+			sent += osize
+		else:
+			print("Experienced sending error! Has sent",sent,"bytes of message so far.")
+			print("Run again with --resume to continue from the server checkpoint")
+			sys.exit(0)
+		dropped = drop_pages(mm, dropped, sent, options)
+	#wait until the queued messages are acknowledged
+	if rdt.rdt_flush(sockfd) == -1:
+		print("Experienced sending error! Has queued",sent,"bytes of message so far.")
+		sys.exit(0)
+
+	endtime = time.monotonic()	#record end time
+	print("Completed the file transfer.")
+	lapsed = endtime - starttime
+	print("Total elapse time: %.3f s\tThroughtput: %.2f KB/s" % (lapsed, (filelength-start)/lapsed/1000.0))
+	stats = rdt.rdt_stats()
+	print("Retransmitted: %d packets, %d bytes" % (stats["retrans_pkts"], stats["retrans_bytes"]))
+	if link[0] > 0:
+		print("Bottleneck queue drops: %d packets" % stats["queue_drops"])
+	if level:
+		print("Compression: %d -> %d bytes (ratio %.2f), %d of %d messages compressed, CPU %.3f s" % (
+			stats["msg_bytes_sent"], stats["payload_bytes_sent"],
+			stats["msg_bytes_sent"] / max(stats["payload_bytes_sent"], 1),
+			stats["msgs_compressed"], stats["msgs_compressed"] + stats["msgs_uncompressed"],
+			stats["compress_cpu"]))
+	if fec:
+		print("FEC: %d parity packets sent" % stats["fec_parity_sent"])
+	if delta_block:
+		print("Delta: %d bytes matched, %d literal bytes; %d bytes of signatures received, %d bytes sent" % (
+			result + (len(sigs), stats["payload_bytes_sent"])))
+
+	#compare the digest computed while sending with the server's
+	osize = rdt.rdt_send(sockfd, b'DIGEST ' + digest.hexdigest().encode("ascii"))
+	rmsg = rdt.rdt_recv(sockfd, MSG_LEN) if osize > 0 else b''
+	if rmsg == b'MATCH':
+		print("File digest verified by server:", digest.hexdigest())
+	elif rmsg == b'MISMATCH':
+		print("File digest MISMATCH! The stored file is damaged.")
+	else:
+		print("Cannot verify the file digest")
+
+	#Closing
+	rdt.rdt_close(sockfd)
+	del smsg
+	unmap_file(mm, view)
+	fobj.close()
+	print("Client program terminated")
+
+
+def run_cprofile(path):
+	"""Run main() under cProfile (--cprofile) and write the profile, sorted
+	by internal time, to path; only the main thread is profiled"""
+	profiler = cProfile.Profile()
+	try:
+		profiler.runcall(main)
+	finally:
+		with open(path, "w") as fout:
+			pstats.Stats(profiler, stream=fout).sort_stats("tottime").print_stats()
+		print("cProfile output written to", path)
+
+
+if __name__ == "__main__":
+	opts = get_options(sys.argv[6:]) or {}
+	if "cprofile" in opts:
+		run_cprofile(opts["cprofile"] if opts["cprofile"] is not True else "client-profile.txt")
+	else:
+		main()
+
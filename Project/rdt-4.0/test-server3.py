@@ -1,97 +1,1043 @@
-#!/usr/bin/python3
-"""File transfer server program
-
-This is for testing of the RDT4.0 layer.
-
-"""
-
-import sys
-import os
-import rdt4 as rdt
-
-def main():
-
-	#Check the number of input arguments
-	if len(sys.argv) != 5:
-		print("Usage:  "+sys.argv[0]+"  <client IP>  <drop rate>  <error rate>  <Window size>")
-		sys.exit(0)
-
-	MSG_LEN = rdt.PAYLOAD * int(sys.argv[4])	#define the max message length
-
-	#check whether the folder exists
-	try:
-		os.stat("./Store")
-	except OSError as emsg:
-		print("Directory './Store' does not exist!!")
-		print("Please create the directory before starting up the server")
-		sys.exit(0)
-
-	#set up the RDT simulation
-	rdt.rdt_network_init(sys.argv[2], sys.argv[3], sys.argv[4])
-
-	#create RDT socket
-	sockfd = rdt.rdt_socket()
-	if sockfd == None:
-		sys.exit(0)
-
-    #specify my own IP address & port number
-    #if I do not specify, others can not send things to me.
-	if rdt.rdt_bind(sockfd, rdt.SPORT) == -1:
-		sys.exit(0)
-
-	#specify the IP address & port number of remote peer
-	if rdt.rdt_peer(sys.argv[1], rdt.CPORT) == -1:
-		sys.exit(0)
-
-	#implement a simple handshaking protocol at the application layer
-	#First wait for client 1st message
-	rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
-	if rmsg == b'':
-		sys.exit(0)
-	else:
-		filelength = int(rmsg)
-		print("Received client request: file size =",filelength)
-	#then wait for client 2nd message
-	rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
-	if rmsg == b'':
-		sys.exit(0)
-	else:
-		filename = "./Store/"+rmsg.decode("ascii")
-		#open file
-		try:
-			fobj = open(filename, 'wb')
-		except OSError as emsg:
-			print("Open file error: ", emsg)
-		if fobj:
-			print("Open file",filename,"for writing successfully")
-			osize = rdt.rdt_send(sockfd, b'OKAY')
-			if osize < 0:
-				print("Cannot send response message")
-				sys.exit(0)
-		else:
-			print("Cannot open the target file",filename,"for writing")
-			osize = rdt.rdt_send(sockfd, b'ERROR')
-			sys.exit(0)
-
-	#start the data transfer
-	print("Start receiving the file . . .")
-	received = 0
-	while received < filelength:
-		rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
-		if rmsg == b'':
-			print("Encountered receive error! Has received",received,"so far.")
-			sys.exit(0)
-		else:
-			wsize = fobj.write(rmsg)
-			received += wsize
-
-	#Closing
-	fobj.close()
-	rdt.rdt_close(sockfd)
-	print("Completed the file transfer.")
-	print("Server program terminated")
-
-
-if __name__ == "__main__":
-	main()
-
+#!/usr/bin/python3
+"""File transfer server program
+
+This is for testing of the RDT4.0 layer.
+
+"""
+
+import sys
+import os
+import time
+import math
+import zlib
+import queue
+import struct
+import signal
+import socket
+import threading
+import hashlib
+import multiprocessing
+import cProfile
+import pstats
+import rdt4 as rdt
+
+#optional arguments: name -> description
+OPTIONS = {
+	"threaded": "run the RDT layer in a background I/O thread",
+	"burst": "=B  lose packets in bursts of B packets on average",
+	"serve": "[=N]  keep serving clients, N at a time (default 4); <client IP> may be 'any'",
+	"direct": "write each message to the file before the next rdt_recv() (no write-behind thread)",
+	"fsync": "=MB  fsync the file every MB megabytes written (default: at every checkpoint)",
+	"disk": "=MB/s[:ms]  simulate a slow disk: MB/s, plus ms of latency per write",
+	"memory": "=MB  cap the received data the write-behind sinks of the process hold (default 8)",
+	"buffer": "=KB  cap the data the RDT connection buffers in each direction (default 255)",
+	"profile": "time the protocol phases (encode, checksum, send, recv, wait, ...) and print a breakdown",
+	"cprofile": "[=FILE]  run under cProfile and write the profile sorted by time to FILE",
+}
+
+BLOCK = 1 << 20		#size of the blocks whose hashes verify a resumed prefix
+CKPT_STEP = 1 << 20		#checkpoint the received bytes every CKPT_STEP bytes
+CLIENT_IDLE = 60.0		#with --serve, give up on a client silent for this long (s)
+SINK_MEMORY = 8 << 20		#bytes the write-behind sinks of the process hold before rdt_recv() waits
+SINK_BLOCK = 1 << 18		#the write-behind thread writes at least this many bytes at once
+SINK_ALIGN = 4096		#and ends each write on a multiple of SINK_ALIGN
+DELTA_BLOCK = 2048		#smallest block of the delta signatures (about sqrt(file size) above)
+SIG_FORMAT = "!I16s"		#delta signature of a block: Adler-32 and a 16-byte BLAKE2b hash
+SIG_SIZE = struct.calcsize(SIG_FORMAT)
+
+def digest_prefix(fobj, length, digest):
+	"""Update the whole-file digest with the first length bytes of the file"""
+	fobj.seek(0)
+	while length > 0:
+		data = fobj.read(min(BLOCK, length))
+		if data == b'':
+			break
+		digest.update(data)
+		length -= len(data)
+
+def block_hashes(fobj, length, block):
+	"""Return the SHA-1 digests of the blocks of the first length bytes of
+	the file (the last block may be shorter), concatenated
+	"""
+	fobj.seek(0)
+	hashes = b''
+	for pos in range(0, length, block):
+		hashes += hashlib.sha1(fobj.read(min(block, length - pos))).digest()
+	return hashes
+
+def delta_block_size(length):
+	"""Return the block size of the delta signatures of a file of length
+	bytes: about the square root of the length, in KB, at least DELTA_BLOCK"""
+	return max(DELTA_BLOCK, math.isqrt(length) & ~1023)
+
+def block_signatures(fobj, length, block):
+	"""Return the delta signatures of the whole blocks of the first length
+	bytes of the file, concatenated (SIG_FORMAT: the Adler-32 checksum the
+	client rolls over its file, and the strong hash that confirms a match)
+	"""
+	fobj.seek(0)
+	sigs = bytearray()
+	for pos in range(0, length - block + 1, block):
+		data = fobj.read(block)
+		sigs += struct.pack(SIG_FORMAT, zlib.adler32(data), hashlib.blake2b(data, digest_size=16).digest())
+	return bytes(sigs)
+
+def load_checkpoint(filename):
+	"""Read the checkpoint record of a file in ./Store
+
+	Return  -> no. of contiguous bytes received and kept in the file,
+	0 if there is no usable checkpoint
+	"""
+	try:
+		with open(filename + ".ckpt", "r") as cobj:
+			filelength, offset = [int(x) for x in cobj.read().split()]
+		if os.path.getsize(filename) < offset:
+			return 0
+	except (OSError, ValueError):
+		return 0
+	return offset
+
+def save_checkpoint(filename, fobj, filelength, offset):
+	"""Durably record that the first offset bytes of the file are received
+
+	The file data is flushed to disk before the record is replaced, so the
+	record never claims bytes that could be lost in a crash; fobj is None
+	when the caller has just done that.
+	"""
+	try:
+		if fobj:
+			fobj.flush()
+			os.fsync(fobj.fileno())
+		with open(filename + ".ckpt.tmp", "w") as cobj:
+			cobj.write("%d %d\n" % (filelength, offset))
+			cobj.flush()
+			os.fsync(cobj.fileno())
+		os.replace(filename + ".ckpt.tmp", filename + ".ckpt")
+	except OSError as emsg:
+		print("Checkpoint error: ", emsg)
+
+def drop_delta(filename, fobj, basis):
+	"""Give up a delta transfer: remove the partly rebuilt file and keep
+	the held copy"""
+	fobj.close()
+	basis.close()
+	try:
+		os.remove(filename + ".delta")
+	except OSError:
+		pass
+	print("The delta transfer is given up; the copy held in ./Store is kept")
+
+def remove_checkpoint(filename):
+	"""Remove the checkpoint record of a completed file"""
+	try:
+		os.remove(filename + ".ckpt")
+	except OSError:
+		pass
+
+def disk_option(options):
+	"""Return the (rate in bytes/s, latency in s) of the disk simulated by
+	--disk, (0, 0) if not given, None if invalid"""
+	if "disk" not in options:
+		return (0, 0)
+	try:
+		rate, _, latency = str(options["disk"]).partition(":")
+		rate, latency = float(rate) * 1e6, float(latency or 0) / 1000
+	except ValueError:
+		return None
+	return (rate, latency) if rate > 0 and latency >= 0 else None
+
+def fsync_option(options, checkpoint):
+	"""Return the no. of bytes written between fsyncs given by --fsync
+	(0 for none), CKPT_STEP for a checkpointed file by default; -1 if invalid"""
+	if "fsync" not in options:
+		return CKPT_STEP if checkpoint else 0
+	try:
+		step = int(float(options["fsync"]) * (1 << 20))
+	except ValueError:
+		return -1
+	return step if step >= 0 else -1
+
+def memory_option(options):
+	"""Return the no. of bytes the write-behind sinks of the process may
+	hold (--memory), None if invalid"""
+	try:
+		cap = int(float(options.get("memory", SINK_MEMORY / (1 << 20))) * (1 << 20))
+	except ValueError:
+		return None
+	return cap if cap > 0 else None
+
+def buffer_option(options):
+	"""Return the memory cap of the RDT connection (--buffer) in bytes, None if invalid"""
+	try:
+		cap = int(float(options.get("buffer", rdt.MEM_CAP / 1000)) * 1000)
+	except ValueError:
+		return None
+	return cap if rdt.PAYLOAD <= cap <= rdt.MEM_CAP else None
+
+def slow_disk(nbytes, disk):
+	"""Wait as long as the simulated disk takes to write nbytes"""
+	if disk[0] > 0:
+		time.sleep(disk[1] + nbytes / disk[0])
+
+class DirectSink:
+	"""Write each message to the file at once, between rdt_recv() calls (--direct)
+
+	While the disk is busy the RDT layer is not called, so in the blocking
+	mode nothing is ACKed.
+	"""
+	def __init__(self, fobj, offset, sync_step, on_sync, disk):
+		self.fobj = fobj
+		self.offset = self.synced = offset
+		self.sync_step = sync_step
+		self.on_sync = on_sync
+		self.disk = disk
+		self.error = None
+		fobj.seek(offset)
+
+	def write(self, data):
+		"""Return  -> no. of bytes written, -1 on error"""
+		try:
+			self.fobj.write(data)
+			slow_disk(len(data), self.disk)
+			self.offset += len(data)
+			if self.sync_step and self.offset - self.synced >= self.sync_step:
+				self.fobj.flush()
+				os.fsync(self.fobj.fileno())
+				self.synced = self.offset
+				if self.on_sync:
+					self.on_sync(self.offset)
+		except OSError as emsg:
+			print("Write error: ", emsg)
+			self.error = emsg
+			return -1
+		return len(data)
+
+	def close(self):
+		"""Return  -> no. of bytes in the file from the start (all written)"""
+		try:
+			self.fobj.flush()
+		except OSError as emsg:
+			print("Write error: ", emsg)
+			self.error = emsg
+		return self.offset
+
+class SinkBudget:
+	"""Memory budget shared by the write-behind sinks of the process (--memory)
+
+	A sink holds budget for each message from write() until the message is
+	written. take() waits while the bytes held would go over the cap, and
+	meanwhile has every sink write out what it has gathered, so the budget
+	always drains; a message larger than the whole cap goes once nothing
+	else is held.
+	"""
+	def __init__(self, cap):
+		self.cap = cap
+		self.held = 0
+		self.peak = 0
+		self.sinks = []
+		self.cond = threading.Condition()
+
+	def take(self, nbytes):
+		"""Hold nbytes of the budget, waiting until they fit"""
+		with self.cond:
+			if self.held and self.held + nbytes > self.cap:
+				for sink in self.sinks:
+					sink.queue.put(SINK_FLUSH)
+				while self.held and self.held + nbytes > self.cap:
+					self.cond.wait()
+			self.held += nbytes
+			self.peak = max(self.peak, self.held)
+
+	def give(self, nbytes):
+		"""Give back nbytes of the budget"""
+		with self.cond:
+			self.held -= nbytes
+			self.cond.notify_all()
+
+SINK_FLUSH = object()	#queued by SinkBudget.take(): write out what is gathered
+
+class WriteBehind:
+	"""Write-behind sink: write() only queues the message, and a background
+	thread coalesces the queued messages into large writes that end on
+	SINK_ALIGN boundaries
+
+	The queued and gathered messages count against the memory budget of
+	the process; when the disk falls behind, write() waits, rdt_recv() is
+	not called, and the RDT layer advertises a shrinking receive window to
+	the sender (in the --threaded mode, whose I/O thread keeps ACKing). The
+	file is preallocated to its size, and fsynced every sync_step bytes,
+	after which on_sync(offset) is called.
+	"""
+	def __init__(self, fobj, offset, filelength, sync_step, on_sync, disk, budget):
+		fobj.flush()
+		self.fd = fobj.fileno()
+		self.offset = self.synced = offset
+		self.sync_step = sync_step
+		self.on_sync = on_sync
+		self.disk = disk
+		self.error = None
+		self.queue = queue.Queue()
+		self.budget = budget
+		with budget.cond:
+			budget.sinks.append(self)
+		if filelength > offset and hasattr(os, "posix_fallocate"):
+			try:
+				os.posix_fallocate(self.fd, offset, filelength - offset)
+			except OSError as emsg:
+				print("Preallocation error: ", emsg)
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def write(self, data):
+		"""Queue a message, waiting while the queue is full
+
+		Return  -> no. of bytes queued, -1 if the writes have failed
+		"""
+		if self.error is not None:
+			return -1
+		self.budget.take(len(data))
+		self.queue.put(data)
+		return len(data)
+
+	def close(self):
+		"""Write what is queued and stop the thread
+
+		Return  -> no. of bytes in the file from the start that are written
+		"""
+		self.queue.put(None)
+		self.thread.join()
+		with self.budget.cond:
+			self.budget.sinks.remove(self)
+		return self.offset
+
+	def run(self):
+		"""Body of the write-behind thread"""
+		buf = bytearray()
+		done = False
+		while not done:
+			data = self.queue.get()
+			if data is None:
+				done = True
+			elif data is not SINK_FLUSH:
+				buf += data
+			if done or data is SINK_FLUSH:
+				size = len(buf)
+			elif len(buf) >= SINK_BLOCK:
+				size = len(buf) - (self.offset + len(buf)) % SINK_ALIGN
+			else:
+				continue
+			if self.error is not None:	#keep taking messages so that write() does not wait
+				self.budget.give(len(buf))
+				buf.clear()
+				continue
+			if size == 0 and not done:
+				continue
+			try:
+				with memoryview(buf) as view:
+					pos = 0
+					while pos < size:
+						pos += os.pwrite(self.fd, view[pos:size], self.offset + pos)
+				slow_disk(size, self.disk)
+				self.offset += size
+				del buf[:size]
+				self.budget.give(size)
+				if self.sync_step and (done or self.offset - self.synced >= self.sync_step):
+					os.fsync(self.fd)
+					self.synced = self.offset
+					if self.on_sync:
+						self.on_sync(self.offset)
+			except OSError as emsg:
+				print("Write error: ", emsg)
+				self.error = emsg
+				self.budget.give(len(buf))
+				buf.clear()
+
+class DeltaDecoder:
+	"""Rebuild a file from the delta the client sends (--delta, see
+	send_delta() in test-client3.py) and the copy of the file held here
+
+	The delta is a byte stream of instructions, cut into messages without
+	regard to their boundaries:
+	  b'C' + (first block, no. of blocks)   copy blocks of the held copy
+	  b'L' + (length) + data                literal data
+	"""
+	def __init__(self, basis, block, nblocks):
+		self.basis = basis
+		self.block = block
+		self.nblocks = nblocks
+		self.pending = b''	#an instruction cut off at the end of the last message
+		self.literal = 0	#literal bytes still to come
+		self.copied = 0		#bytes copied from the held copy
+
+	def feed(self, rmsg):
+		"""Yield the file data rebuilt from a message, in order
+
+		Raises ValueError if the delta is malformed.
+		"""
+		data = self.pending + rmsg if self.pending else rmsg
+		self.pending = b''
+		pos = 0
+		while pos < len(data):
+			if self.literal:
+				chunk = data[pos:pos+self.literal]
+				self.literal -= len(chunk)
+				pos += len(chunk)
+				yield chunk
+			elif data[pos:pos+1] == b'L':
+				if len(data) - pos < 5:
+					break
+				self.literal = struct.unpack_from("!I", data, pos + 1)[0]
+				pos += 5
+			elif data[pos:pos+1] == b'C':
+				if len(data) - pos < 9:
+					break
+				first, count = struct.unpack_from("!II", data, pos + 1)
+				pos += 9
+				if first + count > self.nblocks:
+					raise ValueError("copy of blocks %d-%d of %d" % (first, first + count - 1, self.nblocks))
+				self.basis.seek(first * self.block)
+				length = count * self.block
+				self.copied += length
+				while length > 0:
+					chunk = self.basis.read(min(length, SINK_BLOCK))
+					if chunk == b'':
+						raise ValueError("the held copy is shorter than its signatures")
+					length -= len(chunk)
+					yield chunk
+			else:
+				raise ValueError("unknown instruction %r" % data[pos:pos+1])
+		self.pending = data[pos:]
+
+def open_sink(fobj, offset, filelength, options, on_sync=None, budget=None):
+	"""Return the sink that writes the received data into fobj from byte
+	offset on: a WriteBehind, or a DirectSink with --direct
+
+	Input arguments: file object, offset, file size (0 if the file needs
+	no preallocation), the options, the function to call with the offset
+	written after each fsync (it enables the periodic fsync), and the
+	SinkBudget shared with the other sinks of the process (a new one if None)
+	"""
+	sync_step = fsync_option(options, on_sync != None)
+	if options.get("direct"):
+		return DirectSink(fobj, offset, sync_step, on_sync, disk_option(options))
+	if budget == None:
+		budget = SinkBudget(memory_option(options))
+	return WriteBehind(fobj, offset, filelength, sync_step, on_sync, disk_option(options), budget)
+
+def stripe_range(index, stripes, filelength):
+	"""Return the (start, end) byte offsets of a stripe of the file"""
+	return (index * filelength // stripes, (index + 1) * filelength // stripes)
+
+def recv_stripe(index, stripes, filename, filelength, args, options):
+	"""Worker process: receive one stripe over its own RDT connection
+
+	The stripe uses ports SPORT+1+index and CPORT+1+index, and its bytes
+	are written at the stripe offset into the preallocated file.
+	"""
+	start, end = stripe_range(index, stripes, filelength)
+	MSG_LEN = rdt.PAYLOAD * int(args[4])
+
+	rdt.rdt_network_init(args[2], args[3], args[4], options.get("burst", 1))
+	sockfd = rdt.rdt_socket()
+	if sockfd == None:
+		sys.exit(1)
+	if options.get("profile"):
+		rdt.rdt_set_profiling(True)
+	if rdt.rdt_bind(sockfd, rdt.SPORT + 1 + index) == -1:
+		sys.exit(1)
+	if rdt.rdt_peer(args[1], rdt.CPORT + 1 + index) == -1:
+		sys.exit(1)
+	if rdt.rdt_set_memory(buffer_option(options)) == -1:
+		sys.exit(1)
+	if options.get("threaded") and rdt.rdt_start_io(sockfd) == -1:
+		sys.exit(1)
+
+	try:
+		fobj = open(filename, 'r+b')
+		fobj.seek(start)
+	except OSError as emsg:
+		print("Stripe", index, "open file error: ", emsg)
+		sys.exit(1)
+	sink = open_sink(fobj, start, 0, options)
+	received = 0
+	while received < end - start:
+		rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
+		if rmsg == b'':
+			print("Stripe", index, "encountered receive error! Has received",received,"so far.")
+			sys.exit(1)
+		if sink.write(rmsg) < 0:
+			sys.exit(1)
+		received += len(rmsg)
+
+	sink.close()
+	fobj.close()
+	if sink.error is not None:
+		sys.exit(1)
+	rdt.rdt_close(sockfd)
+	print("Stripe", index, "received", received, "bytes")
+	sys.exit(0)
+
+def receive_streams(sockfd, streams, MSG_LEN, options):
+	"""Receive the files the client sends concurrently on streams 1 to
+	streams, and store them in ./Store
+
+	Each stream carries "<size>:<filename>\n", the file data and then
+	"DIGEST <hex digest>", which is answered on the same stream with
+	MATCH, MISMATCH, or ERROR if the file could not be stored. The data of
+	each stream is written as it arrives, so a loss on one stream does
+	not hold up the others.
+	Return  -> no. of bytes received, -1 on error
+	"""
+	files = {}		#stream ID -> [file object or None, file size, bytes received, digest, sink]
+	budget = SinkBudget(memory_option(options))	#shared by the sinks of all the streams
+	received = 0
+	done = 0
+	try:
+		while done < streams:
+			stream, rmsg = rdt.rdt_recv_stream(sockfd, MSG_LEN)
+			if rmsg == b'':
+				print("Encountered receive error! Has received",received,"so far.")
+				return -1
+			if not 1 <= stream <= streams:
+				print("Data on unexpected stream", stream)
+				continue
+			f = files.get(stream)
+			if f is None:
+				#the first message of a stream names its file
+				try:
+					filelength, filename = rmsg.rstrip(b'\n').decode("ascii").split(":", 1)
+					f = files[stream] = [None, int(filelength), 0, hashlib.sha256(), None]
+				except (UnicodeDecodeError, ValueError):
+					print("Malformed header on stream", stream)
+					return -1
+				try:
+					f[0] = open("./Store/" + filename, 'wb')
+					f[4] = open_sink(f[0], 0, f[1], options, budget=budget)
+					print("Stream", stream, "receiving file", filename, "of", filelength, "bytes")
+				except OSError as emsg:
+					#the data of the stream is dropped and its digest answered with ERROR
+					print("Stream", stream, "open file error: ", emsg)
+			elif f[2] < f[1]:
+				f[2] += len(rmsg)
+				received += len(rmsg)
+				if f[0]:
+					f[3].update(rmsg)
+					f[4].write(rmsg)
+			else:
+				#the end of the stream: compare the digests
+				if f[0]:
+					f[4].close()
+				if f[0] is None or f[4].error is not None:
+					reply = b'ERROR'
+				elif rmsg[7:].decode("ascii", "replace") == f[3].hexdigest():
+					reply = b'MATCH'
+				else:
+					reply = b'MISMATCH'
+				print("Stream", stream, "completed:", reply.decode("ascii"))
+				if f[0]:
+					f[0].close()
+					f[0] = None
+				rdt.rdt_send(sockfd, reply, stream)
+				done += 1
+	finally:
+		for f in files.values():
+			if f[0]:
+				f[4].close()
+				f[0].close()
+
+	#Closing
+	rdt.rdt_close(sockfd)
+	print("Completed the transfer of", streams, "files.")
+	return received
+
+def usage():
+	print("Usage:  "+sys.argv[0]+"  <client IP>  <drop rate>  <error rate>  <Window size>  [options]")
+	print("Options:")
+	for name in OPTIONS:
+		print("  --%-20s %s" % (name, OPTIONS[name]))
+
+def get_options(args):
+	"""Parse the optional arguments of the form --name or --name=value
+
+	Input argument: list of the optional arguments
+	Return  -> dictionary of option values (True if no value given), None on error
+	"""
+	options = {}
+	for arg in args:
+		name, _, value = arg[2:].partition("=")
+		if not arg.startswith("--") or name not in OPTIONS:
+			print("Unknown option:", arg)
+			return None
+		options[name] = value if value else True
+	return options
+
+def receive_file(sockfd, args, options, serving=False):
+	"""Receive one file from the connected client and store it in ./Store
+
+	Input arguments: RDT socket, the command line arguments, the options
+	and whether this is a session of --serve (no striped transfers)
+	Return  -> no. of bytes received, -1 on error
+	"""
+	MSG_LEN = rdt.PAYLOAD * int(args[4])	#define the max message length
+
+	#the whole request comes in the first packet, and the answer goes back
+	#in its ACKs (see rdt_set_acceptor()):
+	#"<size>:<stripes>:<integrity>:<compression level>:<resume>:<delta>:<streams>:<filename>\n"
+	#followed by the first file data, which is kept once the file is open;
+	#with streams > 0 the files come on streams 1 to streams instead
+	setup = {}
+	def accept(payload):
+		request, newline, _ = payload.partition(b'\n')
+		try:
+			fields = request.decode("ascii").split(":", 7)
+			filelength, stripes, level, resume = int(fields[0]), int(fields[1]), int(fields[3]), int(fields[4])
+			delta, streams, integrity, filename = int(fields[5]), int(fields[6]), fields[2], "./Store/" + fields[7]
+		except (UnicodeDecodeError, ValueError, IndexError):
+			print("Malformed client request")
+			return b'ERROR'
+		setup.update(filelength=filelength, stripes=stripes, filename=filename, skip=len(request) + 1)
+		print("Received client request: file size =",filelength)
+		#use the integrity mode and compression the client asked for
+		if integrity in rdt.INTEGRITY_MODES:
+			rdt.rdt_set_integrity(integrity)
+		rdt.rdt_set_compression(level if 0 <= level <= 9 else 0)
+		if streams:
+			if not 0 < streams <= rdt.STREAM_MAX or stripes or resume or delta:
+				print("Bad request for", streams, "files")
+				return b'ERROR'
+			print("Receiving", streams, "files concurrently")
+			setup.update(streams=streams)
+			return b'OKAY'
+		if stripes:
+			print("Striped transfer over", stripes, "connections")
+		#the stripe ports are fixed, so concurrent clients cannot stripe
+		if stripes and serving:
+			print("Striped transfers are not supported with --serve")
+			return b'ERROR'
+		#a copy of the file held here is the basis of a delta transfer: the
+		#new file is rebuilt beside it and replaces it once verified; without
+		#a copy, the client sends the whole file
+		basis = None
+		if delta and not stripes and not resume and os.path.isfile(filename):
+			fobj = None
+			try:
+				basis = open(filename, 'rb')
+				fobj = open(filename + ".delta", 'wb')
+			except OSError as emsg:
+				print("Open file error: ", emsg)
+				for f in (basis, fobj):
+					if f:
+						f.close()
+				return b'ERROR'
+			length = os.fstat(basis.fileno()).st_size
+			block = delta_block_size(length)
+			setup.update(fobj=fobj, resume=0, basis=basis, block=block, sigs=block_signatures(basis, length, block))
+			print("Offer a delta against the", length, "bytes held in", filename)
+			return b'DELTA %d %d' % (block, len(setup["sigs"]) // SIG_SIZE)
+		#a checkpoint of an earlier, broken transfer of this file can be resumed
+		resume = load_checkpoint(filename) if resume and not stripes else 0
+		#open file
+		fobj = None
+		try:
+			fobj = open(filename, 'r+b' if resume else 'wb')
+			if stripes:
+				#preallocate the file for the stripe workers
+				if hasattr(os, "posix_fallocate") and filelength > 0:
+					os.posix_fallocate(fobj.fileno(), 0, filelength)
+				fobj.truncate(filelength)
+		except OSError as emsg:
+			print("Open file error: ", emsg)
+			if fobj:
+				fobj.close()
+			print("Cannot open the target file",filename,"for writing")
+			return b'ERROR'
+		print("Open file",filename,"for writing successfully")
+		setup.update(fobj=fobj, resume=resume)
+		#start the stripe workers before telling the client to go ahead
+		if stripes:
+			fobj.close()
+			ctx = multiprocessing.get_context("spawn")
+			setup["workers"] = [ctx.Process(target=recv_stripe,
+				args=(i, stripes, filename, filelength, args, options)) for i in range(stripes)]
+			for w in setup["workers"]:
+				w.start()
+		if resume:
+			#offer the received prefix; its block hashes follow as messages
+			setup["hashes"] = block_hashes(fobj, resume, BLOCK)
+			print("Offer to resume from byte", resume)
+			return b'RESUME %d %d %d' % (resume, BLOCK, len(setup["hashes"]) // 20)
+		return b'OKAY'
+	rdt.rdt_set_acceptor(accept)
+	rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
+	if rmsg != b'' and "streams" in setup:
+		return receive_streams(sockfd, setup["streams"], MSG_LEN, options)
+	if rmsg == b'' or "fobj" not in setup:
+		if "workers" in setup:
+			for w in setup["workers"]:
+				w.terminate()
+		#the client learns of a refusal from the ACKs; keep ACKing a while
+		if rmsg != b'':
+			rdt.rdt_close(sockfd)
+		return -1
+	filelength, stripes, filename = setup["filelength"], setup["stripes"], setup["filename"]
+	fobj, resume, workers = setup["fobj"], setup["resume"], setup.get("workers")
+	basis = setup.get("basis")
+	first = rmsg[setup["skip"]:]
+	#the block hashes of the prefix to resume, or the delta signatures
+	offer = setup.get("hashes") or setup.get("sigs")
+	if offer:
+		osize = 1
+		for i in range(0, len(offer), MSG_LEN):
+			if osize > 0:
+				osize = rdt.rdt_send(sockfd, offer[i:i+MSG_LEN])
+		if osize < 0:
+			print("Cannot send response message")
+			return -1
+
+	#striped transfer: wait for the stripe workers
+	if stripes:
+		print("Start receiving the file over", stripes, "stripes . . .")
+		for w in workers:
+			w.join()
+		rdt.rdt_close(sockfd)
+		if any(w.exitcode != 0 for w in workers):
+			print("Some stripes failed! The file is incomplete.")
+			return -1
+		print("Completed the file transfer.")
+		return filelength
+
+	#the client tells where it starts after checking the offered prefix
+	received = 0
+	if resume:
+		rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
+		if not rmsg.startswith(b'START '):
+			print("Did not receive the start offset from client")
+			return -1
+		received = min(int(rmsg[6:]), resume)
+		fobj.seek(received)
+		fobj.truncate(received)
+		print("Resume receiving from byte", received)
+	#end-to-end digest of the whole file, computed as the data is written
+	digest = hashlib.sha256()
+	if received:
+		digest_prefix(fobj, received, digest)
+		fobj.seek(received)
+	start = received
+	decoder = None
+	if basis:
+		#a broken delta transfer is not checkpointed; it starts over
+		decoder = DeltaDecoder(basis, setup["block"], len(setup["sigs"]) // SIG_SIZE)
+		sink = open_sink(fobj, 0, filelength, options)
+	else:
+		save_checkpoint(filename, fobj, filelength, received)
+		#the sink writes the data and checkpoints it after each fsync
+		sink = open_sink(fobj, received, filelength, options,
+			lambda offset: save_checkpoint(filename, None, filelength, offset))
+	#the data that came with the request
+	if first:
+		digest.update(first)
+		sink.write(first)
+		received += len(first)
+
+	#start the data transfer; in delta mode the messages carry the delta,
+	#from which the file is rebuilt
+	print("Start receiving the file . . .")
+	try:
+		while received < filelength:
+			rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
+			if rmsg == b'':
+				print("Encountered receive error! Has received",received,"so far.")
+				if decoder:
+					sink.close()
+					drop_delta(filename, fobj, basis)
+					return -1
+				save_checkpoint(filename, fobj, filelength, sink.close())
+				print("Checkpoint saved; the client can resume with --resume")
+				return -1
+			for data in (decoder.feed(rmsg) if decoder else (rmsg,)):
+				digest.update(data)
+				if sink.write(data) < 0:
+					break
+				received += len(data)
+			if sink.error is not None:
+				break
+	except ValueError as emsg:
+		print("Malformed delta: ", emsg)
+		sink.close()
+		drop_delta(filename, fobj, basis)
+		return -1
+	except KeyboardInterrupt:
+		received = sink.close()
+		if decoder:
+			drop_delta(filename, fobj, basis)
+			return -1
+		save_checkpoint(filename, fobj, filelength, received)
+		print("Interrupted! Checkpoint saved at byte", received)
+		return -1
+	if sink.close() < received or sink.error is not None:
+		print("Cannot store the file! Has written",sink.offset,"bytes so far.")
+		if decoder:
+			drop_delta(filename, fobj, basis)
+		else:
+			save_checkpoint(filename, fobj, filelength, sink.offset)
+		return -1
+
+	#compare with the digest the client computed while sending
+	rmsg = rdt.rdt_recv(sockfd, MSG_LEN)
+	verified = False
+	if rmsg.startswith(b'DIGEST '):
+		if rmsg[7:].decode("ascii") == digest.hexdigest():
+			print("File digest verified:", digest.hexdigest())
+			rdt.rdt_send(sockfd, b'MATCH')
+			verified = True
+		else:
+			print("File digest MISMATCH! The stored file is damaged.")
+			rdt.rdt_send(sockfd, b'MISMATCH')
+	else:
+		print("Did not receive the file digest from client")
+
+	stats = rdt.rdt_stats()
+	if stats["decompress_cpu"] > 0:
+		print("Decompression: %d -> %d bytes (ratio %.2f), CPU %.3f s" % (
+			stats["payload_bytes_recv"], stats["msg_bytes_recv"],
+			stats["msg_bytes_recv"] / max(stats["payload_bytes_recv"], 1), stats["decompress_cpu"]))
+	if stats["fec_rebuilt"] > 0:
+		print("FEC: %d lost packets rebuilt from parity" % stats["fec_rebuilt"])
+
+	#the rebuilt file replaces the held copy only once verified
+	if decoder and not verified:
+		drop_delta(filename, fobj, basis)
+		rdt.rdt_close(sockfd)
+		return -1
+	if decoder:
+		print("Delta: %d bytes copied from the held copy, %d bytes of literal data" % (
+			decoder.copied, received - decoder.copied))
+		fobj.close()
+		basis.close()
+		try:
+			os.replace(filename + ".delta", filename)
+		except OSError as emsg:
+			print("Cannot replace the held copy: ", emsg)
+
+	#Closing
+	fobj.close()
+	remove_checkpoint(filename)
+	rdt.rdt_close(sockfd)
+	print("Completed the file transfer.")
+	return received - start
+
+def serve_client(addr, args, options):
+	"""Pool worker (--serve): receive a file from one client
+
+	The worker opens its own socket on the server port (SO_REUSEPORT) and
+	connects it to the client, so the kernel delivers that client's packets
+	to it instead of the dispatcher. Each worker process serves one client,
+	which gives every client a fresh RDT connection state.
+	Return  -> (client address, no. of bytes received or -1, elapse time in s)
+	"""
+	starttime = time.monotonic()
+	rdt.rdt_network_init(args[2], args[3], args[4], options.get("burst", 1))
+	sockfd = rdt.rdt_socket()
+	if sockfd == None:
+		return (addr, -1, 0.0)
+	if options.get("profile"):
+		rdt.rdt_set_profiling(True)
+	try:
+		sockfd.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+		if rdt.rdt_bind(sockfd, rdt.SPORT) == -1:
+			return (addr, -1, 0.0)
+		sockfd.connect(addr)
+		sockfd.settimeout(CLIENT_IDLE)
+	except socket.error as emsg:
+		print("Client", addr, "socket error: ", emsg)
+		sockfd.close()
+		return (addr, -1, 0.0)
+	rdt.rdt_peer(addr[0], addr[1])
+	rdt.rdt_set_memory(buffer_option(options))
+	if options.get("threaded") and rdt.rdt_start_io(sockfd) == -1:
+		return (addr, -1, 0.0)
+	received = receive_file(sockfd, args, options, serving=True)
+	return (addr, received, time.monotonic() - starttime)
+
+def is_first_packet(rmsg):
+	"""Return True if rmsg is the first DATA packet of a new RDT connection"""
+	if rdt.check_if_corrupt(rmsg) or not rdt.is_type(rmsg, rdt.DATA_ID):
+		return False
+	(_, seq_num, _, _), _ = rdt.unpack_msg(rmsg)
+	return seq_num == 0
+
+def serve(args, options, workers):
+	"""Long-running server (--serve): accept transfers from any number of
+	clients on the server port and hand each to a pool of worker processes
+
+	The dispatcher socket only sees the packets of clients that no worker
+	has connected to yet; it drops them, and RDT retransmits them to the
+	worker once its socket is connected.
+	"""
+	if not hasattr(socket, "SO_REUSEPORT"):
+		print("--serve needs SO_REUSEPORT, which this platform does not have")
+		return
+	sockfd = rdt.rdt_socket()
+	if sockfd == None:
+		return
+	try:
+		sockfd.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+	except socket.error as emsg:
+		print("Socket option error: ", emsg)
+		return
+	if rdt.rdt_bind(sockfd, rdt.SPORT) == -1:
+		return
+	sockfd.settimeout(1.0)	#report the finished sessions at least every second
+	try:
+		allowed = None if args[1] == "any" else socket.gethostbyname(args[1])
+	except socket.error as emsg:
+		print("Client address error: ", emsg)
+		return
+
+	#SIGTERM stops taking new clients and lets the active sessions finish;
+	#Ctrl-C abandons them
+	stopping = []
+	signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+	pool = multiprocessing.get_context("spawn").Pool(workers, maxtasksperchild=1)
+	active = {}		#client address -> result of its session
+	served = 0
+
+	def report(wait=False):
+		nonlocal served
+		for addr in [a for a in active if wait or active[a].ready()]:
+			_, received, lapsed = active.pop(addr).get()
+			served += 1
+			if received < 0:
+				print("Client %s:%d: transfer failed" % addr)
+			else:
+				print("Client %s:%d: received %d bytes in %.3f s, %.2f KB/s" % (
+					addr + (received, lapsed, received / max(lapsed, 1e-9) / 1000.0)))
+
+	print("Serving clients on port", rdt.SPORT, "with", workers, "workers")
+	try:
+		while not stopping:
+			report()
+			try:
+				rmsg, addr = sockfd.recvfrom(rdt.PAYLOAD + rdt.MAX_HEADER_SIZE)
+			except socket.timeout:
+				continue
+			if addr in active or allowed not in (None, addr[0]):
+				continue
+			#a new client: its first packet is the DATA with seq no. 0
+			if is_first_packet(rmsg):
+				print("New client %s:%d" % addr)
+				active[addr] = pool.apply_async(serve_client, (addr, args, options))
+		print("Stopping: waiting for", len(active), "active clients")
+		pool.close()
+		report(wait=True)
+		pool.join()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		print("Server stopped after serving", served, "clients")
+		pool.terminate()
+		sockfd.close()
+
+def main():
+
+	#Check the number of input arguments
+	if len(sys.argv) < 5:
+		usage()
+		sys.exit(0)
+	options = get_options(sys.argv[5:])
+	if options == None:
+		usage()
+		sys.exit(0)
+	try:
+		burst = float(options.get("burst", 1))
+	except ValueError:
+		burst = 0
+	if burst < 1:
+		print("Mean loss burst must be a number not less than 1")
+		usage()
+		sys.exit(0)
+	if disk_option(options) == None:
+		print("Simulated disk must be given as <MB/s>[:<ms per write>]")
+		usage()
+		sys.exit(0)
+	if fsync_option(options, True) < 0:
+		print("Bytes between fsyncs must be given as a number of MB, 0 for none")
+		usage()
+		sys.exit(0)
+	if memory_option(options) == None or buffer_option(options) == None:
+		print("Sink memory must be a positive no. of MB, and the RDT buffer %d to %d KB" % (
+			rdt.PAYLOAD / 1000, rdt.MEM_CAP / 1000))
+		usage()
+		sys.exit(0)
+	workers = 0
+	if "serve" in options:
+		try:
+			workers = int(options["serve"]) if options["serve"] is not True else 4
+		except ValueError:
+			workers = 0
+		if workers < 1:
+			print("Number of workers must be a positive integer")
+			usage()
+			sys.exit(0)
+
+	#check whether the folder exists
+	try:
+		os.stat("./Store")
+	except OSError as emsg:
+		print("Directory './Store' does not exist!!")
+		print("Please create the directory before starting up the server")
+		sys.exit(0)
+
+	#long-running server for any number of clients
+	if workers:
+		serve(sys.argv, options, workers)
+		print("Server program terminated")
+		return
+
+	#set up the RDT simulation
+	rdt.rdt_network_init(sys.argv[2], sys.argv[3], sys.argv[4], burst)
+
+	#create RDT socket
+	sockfd = rdt.rdt_socket()
+	if sockfd == None:
+		sys.exit(0)
+	if options.get("profile"):
+		rdt.rdt_set_profiling(True)
+
+    #specify my own IP address & port number
+    #if I do not specify, others can not send things to me.
+	if rdt.rdt_bind(sockfd, rdt.SPORT) == -1:
+		sys.exit(0)
+
+	#specify the IP address & port number of remote peer
+	if rdt.rdt_peer(sys.argv[1], rdt.CPORT) == -1:
+		sys.exit(0)
+
+	#cap the memory of the connection, then hand the socket over to the
+	#background I/O thread
+	rdt.rdt_set_memory(buffer_option(options))
+	if options.get("threaded") and rdt.rdt_start_io(sockfd) == -1:
+		sys.exit(0)
+
+	receive_file(sockfd, sys.argv, options)
+	print("Server program terminated")
+
+
+def run_cprofile(path):
+	"""Run main() under cProfile (--cprofile) and write the profile, sorted
+	by internal time, to path; only the main thread is profiled"""
+	profiler = cProfile.Profile()
+	try:
+		profiler.runcall(main)
+	finally:
+		with open(path, "w") as fout:
+			pstats.Stats(profiler, stream=fout).sort_stats("tottime").print_stats()
+		print("cProfile output written to", path)
+
+
+if __name__ == "__main__":
+	opts = get_options(sys.argv[5:]) or {}
+	if "cprofile" in opts:
+		run_cprofile(opts["cprofile"] if opts["cprofile"] is not True else "server-profile.txt")
+	else:
+		main()